@@ -0,0 +1,100 @@
+"""Reconcile videos table and add composite indexes
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+# (索引名, 表名, 列)
+COMPOSITE_INDEXES = [
+    ('ix_videos_status_video_type', 'videos', ['status', 'video_type']),
+    ('ix_videos_space_id_created_at', 'videos', ['space_id', 'created_at']),
+    ('ix_tasks_status_task_type', 'tasks', ['status', 'task_type']),
+    ('ix_ai_analysis_logs_video_id_created_at', 'ai_analysis_logs', ['video_id', 'created_at']),
+    ('ix_spaces_is_active_last_scan_time', 'spaces', ['is_active', 'last_scan_time']),
+]
+
+# 001中videos表的旧列名 -> 模型中的列名
+VIDEO_COLUMN_RENAMES = [
+    ('video_id', 'bvid'),
+    ('video_title', 'title'),
+    ('video_url', 'bilibili_url'),
+]
+
+# 001中缺失、模型中存在的videos列
+VIDEO_MISSING_COLUMNS = [
+    sa.Column('aid', sa.String(length=50), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('cover_url', sa.Text(), nullable=True),
+    sa.Column('subtitle_path', sa.Text(), nullable=True),
+    sa.Column('youtube_url', sa.Text(), nullable=True),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    video_columns = {column['name'] for column in inspector.get_columns('videos')}
+
+    # 001建立的videos表与模型不一致（video_id/video_title/video_url，ix_videos_video_id），
+    # 由 init_db.py 的 create_all 建立的表则已经是模型结构，无需处理
+    if 'video_id' in video_columns:
+        with op.batch_alter_table('videos') as batch_op:
+            batch_op.drop_index('ix_videos_video_id')
+            for old_name, new_name in VIDEO_COLUMN_RENAMES:
+                # 模型中只有bvid、title必填
+                batch_op.alter_column(old_name, new_column_name=new_name, nullable=new_name == 'bilibili_url')
+            batch_op.alter_column('video_type', existing_type=sa.String(length=50), nullable=True)
+            batch_op.alter_column(
+                'duration',
+                existing_type=sa.Integer(),
+                type_=sa.String(length=20),
+                postgresql_using='duration::varchar',
+            )
+            for column in VIDEO_MISSING_COLUMNS:
+                if column.name not in video_columns:
+                    batch_op.add_column(column.copy())
+        # 批处理中重命名的列不能再被同一批处理中的索引引用
+        op.create_index('ix_videos_bvid', 'videos', ['bvid'], unique=True)
+
+    for name, table, columns in COMPOSITE_INDEXES:
+        if name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for name, table, columns in reversed(COMPOSITE_INDEXES):
+        if name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
+
+    video_columns = {column['name'] for column in inspector.get_columns('videos')}
+    if 'bvid' in video_columns:
+        op.drop_index('ix_videos_bvid', table_name='videos')
+        with op.batch_alter_table('videos') as batch_op:
+            for column in VIDEO_MISSING_COLUMNS:
+                batch_op.drop_column(column.name)
+            batch_op.alter_column(
+                'duration',
+                existing_type=sa.String(length=20),
+                type_=sa.Integer(),
+                postgresql_using='duration::integer',
+            )
+            for old_name, new_name in VIDEO_COLUMN_RENAMES:
+                batch_op.alter_column(new_name, new_column_name=old_name, nullable=False)
+            batch_op.alter_column('video_type', existing_type=sa.String(length=50), nullable=False)
+        op.create_index('ix_videos_video_id', 'videos', ['video_id'], unique=True)
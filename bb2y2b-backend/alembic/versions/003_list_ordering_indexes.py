@@ -0,0 +1,40 @@
+"""Add created_at indexes for keyset pagination
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+# 列表接口按 (created_at, id) 排序分页
+ORDERING_INDEXES = [
+    ('ix_videos_created_at', 'videos', ['created_at']),
+    ('ix_tasks_created_at', 'tasks', ['created_at']),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in ORDERING_INDEXES:
+        if name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in reversed(ORDERING_INDEXES):
+        if name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,67 @@
+"""Add full-text search index for videos
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+# 本版本的trigram索引。008删除了它，之后由 app/services/search.py 的 ensure_search_index 按二元词重建
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+        title, description, subtitle_text, tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ai AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, description, subtitle_text)
+        VALUES (new.id, new.title, coalesce(new.description, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_au AFTER UPDATE OF title, description ON videos BEGIN
+        UPDATE videos_fts SET title = new.title, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ad AFTER DELETE ON videos BEGIN
+        DELETE FROM videos_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def upgrade() -> None:
+    # FTS5仅用于SQLite，其他数据库的搜索使用LIKE匹配
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    created = not sa.inspect(bind).has_table('videos_fts')
+    for ddl in SEARCH_DDL:
+        op.execute(ddl)
+    if created:
+        # 字幕文本在应用启动后由后台线程补齐
+        op.execute(
+            "INSERT INTO videos_fts(rowid, title, description, subtitle_text) "
+            "SELECT id, title, coalesce(description, ''), '' FROM videos"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS videos_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS videos_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS videos_fts_ai")
+    op.execute("DROP TABLE IF EXISTS videos_fts")
@@ -0,0 +1,50 @@
+"""Add downloaded_files catalog
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('downloaded_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('path', sa.Text(), nullable=False),
+        sa.Column('bvid', sa.String(length=50), nullable=True),
+        sa.Column('start_p', sa.Integer(), nullable=True),
+        sa.Column('end_p', sa.Integer(), nullable=True),
+        sa.Column('format', sa.String(length=10), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('duration', sa.Float(), nullable=True),
+        sa.Column('cover_name', sa.String(length=255), nullable=True),
+        sa.Column('subtitle_name', sa.String(length=255), nullable=True),
+        sa.Column('file_ctime', sa.Float(), nullable=False),
+        sa.Column('file_mtime', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_downloaded_files_id'), 'downloaded_files', ['id'], unique=False)
+    op.create_index(op.f('ix_downloaded_files_name'), 'downloaded_files', ['name'], unique=True)
+    op.create_index(op.f('ix_downloaded_files_bvid'), 'downloaded_files', ['bvid'], unique=False)
+    op.create_index(op.f('ix_downloaded_files_size'), 'downloaded_files', ['size'], unique=False)
+    op.create_index(op.f('ix_downloaded_files_file_ctime'), 'downloaded_files', ['file_ctime'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_downloaded_files_file_ctime'), table_name='downloaded_files')
+    op.drop_index(op.f('ix_downloaded_files_size'), table_name='downloaded_files')
+    op.drop_index(op.f('ix_downloaded_files_bvid'), table_name='downloaded_files')
+    op.drop_index(op.f('ix_downloaded_files_name'), table_name='downloaded_files')
+    op.drop_index(op.f('ix_downloaded_files_id'), table_name='downloaded_files')
+    op.drop_table('downloaded_files')
@@ -0,0 +1,35 @@
+"""Add lease columns to tasks for the download job queue
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('lease_owner', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_tasks_task_type_status_lease', 'tasks', ['task_type', 'status', 'lease_expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_task_type_status_lease', table_name='tasks')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('started_at')
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('lease_expires_at')
+        batch_op.drop_column('lease_owner')
@@ -0,0 +1,29 @@
+"""Add priority class to tasks for download scheduling
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.String(length=20), nullable=True))
+    # 已有的下载任务都是用户手动发起的
+    op.execute("UPDATE tasks SET priority = 'interactive' WHERE task_type = 'download'")
+    op.create_index('ix_tasks_task_type_priority_status', 'tasks', ['task_type', 'priority', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_task_type_priority_status', table_name='tasks')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('priority')
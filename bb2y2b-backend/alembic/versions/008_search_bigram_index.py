@@ -0,0 +1,39 @@
+"""Drop the trigram search index so it is rebuilt with bigram tokens
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+# trigram索引不支持两个字的查询。这里只删除旧索引，应用启动时由 ensure_search_index
+# 按二元词重建（见 app/services/search.py），字幕文本需要读取文件，由后台线程补齐。
+DROP_DDL = [
+    "DROP TRIGGER IF EXISTS videos_fts_ad",
+    "DROP TRIGGER IF EXISTS videos_fts_au",
+    "DROP TRIGGER IF EXISTS videos_fts_ai",
+    "DROP TABLE IF EXISTS videos_fts",
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for ddl in DROP_DDL:
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    # 二元词索引同样删除，旧版本启动时会重新建立trigram索引
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for ddl in DROP_DDL:
+        op.execute(ddl)
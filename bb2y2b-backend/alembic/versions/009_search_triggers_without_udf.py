@@ -0,0 +1,59 @@
+"""Replace search index triggers that call fts_bigrams()
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+# 应用之外的连接没有注册 fts_bigrams()，调用它的触发器会让这些连接无法写videos表。
+# 触发器改为只写原文，切分后的文本由应用写入（见 app/services/search.py 的 index_videos）。
+TRIGGER_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ai AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, description, subtitle_text)
+        VALUES (new.id, new.title, coalesce(new.description, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_au AFTER UPDATE OF title, description ON videos BEGIN
+        UPDATE videos_fts SET title = new.title, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ad AFTER DELETE ON videos BEGIN
+        DELETE FROM videos_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not sa.inspect(bind).has_table('videos_fts'):
+        return
+    udf_triggers = bind.execute(sa.text(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%fts_bigrams%'"
+    )).scalar()
+    if not udf_triggers:
+        return
+    op.execute("DROP TRIGGER IF EXISTS videos_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS videos_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS videos_fts_ai")
+    for ddl in TRIGGER_DDL:
+        op.execute(ddl)
+
+
+def downgrade() -> None:
+    # 不调用自定义函数的触发器对旧版本同样可用，不需要恢复
+    pass
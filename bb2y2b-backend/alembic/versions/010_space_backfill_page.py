@@ -0,0 +1,59 @@
+"""Store the full backfill cursor on the space row
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+# 之前的断点保存在 system_configs 中，键为 scan.backfill_page.<space_id>
+CURSOR_KEY_PREFIX = 'scan.backfill_page.'
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('spaces') as batch_op:
+        batch_op.add_column(sa.Column('backfill_page', sa.Integer(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text("SELECT config_key, config_value FROM system_configs WHERE config_key LIKE :prefix"),
+        {"prefix": CURSOR_KEY_PREFIX + '%'}
+    ).all()
+    for config_key, config_value in rows:
+        if str(config_value).isdigit():
+            bind.execute(
+                sa.text("UPDATE spaces SET backfill_page = :page WHERE space_id = :space_id"),
+                {"page": int(config_value), "space_id": config_key[len(CURSOR_KEY_PREFIX):]}
+            )
+    bind.execute(
+        sa.text("DELETE FROM system_configs WHERE config_key LIKE :prefix"),
+        {"prefix": CURSOR_KEY_PREFIX + '%'}
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT space_id, backfill_page FROM spaces WHERE backfill_page IS NOT NULL")).all()
+    for space_id, page in rows:
+        bind.execute(
+            sa.text(
+                "INSERT INTO system_configs (config_key, config_value, description) "
+                "VALUES (:config_key, :config_value, :description)"
+            ),
+            {
+                "config_key": CURSOR_KEY_PREFIX + space_id,
+                "config_value": str(page),
+                "description": f"空间 {space_id} 全量回填断点页码",
+            }
+        )
+    with op.batch_alter_table('spaces') as batch_op:
+        batch_op.drop_column('backfill_page')
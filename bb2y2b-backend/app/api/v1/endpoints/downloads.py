@@ -2,19 +2,26 @@
 下载任务管理API端点
 """
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import FileResponse, StreamingResponse
 from pathlib import Path
+import asyncio
+import json
 import os
 import re
+import zlib
 from sqlalchemy.orm import Session
 
-from app.services.download_manager import download_manager, TaskStatus
+from app.services.download_manager import download_manager, DownloadProgress, TaskStatus
 from app.core.database import get_db
-from app.models.video import Video
+from app.services.file_catalog import FileCatalogService
+from app.services.concurrency import concurrency_controller
+from app.services.job_queue import DownloadJobQueue, STATUS_DEFERRED, STATUS_PENDING, STATUS_RUNNING
 
 router = APIRouter()
 
+TASK_STREAM_KEEPALIVE = 15  # 无变化时发送心跳注释的间隔（秒）
+
 # 项目根目录 (bb2y2b-backend 的父目录)
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent.parent
 VIDEO_OUTPUT_PATH = PROJECT_ROOT / 'video'
@@ -35,16 +42,17 @@ if not VIDEO_OUTPUT_PATH.exists():
         SUBTITLE_OUTPUT_PATH = cwd / 'srt'
 
 
-def _extract_bvid_from_filename(filename: str) -> Optional[str]:
-    """从文件名提取bvid，格式如 BV1eemEBfEXq_1_1.mp3"""
-    match = re.match(r'^(BV[a-zA-Z0-9]+)', filename)
-    return match.group(1) if match else None
-
-
 @router.get("/tasks")
-async def get_all_tasks():
-    """获取所有下载任务"""
+def get_all_tasks(request: Request, response: Response, db: Session = Depends(get_db)):
+    """获取所有下载任务，包括队列中尚未被领取的任务（支持ETag，任务未变化时返回304）"""
+    queued = DownloadJobQueue(db).list_queued()
+    etag = _tasks_etag(queued)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=_etag_headers(etag))
     tasks = download_manager.get_all_tasks()
+    known = {task["task_id"] for task in tasks}
+    tasks += [_queued_task_dict(row) for row in queued if row.task_id not in known]
+    response.headers.update(_etag_headers(etag))
     return {
         "tasks": tasks,
         "total": len(tasks)
@@ -52,26 +60,87 @@ async def get_all_tasks():
 
 
 @router.get("/tasks/active")
-async def get_active_tasks():
-    """获取活跃的下载任务（下载中/合并中）"""
+def get_active_tasks(request: Request, response: Response):
+    """获取活跃的下载任务（下载中/合并中，支持ETag）"""
+    etag = _tasks_etag()
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=_etag_headers(etag))
     tasks = download_manager.get_active_tasks()
+    response.headers.update(_etag_headers(etag))
     return {
         "tasks": tasks,
         "total": len(tasks)
     }
 
 
+@router.get("/tasks/changes")
+def get_task_changes(
+    since: int = Query(0, ge=0, description="Version returned by the previous call, 0 for everything")
+):
+    """
+    获取某个版本之后变化的任务
+
+    返回 {"version", "reset", "tasks", "removed"}；客户端保存 version 作为下次的 since。
+    reset 为 true 时 tasks 是全部任务，客户端应先丢弃本地列表。
+    """
+    return download_manager.get_changes(since)
+
+
+@router.get("/tasks/stream")
+async def stream_tasks(
+    interval: float = Query(1.0, ge=0.2, le=10, description="Minimum seconds between two update events")
+):
+    """
+    以SSE推送任务进度
+
+    连接后先发送 snapshot 事件（与 /tasks 相同的全量列表），之后发送 update 事件，
+    data 为 {"tasks": {task_id: 变化的字段}, "removed": [task_id]}。
+    同一连接两次推送之间至少间隔 interval 秒，期间的变化合并发送。
+    """
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    subscription = download_manager.subscribe(lambda: loop.call_soon_threadsafe(changed.set))
+
+    async def events():
+        try:
+            # 使用共享状态后端时读取会访问数据库文件，放到线程中执行
+            snapshot = await asyncio.to_thread(subscription.snapshot, download_manager)
+            yield _sse_event("snapshot", snapshot)
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=TASK_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                changed.clear()
+                delta = await asyncio.to_thread(subscription.collect, download_manager)
+                if delta:
+                    yield _sse_event("update", delta)
+                await asyncio.sleep(interval)
+        finally:
+            download_manager.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/tasks/{task_id}")
-async def get_task(task_id: str):
-    """获取指定任务的详情"""
+def get_task(task_id: str, db: Session = Depends(get_db)):
+    """获取指定任务的详情（包括队列中尚未被领取的任务）"""
     task = download_manager.get_task(task_id)
-    if not task:
+    if task:
+        return task.to_dict()
+    queued = DownloadJobQueue(db).list_queued(task_id)
+    if not queued:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task.to_dict()
+    return _queued_task_dict(queued[0])
 
 
 @router.get("/tasks/bvid/{bvid}")
-async def get_task_by_bvid(bvid: str):
+def get_task_by_bvid(bvid: str):
     """根据bvid获取最新任务"""
     task = download_manager.get_task_by_bvid(bvid)
     if not task:
@@ -80,64 +149,76 @@ async def get_task_by_bvid(bvid: str):
 
 
 @router.delete("/tasks/{task_id}")
-async def remove_task(task_id: str):
-    """移除任务记录"""
+def remove_task(task_id: str, db: Session = Depends(get_db)):
+    """移除任务记录（排队或执行中的任务同时从下载队列中取消）"""
+    if DownloadJobQueue(db).cancel(task_id):
+        db.commit()
     download_manager.remove_task(task_id)
     return {"message": "Task removed"}
 
 
 @router.post("/tasks/clear-completed")
-async def clear_completed_tasks():
+def clear_completed_tasks():
     """清除已完成的任务"""
     download_manager.clear_completed()
     return {"message": "Completed tasks cleared"}
 
 
+@router.get("/metrics")
+def get_download_metrics(db: Session = Depends(get_db)):
+    """
+    下载并发调节器状态和队列长度
+
+    并发调节器运行在执行下载的进程中；DOWNLOAD_WORKER_MODE=external 时本进程的 concurrency 为空。
+    """
+    queue = DownloadJobQueue(db)
+    return {
+        "concurrency": concurrency_controller.get_stats(),
+        "queue": {
+            "pending": queue.count_by_status(STATUS_PENDING),
+            "deferred": queue.count_by_status(STATUS_DEFERRED),
+            "running": queue.count_by_status(STATUS_RUNNING),
+        },
+    }
+
+
 @router.get("/files")
-async def list_downloaded_files(db: Session = Depends(get_db)):
-    """列出已下载的文件"""
-    files = []
+def list_downloaded_files(
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1, description="Page size, all files when omitted"),
+    sort_by: str = Query("created_at", pattern="^(created_at|name|size)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    db: Session = Depends(get_db)
+):
+    """列出已下载的文件（查询文件目录表，支持分页和排序）"""
+    service = FileCatalogService(db)
+    rows, total = service.list_files(skip=skip, limit=limit, sort_by=sort_by, order=order)
     
-    # 扫描视频/音频目录
-    if VIDEO_OUTPUT_PATH.exists():
-        for f in VIDEO_OUTPUT_PATH.iterdir():
-            if f.is_file() and f.suffix in ['.mp3', '.mp4', '.m4a']:
-                stat = f.stat()
-                # 尝试找到对应的封面和字幕
-                cover_name = f.stem + '.jpg'
-                cover_path = COVER_OUTPUT_PATH / cover_name
-                subtitle_name = f.stem + '.txt'
-                subtitle_path = SUBTITLE_OUTPUT_PATH / subtitle_name
-                
-                # 从文件名提取bvid并查询数据库获取标题
-                bvid = _extract_bvid_from_filename(f.name)
-                title = None
-                if bvid:
-                    video = db.query(Video).filter(Video.bvid == bvid).first()
-                    if video:
-                        title = video.title
-                
-                files.append({
-                    "name": f.name,
-                    "path": str(f),
-                    "size": stat.st_size,
-                    "size_formatted": _format_size(stat.st_size),
-                    "created_at": stat.st_ctime,
-                    "type": f.suffix[1:],
-                    "bvid": bvid,
-                    "title": title,
-                    "cover_path": str(cover_path) if cover_path.exists() else None,
-                    "cover_url": f"/api/v1/downloads/cover/{cover_name}" if cover_path.exists() else None,
-                    "subtitle_path": str(subtitle_path) if subtitle_path.exists() else None,
-                    "has_subtitle": subtitle_path.exists()
-                })
-    
-    # 按创建时间倒序排列
-    files.sort(key=lambda x: x['created_at'], reverse=True)
+    files = []
+    for f, title in rows:
+        files.append({
+            "name": f.name,
+            "path": f.path,
+            "size": f.size,
+            "size_formatted": _format_size(f.size),
+            "created_at": f.file_ctime,
+            "type": f.format,
+            "bvid": f.bvid,
+            "title": title,
+            "start_p": f.start_p,
+            "end_p": f.end_p,
+            "duration": f.duration,
+            "cover_path": str(COVER_OUTPUT_PATH / f.cover_name) if f.cover_name else None,
+            "cover_url": f"/api/v1/downloads/cover/{f.cover_name}" if f.cover_name else None,
+            "subtitle_path": str(SUBTITLE_OUTPUT_PATH / f.subtitle_name) if f.subtitle_name else None,
+            "has_subtitle": bool(f.subtitle_name)
+        })
     
     return {
         "files": files,
-        "total": len(files)
+        "total": total,
+        "skip": skip,
+        "limit": limit
     }
 
 
@@ -249,7 +330,7 @@ async def get_cover(filename: str):
 
 
 @router.get("/subtitle/{filename}")
-async def get_subtitle(filename: str):
+def get_subtitle(filename: str):
     """获取字幕内容"""
     subtitle_path = SUBTITLE_OUTPUT_PATH / filename
     if not subtitle_path.exists():
@@ -283,21 +364,65 @@ async def download_subtitle(filename: str):
 
 
 @router.delete("/file/{filename}")
-async def delete_file(filename: str):
-    """删除下载的文件"""
-    file_path = VIDEO_OUTPUT_PATH / filename
-    if file_path.exists():
-        os.remove(file_path)
-    
-    # 同时删除封面
-    cover_name = Path(filename).stem + '.jpg'
-    cover_path = COVER_OUTPUT_PATH / cover_name
-    if cover_path.exists():
-        os.remove(cover_path)
+def delete_file(filename: str, db: Session = Depends(get_db)):
+    """删除下载的文件（同时删除文件目录记录，删除文件失败时回滚）"""
+    FileCatalogService(db).remove(filename)
+    try:
+        file_path = VIDEO_OUTPUT_PATH / filename
+        if file_path.exists():
+            os.remove(file_path)
+        
+        # 同时删除封面
+        cover_name = Path(filename).stem + '.jpg'
+        cover_path = COVER_OUTPUT_PATH / cover_name
+        if cover_path.exists():
+            os.remove(cover_path)
+    except OSError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to delete file: {e}")
+    db.commit()
     
     return {"message": "File deleted"}
 
 
+def _tasks_etag(queued=()) -> str:
+    # 先取版本号再生成列表：并发更新时ETag只会偏旧，下次请求重新获取，不会误返回304
+    tag = str(download_manager.version)
+    if queued:
+        # 队列中的任务不在下载管理器中，入队、领取和取消不会改变版本号
+        digest = zlib.crc32(";".join(f"{row.task_id}:{row.status}" for row in queued).encode())
+        tag += f"-{digest:x}"
+    return f'W/"{tag}"'
+
+
+def _queued_task_dict(row) -> dict:
+    """队列中尚未被领取的任务，字段与下载管理器中的任务一致"""
+    record = DownloadProgress(
+        task_id=row.task_id,
+        bvid=row.bvid,
+        title=row.title or "",
+        stage_message="等待负载恢复" if row.status == STATUS_DEFERRED else "排队中",
+    )
+    return {**record.to_dict(), "status": row.status, "priority": row.priority}
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def _etag_headers(etag: str) -> dict:
+    # no-cache 让浏览器每次都带 If-None-Match 重新验证
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def _sse_event(event: str, data) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 def _format_size(size: int) -> str:
     """格式化文件大小"""
     if size < 1024:
@@ -1,92 +1,139 @@
 """
 UP主空间管理API端点
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.schemas.space import SpaceCreate, SpaceUpdate, SpaceResponse
-from app.services.space import SpaceService
+from app.services.space import SpaceService, SCAN_MODE_INCREMENTAL, SCAN_MODE_FULL
+from app.services.scan_scheduler import scan_scheduler
+from app.services.bulk_scan import bulk_scan_manager
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[SpaceResponse])
-async def get_spaces(
+def get_spaces(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by creation time, newest first by default"),
     db: Session = Depends(get_db)
 ):
-    """获取UP主空间列表"""
+    """获取UP主空间列表（传cursor时使用游标分页，忽略skip）"""
     service = SpaceService(db)
-    return await service.get_spaces(skip=skip, limit=limit)
+    try:
+        items, next_cursor = service.get_spaces(skip=skip, limit=limit, cursor=cursor, order=order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
 
 
 @router.post("/", response_model=SpaceResponse)
-async def create_space(
+def create_space(
     space_data: SpaceCreate,
     db: Session = Depends(get_db)
 ):
     """创建新的UP主空间配置"""
     service = SpaceService(db)
-    return await service.create_space(space_data)
+    return service.create_space(space_data)
+
+
+@router.get("/schedule")
+async def get_scan_schedule():
+    """获取定时扫描调度状态"""
+    schedules = scan_scheduler.get_status()
+    return {
+        "schedules": schedules,
+        "total": len(schedules)
+    }
+
+
+@router.post("/scan-all")
+def scan_all_spaces(db: Session = Depends(get_db)):
+    """并发扫描所有启用的空间（最久未扫描的优先）"""
+    job = bulk_scan_manager.start_scan_all(db)
+    return {
+        "message": "Scan of all active spaces started",
+        "task_id": job.task_id,
+        "total_spaces": len(job.spaces)
+    }
+
+
+@router.get("/scan-all/{task_id}")
+async def get_scan_all_progress(task_id: str):
+    """获取批量扫描的总体及各空间进度"""
+    job = bulk_scan_manager.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan task not found")
+    return job.to_dict()
 
 
 @router.get("/{space_id}", response_model=SpaceResponse)
-async def get_space(
+def get_space(
     space_id: str,
     db: Session = Depends(get_db)
 ):
     """获取指定UP主空间详情"""
     service = SpaceService(db)
-    space = await service.get_space_by_id(space_id)
+    space = service.get_space_by_id(space_id)
     if not space:
         raise HTTPException(status_code=404, detail="Space not found")
     return space
 
 
 @router.put("/{space_id}", response_model=SpaceResponse)
-async def update_space(
+def update_space(
     space_id: str,
     space_data: SpaceUpdate,
     db: Session = Depends(get_db)
 ):
     """更新UP主空间配置"""
     service = SpaceService(db)
-    space = await service.update_space(space_id, space_data)
+    space = service.update_space(space_id, space_data)
     if not space:
         raise HTTPException(status_code=404, detail="Space not found")
     return space
 
 
 @router.delete("/{space_id}")
-async def delete_space(
+def delete_space(
     space_id: str,
     db: Session = Depends(get_db)
 ):
     """删除UP主空间配置"""
     service = SpaceService(db)
-    success = await service.delete_space(space_id)
+    success = service.delete_space(space_id)
     if not success:
         raise HTTPException(status_code=404, detail="Space not found")
     return {"message": "Space deleted successfully"}
 
 
 @router.post("/{space_id}/scan")
-async def scan_space(
+def scan_space(
     space_id: str,
+    mode: str = Query(
+        SCAN_MODE_INCREMENTAL,
+        description="扫描模式: incremental(遇到已知视频即停止) / full(全量回填，可断点续扫)"
+    ),
     db: Session = Depends(get_db)
 ):
-    """扫描UP主空间获取视频列表"""
+    """发起UP主空间扫描（后台执行，立即返回任务ID，进度通过 /tasks/{task_id} 查询）"""
+    if mode not in (SCAN_MODE_INCREMENTAL, SCAN_MODE_FULL):
+        raise HTTPException(status_code=400, detail=f"Invalid scan mode: {mode}")
     service = SpaceService(db)
-    result = await service.scan_space(space_id)
+    result = service.scan_space(space_id, mode=mode)
     if not result:
         raise HTTPException(status_code=404, detail="Space not found")
     return {
-        "message": "Space scan completed",
+        "message": "Space scan already running" if result.get("already_running") else "Space scan started",
         "task_id": result.get("task_id"),
-        "total_found": result.get("total_found", 0),
-        "new_videos": result.get("new_videos", 0),
-        "updated_videos": result.get("updated_videos", 0)
-    }
\ No newline at end of file
+        "status": result.get("status"),
+        "mode": result.get("mode")
+    }
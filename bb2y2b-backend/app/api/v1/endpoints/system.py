@@ -1,109 +1,126 @@
 """
 系统管理API端点
 """
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.schemas.system_config import SystemConfigCreate, SystemConfigUpdate, SystemConfigResponse
 from app.services.system import SystemService
+from app.core.loop_monitor import loop_monitor
 
 router = APIRouter()
 
 
 @router.get("/status")
-async def get_system_status(db: Session = Depends(get_db)):
+def get_system_status(db: Session = Depends(get_db)):
     """获取系统运行状态"""
     service = SystemService(db)
-    return await service.get_system_status()
+    return service.get_system_status()
+
+
+@router.get("/event-loop")
+async def get_event_loop_stats():
+    """获取事件循环延迟统计（用于发现阻塞事件循环的调用）"""
+    return loop_monitor.get_stats()
 
 
 @router.get("/stats")
-async def get_system_stats(db: Session = Depends(get_db)):
+def get_system_stats(db: Session = Depends(get_db)):
     """获取系统统计信息"""
     service = SystemService(db)
-    return await service.get_system_stats()
+    return service.get_system_stats()
 
 
 @router.get("/configs", response_model=List[SystemConfigResponse])
-async def get_configs(
+def get_configs(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by creation time, newest first by default"),
     db: Session = Depends(get_db)
 ):
-    """获取系统配置列表"""
+    """获取系统配置列表（传cursor时使用游标分页，忽略skip）"""
     service = SystemService(db)
-    return await service.get_configs(skip=skip, limit=limit)
+    try:
+        items, next_cursor = service.get_configs(skip=skip, limit=limit, cursor=cursor, order=order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
 
 
 @router.post("/configs", response_model=SystemConfigResponse)
-async def create_config(
+def create_config(
     config_data: SystemConfigCreate,
     db: Session = Depends(get_db)
 ):
     """创建新的系统配置"""
     service = SystemService(db)
     try:
-        return await service.create_config(config_data)
+        return service.create_config(config_data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/configs/{config_key}", response_model=SystemConfigResponse)
-async def get_config(
+def get_config(
     config_key: str,
     db: Session = Depends(get_db)
 ):
     """获取指定系统配置"""
     service = SystemService(db)
-    config = await service.get_config_by_key(config_key)
+    config = service.get_config_by_key(config_key)
     if not config:
         raise HTTPException(status_code=404, detail="Config not found")
     return config
 
 
 @router.put("/configs/{config_key}", response_model=SystemConfigResponse)
-async def update_config(
+def update_config(
     config_key: str,
     config_data: SystemConfigUpdate,
     db: Session = Depends(get_db)
 ):
     """更新系统配置"""
     service = SystemService(db)
-    config = await service.update_config(config_key, config_data)
+    config = service.update_config(config_key, config_data)
     if not config:
         raise HTTPException(status_code=404, detail="Config not found")
     return config
 
 
 @router.delete("/configs/{config_key}")
-async def delete_config(
+def delete_config(
     config_key: str,
     db: Session = Depends(get_db)
 ):
     """删除系统配置"""
     service = SystemService(db)
-    success = await service.delete_config(config_key)
+    success = service.delete_config(config_key)
     if not success:
         raise HTTPException(status_code=404, detail="Config not found")
     return {"message": "Config deleted successfully"}
 
 
 @router.get("/configs/{config_key}/value")
-async def get_config_value(
+def get_config_value(
     config_key: str,
     default_value: str = None,
     db: Session = Depends(get_db)
 ):
     """获取配置值"""
     service = SystemService(db)
-    value = await service.get_config_value(config_key, default_value)
+    value = service.get_config_value(config_key, default_value)
     return {"config_key": config_key, "config_value": value}
 
 
 @router.post("/configs/{config_key}/value")
-async def set_config_value(
+def set_config_value(
     config_key: str,
     config_value: str,
     description: str = None,
@@ -111,5 +128,5 @@ async def set_config_value(
 ):
     """设置配置值"""
     service = SystemService(db)
-    config = await service.set_config_value(config_key, config_value, description)
+    config = service.set_config_value(config_key, config_value, description)
     return config
\ No newline at end of file
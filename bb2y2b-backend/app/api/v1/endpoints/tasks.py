@@ -2,10 +2,11 @@
 任务管理API端点
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.schemas.task import TaskResponse
 from app.services.task import TaskService
 
@@ -13,57 +14,68 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[TaskResponse])
-async def get_tasks(
+def get_tasks(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = Query(None, description="Filter by status"),
     task_type: Optional[str] = Query(None, description="Filter by task type"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by creation time, newest first by default"),
     db: Session = Depends(get_db)
 ):
-    """获取任务列表"""
+    """获取任务列表（传cursor时使用游标分页，忽略skip）"""
     service = TaskService(db)
-    return await service.get_tasks(
-        skip=skip, 
-        limit=limit, 
-        status=status, 
-        task_type=task_type
-    )
+    try:
+        items, next_cursor = service.get_tasks(
+            skip=skip, 
+            limit=limit, 
+            status=status, 
+            task_type=task_type,
+            cursor=cursor,
+            order=order
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
 
 
 @router.get("/{task_id}", response_model=TaskResponse)
-async def get_task(
+def get_task(
     task_id: str,
     db: Session = Depends(get_db)
 ):
     """获取指定任务详情"""
     service = TaskService(db)
-    task = await service.get_task_by_id(task_id)
+    task = service.get_task_by_id(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
 
 @router.post("/{task_id}/cancel")
-async def cancel_task(
+def cancel_task(
     task_id: str,
     db: Session = Depends(get_db)
 ):
     """取消指定任务"""
     service = TaskService(db)
-    success = await service.cancel_task(task_id)
+    success = service.cancel_task(task_id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found or cannot be cancelled")
     return {"message": "Task cancelled successfully"}
 
 
 @router.get("/{task_id}/status")
-async def get_task_status(
+def get_task_status(
     task_id: str,
     db: Session = Depends(get_db)
 ):
     """获取任务状态"""
     service = TaskService(db)
-    status = await service.get_task_status(task_id)
+    status = service.get_task_status(task_id)
     if not status:
         raise HTTPException(status_code=404, detail="Task not found")
     return status
\ No newline at end of file
@@ -2,92 +2,159 @@
 视频管理API端点
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.schemas.video import VideoCreate, VideoUpdate, VideoResponse
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.schemas.video import (
+    VideoCreate, VideoUpdate, VideoResponse, VideoBulkRequest, VideoBulkResponse, VideoSearchResult
+)
 from app.services.video import VideoService
+from app.services.search import VideoSearchService
+from app.services.job_queue import PRIORITIES, PRIORITY_INTERACTIVE
+from app.services.admission import DownloadRejected
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[VideoResponse])
-async def get_videos(
+def get_videos(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = Query(None, description="Filter by status"),
     video_type: Optional[str] = Query(None, description="Filter by video type"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by creation time, newest first by default"),
     db: Session = Depends(get_db)
 ):
-    """获取视频列表"""
+    """获取视频列表（传cursor时使用游标分页，忽略skip）"""
     service = VideoService(db)
-    return await service.get_videos(
-        skip=skip, 
-        limit=limit, 
-        status=status, 
-        video_type=video_type
-    )
+    try:
+        items, next_cursor = service.get_videos(
+            skip=skip, 
+            limit=limit, 
+            status=status, 
+            video_type=video_type,
+            cursor=cursor,
+            order=order
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
+
+
+@router.get("/search", response_model=List[VideoSearchResult])
+def search_videos(
+    q: str = Query(..., min_length=1, description="Search keywords, space separated"),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """全文搜索视频标题、简介和AI字幕，按相关度排序"""
+    service = VideoSearchService(db)
+    results = []
+    for hit in service.search(q, skip=skip, limit=limit):
+        item = VideoSearchResult.model_validate(hit["video"])
+        item.score = hit["score"]
+        item.snippet = hit["snippet"]
+        results.append(item)
+    return results
 
 
 @router.post("/", response_model=VideoResponse)
-async def create_video(
+def create_video(
     video_data: VideoCreate,
     db: Session = Depends(get_db)
 ):
     """手动添加视频到下载列表"""
     service = VideoService(db)
-    return await service.create_video(video_data)
+    return service.create_video(video_data)
+
+
+@router.post("/bulk", response_model=VideoBulkResponse)
+def bulk_videos(
+    request: VideoBulkRequest,
+    db: Session = Depends(get_db)
+):
+    """批量创建/更新/删除视频（单个事务，逐条返回结果）"""
+    service = VideoService(db)
+    try:
+        return service.bulk_apply(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{video_id}", response_model=VideoResponse)
-async def get_video(
+def get_video(
     video_id: str,
     db: Session = Depends(get_db)
 ):
     """获取指定视频详情"""
     service = VideoService(db)
-    video = await service.get_video_by_id(video_id)
+    video = service.get_video_by_id(video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     return video
 
 
 @router.put("/{video_id}", response_model=VideoResponse)
-async def update_video(
+def update_video(
     video_id: str,
     video_data: VideoUpdate,
     db: Session = Depends(get_db)
 ):
     """更新视频信息"""
     service = VideoService(db)
-    video = await service.update_video(video_id, video_data)
+    video = service.update_video(video_id, video_data)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     return video
 
 
 @router.delete("/{video_id}")
-async def delete_video(
+def delete_video(
     video_id: str,
     db: Session = Depends(get_db)
 ):
     """删除视频记录"""
     service = VideoService(db)
-    success = await service.delete_video(video_id)
+    success = service.delete_video(video_id)
     if not success:
         raise HTTPException(status_code=404, detail="Video not found")
     return {"message": "Video deleted successfully"}
 
 
 @router.post("/{video_id}/download")
-async def start_download(
+def start_download(
     video_id: str,
+    priority: str = Query(
+        PRIORITY_INTERACTIVE,
+        description="优先级类别: interactive(手动发起) / scheduled(定时任务) / backfill(批量回填)"
+    ),
     db: Session = Depends(get_db)
 ):
-    """开始下载指定视频"""
+    """
+    开始下载指定视频
+
+    空间扫描不会自动发起下载，批量下载扫描结果的客户端应传 scheduled 或 backfill，
+    避免占用手动下载的名额。
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority: {priority}")
     service = VideoService(db)
-    result = await service.start_download(video_id)
+    try:
+        result = service.start_download(video_id, priority=priority)
+    except DownloadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
     if not result:
         raise HTTPException(status_code=404, detail="Video not found")
-    return {"message": "Download started", "task_id": result.get("task_id")}
\ No newline at end of file
+    return {
+        "message": "Download deferred" if result.get("status") == "deferred" else "Download started",
+        "task_id": result.get("task_id"),
+        "status": result.get("status"),
+        "priority": result.get("priority"),
+    }
\ No newline at end of file
@@ -1,19 +1,75 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Generator
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from typing import Generator
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# SQLite连接时设置的PRAGMA
+# WAL模式下读不阻塞写、写不阻塞读；synchronous=NORMAL 在WAL下仍能保证一致性
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 30000,  # 毫秒，等待写锁而不是立即报 "database is locked"
+    "cache_size": -64000,  # 负数表示KB，约64MB页缓存
+    "mmap_size": 268435456,  # 256MB内存映射读
+    "temp_store": "MEMORY",
+}
+
+# SQLite连接池大小：WAL下读连接可以并发，需覆盖API线程池和后台线程
+SQLITE_POOL_SIZE = 20
+SQLITE_MAX_OVERFLOW = 20
+
+
+def is_sqlite_url(url: str) -> bool:
+    """是否为SQLite数据库URL"""
+    return url.startswith("sqlite")
+
+
+def _create_engine(url: str):
+    """根据数据库类型创建引擎"""
+    if not is_sqlite_url(url):
+        return create_engine(
+            url,
+            pool_pre_ping=True,
+            pool_recycle=300,
+        )
+
+    in_memory = url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+    sqlite_engine = create_engine(
+        url,
+        # 连接会在API线程池和后台线程之间传递
+        connect_args={"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000},
+        # 内存数据库只能共享同一个连接
+        poolclass=StaticPool if in_memory else QueuePool,
+        **({} if in_memory else {"pool_size": SQLITE_POOL_SIZE, "max_overflow": SQLITE_MAX_OVERFLOW}),
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            if in_memory and name in ("journal_mode", "mmap_size"):
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return sqlite_engine
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
+engine = _create_engine(settings.DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -30,4 +86,73 @@ def get_db() -> Generator:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class DatabaseWriteQueue:
+    """
+    后台写入队列 - 由单个线程按提交顺序执行写操作
+
+    SQLite同一时间只允许一个写事务，后台线程各自写库会互相等待写锁。
+    下载、扫描等后台任务把写操作提交到这里串行执行，API请求的读操作不受影响。
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: threading.Thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, func: Callable[[Session], Any]) -> Future:
+        """
+        提交写操作
+
+        Args:
+            func: 接收Session的函数，执行完成后自动提交，异常时回滚
+
+        Returns:
+            Future，可通过 result() 等待执行结果
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((func, future))
+        return future
+
+    def run(self, func: Callable[[Session], Any], timeout: float = None) -> Any:
+        """提交写操作并等待结果"""
+        return self.submit(func).result(timeout=timeout)
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._worker, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        """写线程：复用同一个Session依次执行写操作"""
+        db = self._session_factory()
+        try:
+            while True:
+                func, future = self._queue.get()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = func(db)
+                    db.commit()
+                    future.set_result(result)
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"后台写入失败: {e}")
+                    future.set_exception(e)
+                finally:
+                    # 不在写线程中缓存ORM对象，避免读到过期数据
+                    db.expunge_all()
+        finally:
+            db.close()
+
+
+# 单例实例
+write_queue = DatabaseWriteQueue()
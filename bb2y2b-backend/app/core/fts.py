@@ -0,0 +1,31 @@
+"""
+全文索引分词 - 把中日韩文字切成相邻两个字的二元词，交给FTS5的unicode61分词器
+
+unicode61按空格和标点分词，连续的中文会被当作一个词；写入索引前先切成二元词
+（"睡前故事" -> "睡前 前故 故事"），两个字的查询也能走MATCH并按bm25排序。
+切分在应用中完成（见 app.services.search.index_videos），索引触发器不依赖自定义SQL函数。
+"""
+import re
+
+# 中日韩文字（不含标点），连续出现时切分为二元词
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+
+
+def _bigrams(match: re.Match) -> str:
+    run = match.group()
+    if len(run) == 1:
+        return f" {run} "
+    return " " + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + " "
+
+
+def segment_bigrams(text: str) -> str:
+    """把文本中的中日韩文字切成二元词，其他字符保持不变，空白统一为单个空格"""
+    if not text:
+        return ""
+    return " ".join(_CJK_RUN.sub(_bigrams, text).split())
+
+
+def is_cjk_token(token: str) -> bool:
+    """是否为 segment_bigrams 切出的中日韩词"""
+    return bool(token) and _CJK_RUN.fullmatch(token) is not None
+
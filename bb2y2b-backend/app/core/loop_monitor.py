@@ -0,0 +1,90 @@
+"""
+事件循环延迟监控 - 发现阻塞事件循环的同步调用
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.1  # 采样周期（秒）
+LAG_WARN_THRESHOLD = 0.1  # 单次延迟超过该值（秒）视为阻塞
+WINDOW_SIZE = 600  # 保留的采样数（约最近1分钟）
+WARN_LOG_INTERVAL = 10  # 告警日志最小间隔（秒），避免刷屏
+
+
+class EventLoopLagMonitor:
+    """事件循环延迟监控器"""
+
+    def __init__(self):
+        self._samples: deque = deque(maxlen=WINDOW_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self._blocked_count = 0
+        self._max_lag = 0.0
+        self._last_warn_at = 0.0
+
+    def start(self):
+        """启动监控"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止监控"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """按固定周期休眠，实际唤醒时间与预期的差值即为事件循环延迟"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + SAMPLE_INTERVAL
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            lag = max(0.0, loop.time() - expected)
+            self._record(lag)
+
+    def _record(self, lag: float):
+        """记录一次采样"""
+        self._samples.append(lag)
+        self._max_lag = max(self._max_lag, lag)
+        if lag >= LAG_WARN_THRESHOLD:
+            self._blocked_count += 1
+            now = time.time()
+            if now - self._last_warn_at >= WARN_LOG_INTERVAL:
+                self._last_warn_at = now
+                logger.warning(
+                    f"事件循环被阻塞 {lag * 1000:.0f}ms，"
+                    f"可能有同步I/O在async函数中执行（累计 {self._blocked_count} 次）"
+                )
+
+    def get_stats(self) -> Dict:
+        """获取延迟统计（毫秒）"""
+        samples = sorted(self._samples)
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            idx = min(len(samples) - 1, int(len(samples) * p))
+            return round(samples[idx] * 1000, 2)
+
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "samples": len(samples),
+            "lag_p50_ms": percentile(0.5),
+            "lag_p99_ms": percentile(0.99),
+            "lag_window_max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+            "lag_max_ms": round(self._max_lag * 1000, 2),
+            "blocked_count": self._blocked_count,
+            "threshold_ms": LAG_WARN_THRESHOLD * 1000,
+        }
+
+
+# 单例实例
+loop_monitor = EventLoopLagMonitor()
@@ -0,0 +1,86 @@
+"""
+列表分页 - 基于排序键的游标分页（keyset），保留 skip/limit 兼容模式
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, String, and_, or_, type_coerce
+from sqlalchemy.orm import Query
+
+# 下一页游标通过响应头返回，响应体保持列表结构不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any], descending: bool = False) -> str:
+    """将排序键的值和排序方向编码为不透明游标"""
+    keys = [v.isoformat(sep=" ") if isinstance(v, datetime) else v for v in values]
+    payload = {"k": keys, "d": "desc" if descending else "asc"}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int, descending: bool = False) -> List[Any]:
+    """解码游标，格式不正确或与当前排序方向不一致时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("k"), list) or len(payload["k"]) != size:
+        raise ValueError("Invalid cursor")
+    if payload.get("d") != ("desc" if descending else "asc"):
+        raise ValueError("Cursor does not match the requested order")
+    return payload["k"]
+
+
+def paginate(
+    query: Query,
+    order_by: Sequence,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    按固定排序分页
+
+    Args:
+        query: 已加过滤条件的查询
+        order_by: 排序列，最后一列必须唯一（通常是主键id）
+        skip: 偏移量，仅在未传游标时使用（兼容模式）
+        limit: 每页条数
+        cursor: 上一页返回的游标（须与本次的排序方向一致）
+        descending: 所有排序列按降序排列
+
+    Returns:
+        (本页记录, 下一页游标)，没有下一页时游标为None
+    """
+    # 游标中保存排序列在数据库中的原始值：SQLite的 CURRENT_TIMESTAMP 不带微秒，
+    # 用datetime参数比较会因字符串格式不同而漏掉/重复边界上的记录
+    raw_keys = [
+        type_coerce(column, String) if isinstance(column.type, DateTime) else column
+        for column in order_by
+    ]
+    query = query.order_by(*[column.desc() if descending else column for column in order_by])
+
+    if cursor:
+        values = decode_cursor(cursor, len(order_by), descending)
+        # 升序：(a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)；降序时比较方向相反
+        conditions = []
+        for i, key in enumerate(raw_keys):
+            after = key < values[i] if descending else key > values[i]
+            equal = [raw_keys[j] == values[j] for j in range(i)]
+            conditions.append(and_(*equal, after) if equal else after)
+        query = query.filter(or_(*conditions))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.add_columns(*raw_keys).limit(limit + 1).all()
+    items = [row[0] for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(list(rows[limit - 1][1:]), descending)
+    return items, next_cursor
@@ -4,11 +4,23 @@ BB2Y2B Backend API Main Application
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
 from app.core.config import settings
 from app.core.database import engine
+from app.core.loop_monitor import loop_monitor
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.models import Base
 from app.api.v1.api import api_router
+from app.services.scan_scheduler import scan_scheduler, SCAN_SCHEDULER_ENABLED
+from app.services.config_cache import config_cache
+from app.services.search import ensure_search_index
+from app.services.file_catalog import catalog_reconciler
+from app.services.download_manager import download_manager
+from app.services.task_state import create_task_state_backend
+from app.services.task_persistence import task_write_behind
+from app.services.download_worker import download_worker, DOWNLOAD_WORKER_MODE
+from app.services.concurrency import concurrency_controller
 
 
 @asynccontextmanager
@@ -16,9 +28,32 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     print("Starting BB2Y2B Backend API...")
+    loop_monitor.start()
+    await asyncio.to_thread(config_cache.load)
+    await asyncio.to_thread(ensure_search_index)
+    if SCAN_SCHEDULER_ENABLED:
+        scan_scheduler.start()
+    catalog_reconciler.start()
+    task_state = create_task_state_backend()
+    if task_state:
+        await asyncio.to_thread(task_state.start, download_manager)
+        download_manager.attach_state_backend(task_state)
+    task_write_behind.start(download_manager)
+    if DOWNLOAD_WORKER_MODE == "embedded":
+        download_worker.start()
+        concurrency_controller.start(download_worker)
     yield
     # Shutdown
     print("Shutting down BB2Y2B Backend API...")
+    concurrency_controller.stop()
+    download_worker.stop()
+    await asyncio.to_thread(task_write_behind.stop)
+    if task_state:
+        download_manager.detach_state_backend()
+        await asyncio.to_thread(task_state.stop)
+    catalog_reconciler.stop()
+    await scan_scheduler.stop()
+    await loop_monitor.stop()
 
 
 app = FastAPI(
@@ -36,6 +71,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include API router
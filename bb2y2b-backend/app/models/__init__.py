@@ -9,6 +9,7 @@ from app.models.ai_provider import AIProvider
 from app.models.prompt_template import PromptTemplate
 from app.models.ai_analysis_log import AIAnalysisLog
 from app.models.system_config import SystemConfig
+from app.models.downloaded_file import DownloadedFile
 
 __all__ = [
     "Base", 
@@ -18,5 +19,6 @@ __all__ = [
     "AIProvider", 
     "PromptTemplate",
     "AIAnalysisLog",
-    "SystemConfig"
+    "SystemConfig",
+    "DownloadedFile"
 ]
\ No newline at end of file
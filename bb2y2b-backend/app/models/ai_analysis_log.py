@@ -1,7 +1,7 @@
 """
 AI分析日志数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,9 @@ from app.core.database import Base
 class AIAnalysisLog(Base):
     """AI分析日志模型"""
     __tablename__ = "ai_analysis_logs"
+    __table_args__ = (
+        Index("ix_ai_analysis_logs_video_id_created_at", "video_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)
@@ -0,0 +1,28 @@
+"""
+已下载文件目录数据模型
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, BigInteger, Float
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class DownloadedFile(Base):
+    """已下载文件模型（video目录下的音频/视频文件及其封面、字幕）"""
+    __tablename__ = "downloaded_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), unique=True, index=True, nullable=False)  # video目录下的文件名
+    path = Column(Text, nullable=False)
+    bvid = Column(String(50), index=True, nullable=True)
+    start_p = Column(Integer, nullable=True)
+    end_p = Column(Integer, nullable=True)
+    format = Column(String(10), nullable=True)  # mp3, mp4, m4a
+    size = Column(BigInteger, nullable=False, default=0, index=True)
+    duration = Column(Float, nullable=True)  # 秒
+    cover_name = Column(String(255), nullable=True)  # cover目录下的文件名
+    subtitle_name = Column(String(255), nullable=True)  # srt目录下的文件名
+    file_ctime = Column(Float, nullable=False, index=True)  # 文件创建时间戳（列表默认排序）
+    file_mtime = Column(Float, nullable=False)  # 用于增量校对
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
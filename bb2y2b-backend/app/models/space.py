@@ -1,7 +1,7 @@
 """
 UP主空间数据模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,9 @@ from app.core.database import Base
 class Space(Base):
     """UP主空间模型"""
     __tablename__ = "spaces"
+    __table_args__ = (
+        Index("ix_spaces_is_active_last_scan_time", "is_active", "last_scan_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     space_id = Column(String(50), unique=True, index=True, nullable=False)
@@ -21,6 +24,7 @@ class Space(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     last_scan_time = Column(DateTime(timezone=True), nullable=True)
+    backfill_page = Column(Integer, nullable=True)  # 全量回填断点：下次从该页继续，没有进行中的回填时为空
 
     # Relationships
     videos = relationship("Video", back_populates="space", cascade="all, delete-orphan")
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 任务数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,11 @@ from app.core.database import Base
 class Task(Base):
     """任务模型"""
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_status_task_type", "status", "task_type"),
+        Index("ix_tasks_task_type_status_lease", "task_type", "status", "lease_expires_at"),
+        Index("ix_tasks_task_type_priority_status", "task_type", "priority", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(String(100), unique=True, index=True, nullable=False)
@@ -19,8 +24,17 @@ class Task(Base):
     status = Column(String(50), default="pending")
     progress = Column(Float, default=0.0)
     error_message = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
+    # 任务队列：worker领取任务后持有租约，定期心跳续期；租约过期的任务可被其他worker重新领取
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # 下载任务的优先级类别：interactive / scheduled / backfill（见 app.services.job_queue）
+    priority = Column(String(20), nullable=True)
+
     # Relationships
     video = relationship("Video", back_populates="tasks")
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 视频数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, BigInteger, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, BigInteger, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,10 @@ from app.core.database import Base
 class Video(Base):
     """视频模型"""
     __tablename__ = "videos"
+    __table_args__ = (
+        Index("ix_videos_status_video_type", "status", "video_type"),
+        Index("ix_videos_space_id_created_at", "space_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     bvid = Column(String(50), unique=True, index=True, nullable=False)  # B站BV号
@@ -21,7 +25,7 @@ class Video(Base):
     cover_url = Column(Text, nullable=True)  # 原始封面URL
     video_type = Column(String(50), nullable=True)
     space_id = Column(Integer, ForeignKey("spaces.id"), nullable=True)
-    status = Column(String(50), default="pending")  # pending, downloading, downloaded, uploading, uploaded
+    status = Column(String(50), default="pending")  # pending, queued, downloading, downloaded, uploading, uploaded
     start_p = Column(Integer, nullable=True)
     end_p = Column(Integer, nullable=True)
     duration = Column(String(20), nullable=True)  # 时长字符串如 "10:30"
@@ -32,7 +36,7 @@ class Video(Base):
     youtube_id = Column(String(50), nullable=True)
     youtube_url = Column(Text, nullable=True)
     upload_time = Column(DateTime(timezone=True), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
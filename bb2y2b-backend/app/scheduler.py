@@ -0,0 +1,38 @@
+"""
+独立空间扫描调度器入口 - 按投稿频率定时扫描所有启用的空间
+
+多个API进程（如 uvicorn --workers N）都内嵌调度器时，每个空间会被重复扫描N次。
+这种部署下API进程设置 SCAN_SCHEDULER_ENABLED=false，只运行一个本进程。
+
+用法: python -m app.scheduler
+"""
+import signal
+import asyncio
+import logging
+
+from app.services.scan_scheduler import scan_scheduler
+from app.services.search import ensure_search_index
+
+
+async def run():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    scan_scheduler.start()
+    await stop.wait()
+
+    logging.info("正在停止空间扫描调度器...")
+    await scan_scheduler.stop()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # 扫描入库后要写入搜索索引
+    ensure_search_index()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
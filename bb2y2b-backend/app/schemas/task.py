@@ -19,6 +19,7 @@ class TaskResponse(TaskBase):
     status: str
     progress: float
     error_message: Optional[str] = None
+    priority: Optional[str] = None
     created_at: datetime
     completed_at: Optional[datetime] = None
 
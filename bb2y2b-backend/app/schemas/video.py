@@ -1,7 +1,7 @@
 """
 视频Pydantic模式
 """
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -33,6 +33,35 @@ class VideoUpdate(BaseModel):
     status: Optional[str] = None
 
 
+class VideoBulkUpdateItem(VideoUpdate):
+    """批量更新中的单条记录"""
+    bvid: str = Field(..., description="B站BV号")
+
+
+class VideoBulkRequest(BaseModel):
+    """批量操作请求（按 create -> update -> delete 的顺序执行）"""
+    create: List[VideoCreate] = Field(default_factory=list, description="要创建的视频")
+    update: List[VideoBulkUpdateItem] = Field(default_factory=list, description="要更新的视频")
+    delete: List[str] = Field(default_factory=list, description="要删除的视频BV号")
+
+
+class VideoBulkItemResult(BaseModel):
+    """批量操作中单条记录的结果"""
+    op: str
+    bvid: str
+    status: str  # created, updated, deleted, exists, not_found, duplicate
+    error: Optional[str] = None
+
+
+class VideoBulkResponse(BaseModel):
+    """批量操作响应"""
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
+    results: List[VideoBulkItemResult] = Field(default_factory=list)
+
+
 class VideoResponse(BaseModel):
     """视频响应模式"""
     id: int
@@ -59,4 +88,9 @@ class VideoResponse(BaseModel):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class VideoSearchResult(VideoResponse):
+    """视频搜索结果"""
+    score: float = 0.0
+    snippet: Optional[str] = None
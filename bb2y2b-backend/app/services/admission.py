@@ -0,0 +1,164 @@
+"""
+下载准入控制 - 提交下载前检查队列长度、磁盘空间和近期失败率
+
+超出预算时，scheduled/backfill任务直接拒绝（429/503，附带Retry-After），由调用方稍后重试；
+用户手动发起的interactive任务以deferred状态入队，负载恢复后由worker转为pending，
+deferred任务也超过上限时同样拒绝。磁盘空间不足时所有任务都拒绝。
+"""
+import os
+import time
+import shutil
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.services.download import VIDEO_OUTPUT_PATH
+from app.services.job_queue import (
+    DownloadJobQueue, PRIORITY_INTERACTIVE, STATUS_DEFERRED, STATUS_PENDING,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUED_DOWNLOADS = int(os.getenv("MAX_QUEUED_DOWNLOADS", "500"))  # 排队任务上限
+INTERACTIVE_QUEUE_HEADROOM = 50  # interactive任务在排队上限之外额外允许的数量
+MAX_DEFERRED_DOWNLOADS = int(os.getenv("MAX_DEFERRED_DOWNLOADS", "200"))
+MIN_FREE_DISK_MB = int(os.getenv("MIN_FREE_DISK_MB", "2048"))  # VIDEO_OUTPUT_PATH所在磁盘的最小剩余空间
+
+# 近期失败率：窗口内结束的任务不少于 ERROR_RATE_MIN_SAMPLES 个且失败比例超过阈值时视为异常
+ERROR_RATE_WINDOW = 600  # 秒
+ERROR_RATE_MIN_SAMPLES = 10
+ERROR_RATE_THRESHOLD = 0.5
+
+HEALTH_CACHE_TTL = 5  # 磁盘和失败率的检查结果缓存时间（秒），队列长度每次实时查询
+
+# 拒绝时建议的重试间隔（秒）
+QUEUE_FULL_RETRY_AFTER = 30
+ERROR_RATE_RETRY_AFTER = 120
+DISK_FULL_RETRY_AFTER = 600
+
+
+class DownloadRejected(Exception):
+    """下载提交被准入控制拒绝"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Health:
+    """缓存的系统状态"""
+    free_disk_mb: Optional[float]
+    error_rate: Optional[float]  # 样本不足时为None
+    checked_at: float
+
+
+class AdmissionController:
+    """下载准入控制"""
+
+    def __init__(self):
+        self._health: Optional[_Health] = None
+        self._lock = threading.Lock()
+
+    def admit(self, db: Session, priority: str) -> str:
+        """
+        判断新任务能否入队
+
+        Returns:
+            入队时使用的状态：pending 或 deferred
+
+        Raises:
+            DownloadRejected: 超出预算且不能延后
+        """
+        health = self._get_health(db)
+        if health.free_disk_mb is not None and health.free_disk_mb < MIN_FREE_DISK_MB:
+            raise DownloadRejected(
+                503, f"磁盘剩余空间不足: {health.free_disk_mb:.0f}MB < {MIN_FREE_DISK_MB}MB", DISK_FULL_RETRY_AFTER
+            )
+
+        queue = DownloadJobQueue(db)
+        rejection = None
+        if health.error_rate is not None and health.error_rate > ERROR_RATE_THRESHOLD:
+            rejection = DownloadRejected(
+                503, f"近期下载失败率过高: {health.error_rate:.0%}", ERROR_RATE_RETRY_AFTER
+            )
+        else:
+            limit = MAX_QUEUED_DOWNLOADS
+            if priority == PRIORITY_INTERACTIVE:
+                limit += INTERACTIVE_QUEUE_HEADROOM
+            pending = queue.count_by_status(STATUS_PENDING)
+            if pending >= limit:
+                rejection = DownloadRejected(429, f"下载队列已满: {pending} 个任务排队中", QUEUE_FULL_RETRY_AFTER)
+        if rejection is None:
+            return STATUS_PENDING
+
+        if priority == PRIORITY_INTERACTIVE and queue.count_by_status(STATUS_DEFERRED) < MAX_DEFERRED_DOWNLOADS:
+            logger.info(f"下载任务延后入队: {rejection.reason}")
+            return STATUS_DEFERRED
+        raise rejection
+
+    def release_deferred(self, db: Session) -> int:
+        """
+        负载恢复后把deferred任务转为pending（由下载worker在领取任务前调用）
+
+        Returns:
+            转为pending的任务数
+        """
+        health = self._get_health(db)
+        if health.free_disk_mb is not None and health.free_disk_mb < MIN_FREE_DISK_MB:
+            return 0
+        if health.error_rate is not None and health.error_rate > ERROR_RATE_THRESHOLD:
+            return 0
+        queue = DownloadJobQueue(db)
+        budget = MAX_QUEUED_DOWNLOADS + INTERACTIVE_QUEUE_HEADROOM - queue.count_by_status(STATUS_PENDING)
+        released = queue.release_deferred(budget)
+        if released:
+            logger.info(f"{released} 个延后的下载任务已加入队列")
+        return released
+
+    def _get_health(self, db: Session) -> _Health:
+        health = self._health
+        if health and time.monotonic() - health.checked_at < HEALTH_CACHE_TTL:
+            return health
+        with self._lock:
+            health = self._health
+            if health and time.monotonic() - health.checked_at < HEALTH_CACHE_TTL:
+                return health
+            health = _Health(
+                free_disk_mb=self._free_disk_mb(),
+                error_rate=self._error_rate(db),
+                checked_at=time.monotonic(),
+            )
+            self._health = health
+            return health
+
+    @staticmethod
+    def _free_disk_mb() -> Optional[float]:
+        """VIDEO_OUTPUT_PATH所在磁盘的剩余空间（目录尚未创建时检查其上级目录）"""
+        path = VIDEO_OUTPUT_PATH
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        try:
+            return shutil.disk_usage(path).free / 1024 / 1024
+        except OSError as e:
+            logger.warning(f"获取磁盘剩余空间失败: {e}")
+            return None
+
+    @staticmethod
+    def _error_rate(db: Session) -> Optional[float]:
+        since = datetime.now(timezone.utc) - timedelta(seconds=ERROR_RATE_WINDOW)
+        completed, errors = DownloadJobQueue(db).recent_outcomes(since)
+        total = completed + errors
+        if total < ERROR_RATE_MIN_SAMPLES:
+            return None
+        return errors / total
+
+
+# 单例实例
+admission_controller = AdmissionController()
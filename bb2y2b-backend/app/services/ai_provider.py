@@ -27,18 +27,18 @@ class AIProviderService:
         """解密API密钥"""
         return self.cipher.decrypt(base64.b64decode(encrypted_key.encode())).decode()
     
-    async def get_providers(self, skip: int = 0, limit: int = 100) -> List[AIProvider]:
+    def get_providers(self, skip: int = 0, limit: int = 100) -> List[AIProvider]:
         """获取AI Provider列表"""
         return self.db.query(AIProvider).offset(skip).limit(limit).all()
     
-    async def get_provider_by_id(self, provider_id: str) -> Optional[AIProvider]:
+    def get_provider_by_id(self, provider_id: str) -> Optional[AIProvider]:
         """根据provider_id获取AI Provider"""
         return self.db.query(AIProvider).filter(AIProvider.provider_id == provider_id).first()
     
-    async def create_provider(self, provider_data: AIProviderCreate) -> AIProvider:
+    def create_provider(self, provider_data: AIProviderCreate) -> AIProvider:
         """创建新的AI Provider"""
         # 检查provider_id是否已存在
-        existing = await self.get_provider_by_id(provider_data.provider_id)
+        existing = self.get_provider_by_id(provider_data.provider_id)
         if existing:
             raise ValueError(f"Provider with ID {provider_data.provider_id} already exists")
         
@@ -55,9 +55,9 @@ class AIProviderService:
         self.db.refresh(db_provider)
         return db_provider
     
-    async def update_provider(self, provider_id: str, provider_data: AIProviderUpdate) -> Optional[AIProvider]:
+    def update_provider(self, provider_id: str, provider_data: AIProviderUpdate) -> Optional[AIProvider]:
         """更新AI Provider配置"""
-        db_provider = await self.get_provider_by_id(provider_id)
+        db_provider = self.get_provider_by_id(provider_id)
         if not db_provider:
             return None
         
@@ -74,9 +74,9 @@ class AIProviderService:
         self.db.refresh(db_provider)
         return db_provider
     
-    async def delete_provider(self, provider_id: str) -> bool:
+    def delete_provider(self, provider_id: str) -> bool:
         """删除AI Provider"""
-        db_provider = await self.get_provider_by_id(provider_id)
+        db_provider = self.get_provider_by_id(provider_id)
         if not db_provider:
             return False
         
@@ -84,13 +84,13 @@ class AIProviderService:
         self.db.commit()
         return True
     
-    async def get_active_providers(self) -> List[AIProvider]:
+    def get_active_providers(self) -> List[AIProvider]:
         """获取所有活跃的AI Provider"""
         return self.db.query(AIProvider).filter(AIProvider.is_active == True).all()
     
-    async def increment_usage(self, provider_id: str, tokens_used: int) -> bool:
+    def increment_usage(self, provider_id: str, tokens_used: int) -> bool:
         """增加Provider使用量"""
-        db_provider = await self.get_provider_by_id(provider_id)
+        db_provider = self.get_provider_by_id(provider_id)
         if not db_provider:
             return False
         
@@ -8,9 +8,10 @@ import requests
 import logging
 import json
 import os
+import threading
 from functools import reduce
 from hashlib import md5
-from typing import Tuple, List, Dict, Optional
+from typing import Tuple, List, Dict, Optional, Iterator, Set
 from datetime import datetime
 
 # 配置日志
@@ -20,6 +21,45 @@ logger = logging.getLogger(__name__)
 # Cookie文件路径（相对于项目根目录）
 COOKIE_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'cookie.json')
 
+# 全局API限速：所有扫描（单空间、定时、批量）共享同一额度
+API_RATE_LIMIT = 0.7  # 每秒请求数
+API_RATE_BURST = 2  # 允许的突发请求数
+API_RATE_JITTER = 0.5  # 等待令牌时附加的随机延迟上限（秒）
+
+
+class SpacePageError(Exception):
+    """获取空间视频列表的某一页失败，翻页没有完成"""
+
+    def __init__(self, page: int, reason: str):
+        super().__init__(f"获取第{page}页失败: {reason}")
+        self.page = page
+        self.reason = reason
+
+
+class RateLimiter:
+    """令牌桶限速器（线程安全）"""
+    
+    def __init__(self, rate: float, burst: int, jitter: float = 0.0):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """获取一个令牌，额度不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait + random.uniform(0, self.jitter))
+
 
 class BilibiliService:
     """B站API服务类"""
@@ -28,6 +68,7 @@ class BilibiliService:
         self.img_key: Optional[str] = None
         self.sub_key: Optional[str] = None
         self.sessdata: Optional[str] = None
+        self.rate_limiter = RateLimiter(API_RATE_LIMIT, API_RATE_BURST, API_RATE_JITTER)
         self._load_cookie()
         self._init_wbi_keys()
     
@@ -139,6 +180,7 @@ class BilibiliService:
         if self.sessdata:
             cookies['SESSDATA'] = self.sessdata
         
+        self.rate_limiter.acquire()
         try:
             logger.info(f"请求B站API: space_id={space_id}, page={page}, has_cookie={bool(cookies)}")
             response = requests.get(url, headers=headers, params=signed_params, cookies=cookies, timeout=15)
@@ -166,9 +208,46 @@ class BilibiliService:
             logger.error(f"B站API请求异常: {e}")
             return {"error": str(e), "videos": []}
     
+    def iter_video_pages(self, space_id: str, start_page: int = 1, max_pages: Optional[int] = None) -> Iterator[Tuple[int, List[Dict], int]]:
+        """
+        按从新到旧的顺序逐页获取UP主视频
+        
+        Args:
+            space_id: UP主空间ID
+            start_page: 起始页码
+            max_pages: 最多获取的页数，None表示不限制
+            
+        Yields:
+            (页码, 该页视频列表, 总页数)
+        
+        Raises:
+            SpacePageError: 某一页请求失败（已产出的页仍然有效）
+        """
+        page = start_page
+        fetched = 0
+        while max_pages is None or fetched < max_pages:
+            # 请求间隔由全局限速器控制
+            result = self.get_space_videos(space_id, page=page)
+            if result.get("error"):
+                logger.error(f"获取第{page}页失败: {result.get('error')}")
+                raise SpacePageError(page, result["error"])
+            
+            page_info = result.get("page", {})
+            total_count = page_info.get("count", 0)
+            page_size = page_info.get("ps", 30)
+            total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+            
+            videos = result.get("videos", [])
+            fetched += 1
+            yield page, videos, total_pages
+            
+            if not videos or page >= total_pages:
+                return
+            page += 1
+    
     def scan_all_videos(self, space_id: str, video_keyword: Optional[str] = None) -> List[Dict]:
         """
-        扫描UP主所有视频
+        扫描UP主最新视频（最多5页）
         
         Args:
             space_id: UP主空间ID
@@ -176,41 +255,61 @@ class BilibiliService:
             
         Returns:
             视频列表
+        
+        Raises:
+            SpacePageError: 翻页过程中请求失败
         """
         logger.info(f"开始扫描空间: space_id={space_id}, keyword={video_keyword}")
         all_videos = []
-        page = 1
-        
-        # 首先获取第一页，确定总数
-        result = self.get_space_videos(space_id, page=1)
-        
-        if "error" in result and result.get("error"):
-            logger.error(f"扫描失败: {result.get('error')}")
-            return []
+        for _, videos, _ in self.iter_video_pages(space_id, max_pages=5):
+            all_videos.extend(self.filter_videos(videos, video_keyword))
+        return all_videos
+    
+    def scan_new_videos(
+        self,
+        space_id: str,
+        known_bvids: Set[str],
+        video_keyword: Optional[str] = None,
+        since: Optional[float] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        增量扫描：从最新一页开始翻页，遇到已知视频即停止
         
-        page_info = result.get("page", {})
-        total_count = page_info.get("count", 0)
-        page_size = page_info.get("ps", 30)
-        total_pages = (total_count + page_size - 1) // page_size if page_size > 0 else 1
+        列表按投稿时间倒序排列，一旦某页出现已入库的bvid（或早于上次扫描
+        时间的投稿），后面的页都是已扫描过的旧视频。
         
-        # 处理第一页视频
-        videos = result.get("videos", [])
-        filtered_videos = self._filter_videos(videos, video_keyword)
-        all_videos.extend(filtered_videos)
+        Args:
+            space_id: UP主空间ID
+            known_bvids: 已入库的bvid集合
+            video_keyword: 视频关键字过滤（逗号分隔）
+            since: 上次扫描时间戳，早于该时间的投稿视为已知（没有投稿时间的视频按bvid判断）
+            
+        Returns:
+            (过滤后的视频列表, 请求页数)
         
-        # 获取剩余页面（限制最多5页，避免请求过多）
-        max_pages = min(total_pages, 5)
-        for page in range(2, max_pages + 1):
-            time.sleep(random.uniform(1, 2))  # 随机延迟
-            result = self.get_space_videos(space_id, page=page)
-            if "error" not in result or not result.get("error"):
-                videos = result.get("videos", [])
-                filtered_videos = self._filter_videos(videos, video_keyword)
-                all_videos.extend(filtered_videos)
+        Raises:
+            SpacePageError: 到达已知视频或最后一页之前请求失败，调用方不能据此更新扫描时间
+        """
+        logger.info(f"开始增量扫描空间: space_id={space_id}, 已知视频={len(known_bvids)}")
+        all_videos = []
+        pages = 0
+        for page, videos, _ in self.iter_video_pages(space_id):
+            pages += 1
+            all_videos.extend(self.filter_videos(videos, video_keyword))
+            
+            # 没有投稿时间的视频只按bvid判断，不能当作早于上次扫描的旧视频
+            reached_known = any(
+                v.get('bvid') in known_bvids
+                or (since is not None and v.get('created') is not None and v['created'] < since)
+                for v in videos
+            )
+            if reached_known:
+                logger.info(f"第{page}页遇到已知视频，停止翻页")
+                break
         
-        return all_videos
+        return all_videos, pages
     
-    def _filter_videos(self, videos: List[Dict], video_keyword: Optional[str]) -> List[Dict]:
+    def filter_videos(self, videos: List[Dict], video_keyword: Optional[str]) -> List[Dict]:
         """根据关键字过滤视频"""
         if not video_keyword:
             return videos
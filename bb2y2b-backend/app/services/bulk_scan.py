@@ -0,0 +1,321 @@
+"""
+批量空间扫描 - 并发扫描所有启用的空间，共享全局API限速额度
+"""
+import time
+import threading
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, write_queue
+from app.models.space import Space
+from app.models.task import Task
+from app.models.video import Video
+from app.services.bilibili import bilibili_service, SpacePageError
+from app.services.space import (
+    SpaceService, SCAN_OVERLAP_SECONDS, utc_timestamp, claim_space_scan, release_space_scan,
+)
+
+logger = logging.getLogger(__name__)
+
+TASK_TYPE_SCAN_ALL = "scan_all_spaces"
+
+BULK_SCAN_CONCURRENCY = 4  # 并发扫描的空间数（请求速率仍受全局限速器约束）
+BULK_SCAN_WRITE_BATCH = 10  # 每累计多少个空间的结果写一次数据库
+BULK_SCAN_KEEP_FINISHED = 5  # 内存中保留的已结束任务数（更早的只能从tasks表查询）
+
+
+@dataclass
+class SpaceScanProgress:
+    """单个空间的扫描进度"""
+    space_id: str
+    space_name: str = ""
+    status: str = "pending"  # pending, scanning, completed, error, skipped（已在其他扫描中）
+    pages_fetched: int = 0
+    total_found: int = 0
+    new_videos: int = 0
+    updated_videos: int = 0
+    error_message: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {
+            "space_id": self.space_id,
+            "space_name": self.space_name,
+            "status": self.status,
+            "pages_fetched": self.pages_fetched,
+            "total_found": self.total_found,
+            "new_videos": self.new_videos,
+            "updated_videos": self.updated_videos,
+            "error_message": self.error_message,
+        }
+
+
+@dataclass
+class BulkScanJob:
+    """批量扫描任务"""
+    task_id: str
+    status: str = "pending"  # pending, running, completed, failed
+    spaces: Dict[str, SpaceScanProgress] = field(default_factory=dict)
+    started_at: datetime = field(default_factory=datetime.now)
+    completed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+
+    @property
+    def finished_spaces(self) -> int:
+        return sum(1 for s in self.spaces.values() if s.status in ("completed", "error", "skipped"))
+
+    @property
+    def progress(self) -> float:
+        if not self.spaces:
+            return 100.0 if self.status == "completed" else 0.0
+        return round(self.finished_spaces / len(self.spaces) * 100, 1)
+
+    def to_dict(self, include_spaces: bool = True) -> Dict:
+        """转换为字典"""
+        spaces = list(self.spaces.values())
+        result = {
+            "task_id": self.task_id,
+            "status": self.status,
+            "progress": self.progress,
+            "total_spaces": len(spaces),
+            "completed_spaces": sum(1 for s in spaces if s.status == "completed"),
+            "failed_spaces": sum(1 for s in spaces if s.status == "error"),
+            "skipped_spaces": sum(1 for s in spaces if s.status == "skipped"),
+            "scanning_spaces": sum(1 for s in spaces if s.status == "scanning"),
+            "pages_fetched": sum(s.pages_fetched for s in spaces),
+            "total_found": sum(s.total_found for s in spaces),
+            "new_videos": sum(s.new_videos for s in spaces),
+            "updated_videos": sum(s.updated_videos for s in spaces),
+            "started_at": self.started_at.isoformat(),
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "error_message": self.error_message,
+        }
+        if include_spaces:
+            result["spaces"] = [s.to_dict() for s in spaces]
+        return result
+
+
+class BulkScanManager:
+    """批量扫描任务管理器"""
+
+    def __init__(self):
+        self._jobs: Dict[str, BulkScanJob] = {}
+        self._lock = threading.Lock()
+
+    def get_job(self, task_id: str) -> Optional[BulkScanJob]:
+        """获取批量扫描任务"""
+        return self._jobs.get(task_id)
+
+    def start_scan_all(self, db: Session) -> BulkScanJob:
+        """启动扫描所有启用空间的后台任务，已有任务在运行时直接返回该任务"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in ("pending", "running"):
+                    return job
+            self._prune_finished()
+
+            # 最久未扫描的空间优先
+            spaces = (
+                db.query(Space)
+                .filter(Space.is_active == True)
+                .order_by(Space.last_scan_time.is_(None).desc(), Space.last_scan_time.asc())
+                .all()
+            )
+
+            task_id = f"scan_all_{int(time.time())}"
+            job = BulkScanJob(task_id=task_id)
+            for space in spaces:
+                job.spaces[space.space_id] = SpaceScanProgress(
+                    space_id=space.space_id,
+                    space_name=space.space_name
+                )
+            self._jobs[task_id] = job
+
+            db.add(Task(task_id=task_id, task_type=TASK_TYPE_SCAN_ALL, status="pending", progress=0.0))
+            db.commit()
+
+        thread = threading.Thread(target=self._run_job, args=(job,))
+        thread.daemon = True
+        thread.start()
+        return job
+
+    def _prune_finished(self):
+        """只保留最近 BULK_SCAN_KEEP_FINISHED 个已结束的任务（调用方持有 _lock）"""
+        finished = [task_id for task_id, job in self._jobs.items() if job.status in ("completed", "failed")]
+        # 字典按创建顺序排列，先结束的旧任务在前
+        for task_id in finished[:max(0, len(finished) - BULK_SCAN_KEEP_FINISHED)]:
+            del self._jobs[task_id]
+
+    def _run_job(self, job: BulkScanJob):
+        """协调线程：并发抓取，批量写库"""
+        db = SessionLocal()
+        claimed: Set[str] = set()  # 本任务登记了正在扫描、尚未释放的空间
+        try:
+            job.status = "running"
+            self._update_task_row(db, job)
+
+            spaces = {
+                s.space_id: s
+                for s in db.query(Space).filter(Space.space_id.in_(list(job.spaces))).all()
+            }
+            known = self._load_known_bvids(db, [s.id for s in spaces.values()])
+            pending_writes: List[tuple] = []
+
+            with ThreadPoolExecutor(max_workers=BULK_SCAN_CONCURRENCY) as executor:
+                futures = {}
+                # 按最久未扫描优先的顺序提交
+                for space_id in job.spaces:
+                    space = spaces.get(space_id)
+                    if not space:
+                        job.spaces[space_id].status = "error"
+                        job.spaces[space_id].error_message = "Space not found"
+                        continue
+                    if not claim_space_scan(space_id, job.task_id):
+                        # 手动或定时扫描正在处理该空间
+                        job.spaces[space_id].status = "skipped"
+                        job.spaces[space_id].error_message = "Space scan already running"
+                        continue
+                    claimed.add(space_id)
+                    since = None
+                    if space.last_scan_time:
+                        since = utc_timestamp(space.last_scan_time) - SCAN_OVERLAP_SECONDS
+                    future = executor.submit(
+                        self._fetch_space,
+                        job.spaces[space_id],
+                        space.video_keyword,
+                        known.get(space.id, set()),
+                        since
+                    )
+                    futures[future] = space_id
+
+                for future in as_completed(futures):
+                    space_id = futures[future]
+                    progress = job.spaces[space_id]
+                    try:
+                        videos = future.result()
+                    except Exception as e:
+                        logger.error(f"批量扫描空间失败: space_id={space_id}, error={e}")
+                        progress.status = "error"
+                        progress.error_message = str(e)
+                        self._release(claimed, [space_id])
+                        continue
+                    if videos is None:
+                        # 翻页未完成，不写入结果，也不更新该空间的 last_scan_time
+                        self._release(claimed, [space_id])
+                        continue
+                    pending_writes.append((spaces[space_id], progress, videos))
+                    if len(pending_writes) >= BULK_SCAN_WRITE_BATCH:
+                        self._flush(db, job, pending_writes, claimed)
+
+            self._flush(db, job, pending_writes, claimed)
+            job.status = "completed"
+            failed = sum(1 for s in job.spaces.values() if s.status == "error")
+            if failed:
+                job.error_message = f"{failed} 个空间扫描失败"
+        except Exception as e:
+            logger.error(f"批量扫描任务异常: task_id={job.task_id}, error={e}")
+            db.rollback()
+            job.status = "failed"
+            job.error_message = str(e)
+        finally:
+            # 出错退出时释放还没写入结果的空间
+            self._release(claimed, list(claimed))
+            job.completed_at = datetime.now()
+            try:
+                self._update_task_row(db, job)
+            finally:
+                db.close()
+            logger.info(f"批量扫描结束: {job.to_dict(include_spaces=False)}")
+
+    @staticmethod
+    def _fetch_space(progress: SpaceScanProgress, video_keyword: Optional[str],
+                     known_bvids: Set[str], since: Optional[float]) -> Optional[List[Dict]]:
+        """工作线程：只请求B站API，不访问数据库；翻页中途失败时记录错误并返回None"""
+        progress.status = "scanning"
+        try:
+            videos, pages = bilibili_service.scan_new_videos(
+                space_id=progress.space_id,
+                known_bvids=known_bvids,
+                video_keyword=video_keyword,
+                since=since
+            )
+        except SpacePageError as e:
+            logger.error(f"批量扫描空间未完成: space_id={progress.space_id}, {e}")
+            progress.pages_fetched = e.page - 1
+            progress.status = "error"
+            progress.error_message = str(e)
+            return None
+        progress.pages_fetched = pages
+        progress.total_found = len(videos)
+        return videos
+
+    @staticmethod
+    def _release(claimed: Set[str], space_ids: List[str]):
+        """释放本任务登记的空间"""
+        for space_id in space_ids:
+            claimed.discard(space_id)
+            release_space_scan(space_id)
+
+    def _flush(self, db: Session, job: BulkScanJob, pending_writes: List[tuple], claimed: Set[str]):
+        """将一批空间的扫描结果写入数据库（经后台写入队列，单个事务）"""
+        if not pending_writes:
+            return
+        batch = [(space.id, progress, videos) for space, progress, videos in pending_writes]
+        pending_writes.clear()
+        
+        def write(write_db: Session):
+            now = datetime.utcnow()
+            writer = SpaceService(write_db)
+            counts = []
+            for space_pk, _, videos in batch:
+                space = write_db.get(Space, space_pk)
+                counts.append(writer.save_videos(space, videos))
+                space.last_scan_time = now
+            return counts
+        
+        try:
+            counts = write_queue.run(write)
+            for (_, progress, _), (new_count, updated_count) in zip(batch, counts):
+                progress.new_videos = new_count
+                progress.updated_videos = updated_count
+                progress.status = "completed"
+        except Exception as e:
+            logger.error(f"批量写入扫描结果失败: {e}")
+            for _, progress, _ in batch:
+                progress.status = "error"
+                progress.error_message = str(e)
+        finally:
+            self._release(claimed, [progress.space_id for _, progress, _ in batch])
+        self._update_task_row(db, job)
+
+    @staticmethod
+    def _load_known_bvids(db: Session, space_pks: List[int]) -> Dict[int, Set[str]]:
+        """一次查询取出所有空间的已知bvid"""
+        known: Dict[int, Set[str]] = defaultdict(set)
+        if space_pks:
+            for space_pk, bvid in db.query(Video.space_id, Video.bvid).filter(Video.space_id.in_(space_pks)):
+                known[space_pk].add(bvid)
+        return known
+
+    @staticmethod
+    def _update_task_row(db: Session, job: BulkScanJob):
+        """同步任务进度到tasks表"""
+        db_task = db.query(Task).filter(Task.task_id == job.task_id).first()
+        if not db_task:
+            return
+        db_task.status = job.status
+        db_task.progress = job.progress
+        db_task.error_message = job.error_message
+        if job.completed_at:
+            db_task.completed_at = job.completed_at
+        db.commit()
+
+
+# 单例实例
+bulk_scan_manager = BulkScanManager()
@@ -0,0 +1,182 @@
+"""
+下载并发自动调节 - 按吞吐量和失败/风控情况以AIMD方式调整下载worker的并发数
+
+每隔 CONTROL_INTERVAL 秒统计一个窗口，吞吐量按 THROUGHPUT_EWMA_ALPHA 做指数平滑：
+- 出现风控（-403、HTTP 403/412/429）或失败率超过 ERROR_RATE_LIMIT：并发数乘以 DECREASE_FACTOR（乘性减少），
+  之后 INCREASE_HOLD 秒内不再增加；
+- 增加并发后观察 PROBE_WINDOWS 个窗口，平滑吞吐量提升不足 MIN_THROUGHPUT_GAIN 说明带宽已跑满，退回一步，
+  之后 PROBE_REVERT_HOLD 秒内不再试探；连续试探失败时该时间翻倍（最长 PROBE_REVERT_HOLD_MAX），试探成功后恢复；
+- 所有槽位都在执行且不在观察期、保持期：并发数加1（加性增加）。
+每次调整后都要等 PROBE_WINDOWS 个窗口让平滑吞吐量反映新的并发数，再做下一次增加。
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CONCURRENCY_AUTO = os.getenv("DOWNLOAD_CONCURRENCY_AUTO", "true").lower() == "true"
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY_MAX", "8"))
+CONTROL_INTERVAL = 10  # 统计窗口（秒）
+DECREASE_FACTOR = 0.5
+MIN_THROUGHPUT_GAIN = 0.05  # 增加并发后吞吐量至少提升5%才继续增加
+THROUGHPUT_EWMA_ALPHA = 0.3  # 吞吐量平滑系数，单个窗口的波动不会直接触发退回
+PROBE_WINDOWS = 4  # 调整后观察的窗口数
+ERROR_RATE_LIMIT = 0.3
+MIN_RESULTS = 3  # 窗口内结束的任务少于此数时不计算失败率
+INCREASE_HOLD = 60  # 减少并发后暂停增加的时间（秒）
+PROBE_REVERT_HOLD = 120  # 试探失败退回后暂停增加的时间（秒）
+PROBE_REVERT_HOLD_MAX = 1800
+HISTORY_SIZE = 50  # 保留的调整记录数
+
+
+@dataclass
+class _Window:
+    """一个统计窗口内的计数"""
+    bytes: int = 0
+    successes: int = 0
+    errors: int = 0
+    throttles: int = 0
+
+
+class ConcurrencyController:
+    """下载并发AIMD调节器"""
+
+    def __init__(self):
+        self._worker = None
+        self._window = _Window()
+        self._window_started = time.monotonic()
+        self._lock = threading.Lock()
+        self._last: Optional[Dict] = None  # 上一个窗口的统计
+        self._throughput: Optional[float] = None  # 平滑后的吞吐量
+        self._probe_throughput: Optional[float] = None  # 上次增加并发前的平滑吞吐量
+        self._settle_windows = 0  # 距离下次可以评估或增加还需观察的窗口数
+        self._hold_until = 0.0
+        self._revert_hold = PROBE_REVERT_HOLD  # 下次试探失败后的暂停时间
+        self._history: deque = deque(maxlen=HISTORY_SIZE)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, worker):
+        """开始调节worker的并发数（DOWNLOAD_CONCURRENCY_AUTO关闭时只统计不调节）"""
+        self._worker = worker
+        if not DOWNLOAD_CONCURRENCY_AUTO or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="download-concurrency", daemon=True)
+        self._thread.start()
+        logger.info(f"下载并发自动调节已启动: {worker.concurrency} (范围 {MIN_CONCURRENCY}-{MAX_CONCURRENCY})")
+
+    def stop(self):
+        self._stop_event.set()
+
+    # 以下由下载线程调用，只做计数
+
+    def record_bytes(self, count: int):
+        with self._lock:
+            self._window.bytes += count
+
+    def record_result(self, success: bool):
+        with self._lock:
+            if success:
+                self._window.successes += 1
+            else:
+                self._window.errors += 1
+
+    def record_throttle(self):
+        """记录一次风控响应"""
+        with self._lock:
+            self._window.throttles += 1
+
+    def _run(self):
+        while not self._stop_event.wait(CONTROL_INTERVAL):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"下载并发调节失败: {e}")
+
+    def tick(self):
+        """结束当前窗口并调整并发数"""
+        now = time.monotonic()
+        with self._lock:
+            window, self._window = self._window, _Window()
+            elapsed, self._window_started = now - self._window_started, now
+        window_throughput = window.bytes / elapsed if elapsed > 0 else 0.0
+        if self._throughput is None:
+            self._throughput = window_throughput
+        else:
+            self._throughput += THROUGHPUT_EWMA_ALPHA * (window_throughput - self._throughput)
+        throughput = self._throughput
+        self._last = {**asdict(window), "seconds": round(elapsed, 1), "throughput_bps": round(window_throughput),
+                      "smoothed_throughput_bps": round(throughput)}
+        if self._worker is None:
+            return
+
+        if self._settle_windows:
+            self._settle_windows -= 1
+        probe_failed = False
+        if self._probe_throughput is not None and not self._settle_windows:
+            # 观察期结束，用平滑吞吐量判断上次增加是否有效
+            probe_failed = throughput < self._probe_throughput * (1 + MIN_THROUGHPUT_GAIN)
+            self._probe_throughput = None
+            if not probe_failed:
+                self._revert_hold = PROBE_REVERT_HOLD
+
+        current = self._worker.concurrency
+        results = window.successes + window.errors
+        target, reason, reverting = current, None, False
+        if window.throttles:
+            target, reason = int(current * DECREASE_FACTOR), f"触发风控 {window.throttles} 次"
+        elif results >= MIN_RESULTS and window.errors / results > ERROR_RATE_LIMIT:
+            target, reason = int(current * DECREASE_FACTOR), f"失败率 {window.errors}/{results}"
+        elif probe_failed:
+            target, reason, reverting = current - 1, "增加并发后吞吐量未提升", True
+        elif (not self._settle_windows and now >= self._hold_until
+              and current < MAX_CONCURRENCY and self._worker.running_count >= current):
+            target, reason = current + 1, "槽位已满，尝试增加并发"
+
+        target = max(MIN_CONCURRENCY, min(MAX_CONCURRENCY, target))
+        if target == current:
+            return
+        # 只有加性增加时记录基准吞吐量，观察期结束后据此判断增加是否有效
+        self._probe_throughput = throughput if target > current else None
+        self._settle_windows = PROBE_WINDOWS
+        if reverting:
+            # 退回一步只说明带宽已满，不是风控或失败；暂停一段时间再试探，避免在n和n+1之间来回切换
+            self._hold_until = now + self._revert_hold
+            self._revert_hold = min(PROBE_REVERT_HOLD_MAX, self._revert_hold * 2)
+        elif target < current:
+            self._hold_until = now + INCREASE_HOLD
+        self._history.append({
+            "time": time.time(),
+            "from": current,
+            "to": target,
+            "reason": reason,
+            "throughput_bps": round(throughput),
+        })
+        logger.info(f"下载并发 {current} -> {target}: {reason}")
+        self._worker.set_concurrency(target)
+
+    def get_stats(self) -> Dict:
+        """调节器状态"""
+        worker = self._worker
+        return {
+            "auto": DOWNLOAD_CONCURRENCY_AUTO,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "concurrency": worker.concurrency if worker else None,
+            "running_jobs": worker.running_count if worker else 0,
+            "min_concurrency": MIN_CONCURRENCY,
+            "max_concurrency": MAX_CONCURRENCY,
+            "hold_seconds": max(0, round(self._hold_until - time.monotonic())),
+            "last_window": self._last,
+            "history": list(self._history),
+        }
+
+
+# 单例实例
+concurrency_controller = ConcurrencyController()
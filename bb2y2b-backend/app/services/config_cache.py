@@ -0,0 +1,85 @@
+"""
+系统配置缓存 - 进程内缓存所有SystemConfig，避免每次读取配置都查库
+"""
+import time
+import threading
+import logging
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.system_config import SystemConfig
+
+logger = logging.getLogger(__name__)
+
+# 缓存最长有效期（秒）：覆盖其他进程或直接改库造成的变更
+CONFIG_CACHE_MAX_AGE = 60
+
+
+class ConfigCache:
+    """
+    系统配置缓存
+
+    启动时一次性加载全部配置，之后读取只访问内存。
+    经由SystemService的写操作会同步更新缓存，其他变更在 CONFIG_CACHE_MAX_AGE 后重新加载。
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._values: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def load(self, db: Optional[Session] = None):
+        """从数据库加载全部配置"""
+        own_session = db is None
+        db = db or self._session_factory()
+        try:
+            rows = db.query(SystemConfig.config_key, SystemConfig.config_value).all()
+        finally:
+            if own_session:
+                db.close()
+
+        values = {key: value for key, value in rows}
+        with self._lock:
+            self._values = values
+            self._loaded_at = time.monotonic()
+        logger.debug(f"系统配置已加载: {len(values)} 项")
+
+    def invalidate(self):
+        """丢弃缓存，下次读取时重新加载"""
+        with self._lock:
+            self._loaded_at = None
+
+    def get(self, config_key: str, default_value: str = None) -> Optional[str]:
+        """读取配置值"""
+        self._ensure_fresh()
+        return self._values.get(config_key, default_value)
+
+    def set(self, config_key: str, config_value: str):
+        """写库成功后更新缓存中的单个配置"""
+        with self._lock:
+            self._values[config_key] = config_value
+
+    def delete(self, config_key: str):
+        """写库成功后从缓存中移除配置"""
+        with self._lock:
+            self._values.pop(config_key, None)
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < CONFIG_CACHE_MAX_AGE:
+            return
+        try:
+            self.load()
+        except Exception as e:
+            if loaded_at is None:
+                raise
+            # 数据库暂时不可用时继续使用旧值，到下个有效期再重试
+            logger.error(f"加载系统配置失败: {e}")
+            self._loaded_at = time.monotonic()
+
+
+# 单例实例
+config_cache = ConfigCache()
@@ -7,6 +7,7 @@ import json
 import time
 import random
 import logging
+import threading
 import urllib.parse
 import requests
 from functools import reduce
@@ -16,6 +17,8 @@ from pathlib import Path
 from moviepy.editor import AudioFileClip, concatenate_audioclips, ImageClip, ColorClip, concatenate_videoclips, CompositeVideoClip
 from tqdm import tqdm
 
+from app.services.concurrency import concurrency_controller
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,6 +42,9 @@ COVER_OUTPUT_PATH = PROJECT_ROOT / 'cover'
 MERGED_VIDEO_PATH = PROJECT_ROOT / 'merged_video'
 SUBTITLE_OUTPUT_PATH = PROJECT_ROOT / 'srt'
 
+# CDN拒绝或限流时返回的HTTP状态码，计入并发调节的风控次数
+THROTTLE_STATUS_CODES = (403, 412, 429)
+
 
 class DownloadService:
     """视频下载服务类"""
@@ -269,6 +275,7 @@ class DownloadService:
                     logger.warning(f"第{attempt}次获取链接失败: code={download_info.get('code')}, message={download_info.get('message')}")
                     # 如果是-403风控错误，重新获取WBI keys
                     if download_info.get('code') == -403:
+                        concurrency_controller.record_throttle()
                         self._init_wbi_keys()
                         signed_params = self._enc_wbi(params)
                     time.sleep(3)
@@ -279,7 +286,8 @@ class DownloadService:
         
         return None
     
-    def download_audio(self, url: str, output_path: str, progress_callback=None) -> Tuple[bool, int]:
+    def download_audio(self, url: str, output_path: str, progress_callback=None,
+                       cancel_event: Optional[threading.Event] = None) -> Tuple[bool, int]:
         """
         下载音频文件
         
@@ -287,28 +295,38 @@ class DownloadService:
             url: 音频URL
             output_path: 输出文件路径
             progress_callback: 进度回调函数 (downloaded_bytes, total_bytes)
+            cancel_event: 被设置时中止下载
             
         Returns:
             (是否下载成功, 文件大小)
         """
         try:
             headers = self._get_headers()
-            response = requests.get(url, headers=headers, stream=True, timeout=120)
-            
-            file_size = int(response.headers.get('Content-Length', 0))
-            
-            if file_size < 500 * 1024:  # 小于500KB跳过
-                logger.warning(f"文件大小 {file_size/1024:.2f}KB 太小，跳过")
-                return False, 0
-            
-            downloaded = 0
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=32768):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if progress_callback:
-                            progress_callback(downloaded, file_size)
+            # 流式响应要关闭后连接才会归还连接池，提前返回的分支同样需要
+            with requests.get(url, headers=headers, stream=True, timeout=120) as response:
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    concurrency_controller.record_throttle()
+                    logger.warning(f"下载被限流: HTTP {response.status_code}")
+                    return False, 0
+                
+                file_size = int(response.headers.get('Content-Length', 0))
+                
+                if file_size < 500 * 1024:  # 小于500KB跳过
+                    logger.warning(f"文件大小 {file_size/1024:.2f}KB 太小，跳过")
+                    return False, 0
+                
+                downloaded = 0
+                with open(output_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=32768):
+                        if cancel_event is not None and cancel_event.is_set():
+                            logger.warning(f"下载已中止: {output_path}")
+                            return False, 0
+                        if chunk:
+                            f.write(chunk)
+                            downloaded += len(chunk)
+                            concurrency_controller.record_bytes(len(chunk))
+                            if progress_callback:
+                                progress_callback(downloaded, file_size)
             
             logger.info(f"下载完成: {output_path}, 大小: {file_size/1024/1024:.2f}MB")
             return True, file_size
@@ -462,6 +480,7 @@ class DownloadService:
         start_p: int = 1, 
         end_p: Optional[int] = None,
         video_type: str = 'sleep',
+        cancel_event: Optional[threading.Event] = None,
     ) -> Optional[Dict]:
         """
         下载视频（音频）并合并，带进度跟踪
@@ -472,6 +491,7 @@ class DownloadService:
             start_p: 起始分P
             end_p: 结束分P
             video_type: 视频类型
+            cancel_event: 被设置时（如下载worker的租约丢失）在下一个阶段边界中止，任务标记为已取消
             
         Returns:
             下载结果字典
@@ -480,6 +500,17 @@ class DownloadService:
         
         logger.info(f"开始下载视频: task_id={task_id}, bvid={bvid}, start_p={start_p}, end_p={end_p}")
         
+        def cancelled() -> bool:
+            if cancel_event is None or not cancel_event.is_set():
+                return False
+            logger.warning(f"下载任务已中止: {task_id}")
+            download_manager.update_task(
+                task_id,
+                status=TaskStatus.CANCELLED,
+                error_message="下载已中止"
+            )
+            return True
+        
         # 更新任务状态
         download_manager.update_task(
             task_id,
@@ -527,6 +558,8 @@ class DownloadService:
         for page, cid in pages_and_cids:
             if page < start_p or page > end_p:
                 continue
+            if cancelled():
+                return None
             
             download_link = self.get_download_links(bvid, cid, 'dash')
             if download_link:
@@ -578,6 +611,8 @@ class DownloadService:
             download_link = item['download_link']
             
             audio_file = temp_dir / f"{file_prefix}_{page}.mp3"
+            if cancelled():
+                return None
             
             logger.info(f"下载第 {page}/{end_p} P ({idx+1}/{total_pages})")
             
@@ -599,7 +634,7 @@ class DownloadService:
                 current_total = total_downloaded_bytes + downloaded
                 download_manager.update_task(task_id, current_bytes=current_total)
             
-            success, file_size = self.download_audio(download_link, str(audio_file), progress_cb)
+            success, file_size = self.download_audio(download_link, str(audio_file), progress_cb, cancel_event)
             if success:
                 audio_files.append(str(audio_file))
                 total_downloaded_bytes += file_size
@@ -608,6 +643,8 @@ class DownloadService:
             
             time.sleep(0.2)
         
+        if cancelled():
+            return None
         if not audio_files:
             logger.error("没有成功下载任何音频文件")
             download_manager.update_task(
@@ -697,6 +734,9 @@ class DownloadService:
             )
             return None
         
+        if cancelled():
+            return None
+        
         # 5. 下载封面
         download_manager.update_task(
             task_id,
@@ -799,7 +839,8 @@ class DownloadService:
             'cover_path': str(cover_path) if cover_path else None,
             'subtitle_path': str(subtitle_path) if subtitle_path else None,
             'audio_path': str(final_audio_path),
-            'video_count': len(audio_files)
+            'video_count': len(audio_files),
+            'duration': total_duration
         }
     
     def download_video(
@@ -3,14 +3,23 @@
 """
 import time
 import threading
-from typing import Dict, Optional, List
-from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, List, Set, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from enum import Enum
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+TOMBSTONE_LIMIT = 1000  # 保留的已移除任务记录数，更早的增量查询需要全量同步
+
+# 已结束任务（完成/失败/取消）的保留策略：超过TTL或数量上限时按结束先后淘汰
+TERMINAL_TASK_TTL = 3600  # 秒
+MAX_TERMINAL_TASKS = 200
+
+SPEED_EWMA_ALPHA = 0.2  # 速度指数平滑系数，约相当于最近10次采样的平均
+
 
 class TaskStatus(str, Enum):
     PENDING = "pending"
@@ -21,9 +30,12 @@ class TaskStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+TERMINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED)
+
+
+@dataclass(slots=True)
 class DownloadProgress:
-    """下载进度信息"""
+    """下载进度信息（由管理器发布后只读，修改时复制新记录）"""
     task_id: str
     bvid: str
     title: str = ""
@@ -60,7 +72,12 @@ class DownloadProgress:
     # 速度计算用
     _last_bytes: int = field(default=0, repr=False)
     _last_time: float = field(default=0.0, repr=False)
-    _speed_samples: List[float] = field(default_factory=list, repr=False)
+    
+    # 最后一次修改时管理器的版本号
+    _version: int = field(default=0, repr=False)
+    
+    # to_dict结果缓存，记录发布后内容不变；不随replace复制
+    _dict: Optional[Dict] = field(default=None, init=False, repr=False, compare=False)
     
     def update_speed(self):
         """更新下载速度"""
@@ -71,12 +88,11 @@ class DownloadProgress:
                 bytes_diff = self.current_bytes - self._last_bytes
                 instant_speed = bytes_diff / time_diff
                 
-                # 使用滑动平均计算速度
-                self._speed_samples.append(instant_speed)
-                if len(self._speed_samples) > 10:
-                    self._speed_samples.pop(0)
-                
-                self.speed = sum(self._speed_samples) / len(self._speed_samples)
+                # 使用指数滑动平均计算速度
+                if self.speed > 0:
+                    self.speed += SPEED_EWMA_ALPHA * (instant_speed - self.speed)
+                else:
+                    self.speed = instant_speed
                 
                 # 计算预估时间
                 if self.speed > 0 and self.total_bytes > 0:
@@ -87,7 +103,12 @@ class DownloadProgress:
         self._last_time = current_time
     
     def to_dict(self) -> Dict:
-        """转换为字典"""
+        """转换为字典（结果被缓存共享，调用方不要修改）"""
+        if self._dict is None:
+            self._dict = self._build_dict()
+        return self._dict
+    
+    def _build_dict(self) -> Dict:
         return {
             "task_id": self.task_id,
             "bvid": self.bvid,
@@ -174,8 +195,97 @@ class DownloadProgress:
             return f"{hours}小时{minutes}分"
 
 
+class TaskSubscription:
+    """
+    任务变更订阅
+
+    管理器在任务变化时把task_id记入订阅者的脏集合，并在集合由空变为非空时回调on_change；
+    订阅者按自己的节奏调用collect，只取得上次推送之后变化的字段。
+    """
+    
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        self._on_change = on_change
+        self._dirty: Set[str] = set()
+        self._sent: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def mark_dirty(self, task_id: str):
+        """标记任务已变化（由管理器在发布记录后调用）"""
+        with self._lock:
+            was_clean = not self._dirty
+            self._dirty.add(task_id)
+        if was_clean and self._on_change:
+            try:
+                self._on_change()
+            except Exception as e:
+                # 通知失败不能影响下载线程
+                logger.debug(f"任务变更通知失败: {e}")
+    
+    def take_dirty(self) -> Set[str]:
+        """取出并清空已变化的task_id"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+    
+    def snapshot(self, manager: "DownloadManager") -> Dict:
+        """生成全量快照，并作为之后计算差异的基准"""
+        with self._lock:
+            self._dirty.clear()
+        tasks = manager.get_all_tasks()
+        self._sent = {task["task_id"]: task for task in tasks}
+        return {"tasks": tasks, "total": len(tasks)}
+    
+    def collect(self, manager: "DownloadManager") -> Optional[Dict]:
+        """
+        取出自上次推送以来的变化
+        
+        Returns:
+            {"tasks": {task_id: 变化的字段}, "removed": [task_id]}，没有变化时返回None
+        """
+        dirty = self.take_dirty()
+        
+        changed: Dict[str, Dict] = {}
+        removed: List[str] = []
+        for task_id in dirty:
+            current = manager.get_task_dict(task_id)
+            if current is None:
+                if self._sent.pop(task_id, None) is not None:
+                    removed.append(task_id)
+                continue
+            previous = self._sent.get(task_id)
+            if previous is None:
+                diff = current
+            else:
+                diff = {key: value for key, value in current.items() if previous.get(key) != value}
+            if diff:
+                changed[task_id] = diff
+            self._sent[task_id] = current
+        
+        if not changed and not removed:
+            return None
+        return {"tasks": changed, "removed": removed}
+
+
+class _TaskSlot:
+    """任务槽：持有当前发布的进度记录和该任务的写锁"""
+    __slots__ = ("lock", "record")
+    
+    def __init__(self, record: DownloadProgress):
+        self.lock = threading.Lock()
+        self.record = record
+
+
 class DownloadManager:
-    """下载任务管理器"""
+    """
+    下载任务管理器
+    
+    进度记录按写时复制发布：写入方在任务自己的锁内复制当前记录、修改副本，
+    再整体替换槽中的引用；读取方不加锁，只读取已发布的记录，不会阻塞下载线程。
+    任务集合本身的增删（创建、移除、淘汰）在 _task_lock 内进行，同样以替换字典的方式发布。
+    
+    挂接共享状态后端（见 app.services.task_state）后，本进程的任务变化会同步到后端，
+    列表、增量查询和版本号改为读取后端，多个API进程看到同一份任务状态。
+    """
     
     _instance = None
     _lock = threading.Lock()
@@ -192,48 +302,170 @@ class DownloadManager:
         if self._initialized:
             return
         self._initialized = True
-        self._tasks: Dict[str, DownloadProgress] = {}
-        self._task_lock = threading.Lock()
+        self._tasks: Dict[str, _TaskSlot] = {}  # 只整体替换，不原地修改
+        self._task_lock = threading.Lock()  # 任务集合结构变化
+        self._version_lock = threading.Lock()  # 分配版本号并发布记录
+        self._subscribers: Tuple[TaskSubscription, ...] = ()
+        
+        self._bvid_index: Dict[str, Tuple[str, ...]] = {}  # bvid -> task_id（按创建顺序）
+        self._terminal: "OrderedDict[str, float]" = OrderedDict()  # 已结束任务 -> 结束时间（按结束先后）
+        # 任务移出内存前交给archiver保留最终状态（见 app.services.task_persistence）
+        self.archiver: Optional[Callable[[List[DownloadProgress]], None]] = None
+        
+        # 版本号从启动时间（毫秒）开始，不同进程的版本号不会重叠
+        self._base_version = int(time.time() * 1000)
+        self._version = self._base_version
+        self._tombstones: "OrderedDict[str, int]" = OrderedDict()  # task_id -> 移除时的版本号
+        self._tombstone_floor = self._base_version  # 早于此版本的移除记录已被丢弃
+        
+        self._shared = None  # 共享状态后端，None表示只使用本进程内存
+    
+    @property
+    def version(self) -> int:
+        """任务集合的版本号，任何任务创建、更新或移除都会递增"""
+        if self._shared:
+            return self._shared.version
+        return self._version
+    
+    def attach_state_backend(self, backend):
+        """挂接共享状态后端"""
+        self._shared = backend
+    
+    def detach_state_backend(self):
+        """卸下共享状态后端，恢复为只读本进程内存"""
+        self._shared = None
+    
+    def get_local_task(self, task_id: str) -> Optional[DownloadProgress]:
+        """获取本进程中的任务（不查询共享后端）"""
+        slot = self._tasks.get(task_id)
+        return slot.record if slot else None
+    
+    def notify_subscribers(self, task_id: str):
+        """通知订阅者任务已变化（共享后端发现其他进程的变化时也调用）"""
+        for subscription in self._subscribers:
+            subscription.mark_dirty(task_id)
+    
+    def subscribe(self, on_change: Optional[Callable[[], None]] = None) -> TaskSubscription:
+        """订阅任务变更（用于推送进度）"""
+        subscription = TaskSubscription(on_change)
+        with self._task_lock:
+            self._subscribers = self._subscribers + (subscription,)
+        return subscription
+    
+    def unsubscribe(self, subscription: TaskSubscription):
+        """取消订阅"""
+        with self._task_lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscription)
+    
+    def _publish(self, slot: Optional[_TaskSlot], record: Optional[DownloadProgress], task_id: str,
+                 created: bool = False):
+        """
+        分配版本号并发布记录（record为None表示移除，created表示新建任务）
+        
+        先发布记录再更新管理器版本号：读取方拿到版本号v时，版本不大于v的记录都已可见。
+        """
+        with self._version_lock:
+            self._version += 1
+            if record is None:
+                self._tombstones[task_id] = self._version
+                while len(self._tombstones) > TOMBSTONE_LIMIT:
+                    _, dropped_version = self._tombstones.popitem(last=False)
+                    self._tombstone_floor = dropped_version
+            else:
+                if created:
+                    self._tombstones.pop(task_id, None)
+                record._version = self._version
+                slot.record = record
+        if self._shared:
+            self._shared.on_change(task_id)
+        self.notify_subscribers(task_id)
     
     def create_task(self, task_id: str, bvid: str, title: str = "") -> DownloadProgress:
         """创建下载任务"""
+        task = DownloadProgress(
+            task_id=task_id,
+            bvid=bvid,
+            title=title,
+            status=TaskStatus.PENDING,
+            started_at=datetime.now()
+        )
+        slot = _TaskSlot(task)
         with self._task_lock:
-            task = DownloadProgress(
-                task_id=task_id,
-                bvid=bvid,
-                title=title,
-                status=TaskStatus.PENDING,
-                started_at=datetime.now()
-            )
-            self._tasks[task_id] = task
-            logger.info(f"创建下载任务: {task_id}, bvid={bvid}")
-            return task
+            if task_id in self._tasks:
+                self._drop(task_id)
+            self._tasks = {**self._tasks, task_id: slot}
+            self._bvid_index[bvid] = self._bvid_index.get(bvid, ()) + (task_id,)
+            self._publish(slot, task, task_id, created=True)
+            evicted = self._evict()
+        logger.info(f"创建下载任务: {task_id}, bvid={bvid}")
+        self._archive(evicted)
+        return task
     
     def get_task(self, task_id: str) -> Optional[DownloadProgress]:
-        """获取任务"""
-        return self._tasks.get(task_id)
+        """获取任务（返回已发布的只读记录）"""
+        task = self.get_local_task(task_id)
+        if task is None and self._shared:
+            return self._shared.get(task_id)
+        return task
+    
+    def get_task_dict(self, task_id: str) -> Optional[Dict]:
+        """获取任务的字典形式"""
+        task = self.get_task(task_id)
+        return task.to_dict() if task else None
     
     def get_task_by_bvid(self, bvid: str) -> Optional[DownloadProgress]:
         """根据bvid获取最新任务"""
-        with self._task_lock:
-            for task in reversed(list(self._tasks.values())):
-                if task.bvid == bvid:
-                    return task
-        return None
+        task_ids = self._bvid_index.get(bvid)
+        task = self.get_local_task(task_ids[-1]) if task_ids else None
+        if self._shared:
+            shared = self._shared.get_latest_by_bvid(bvid)
+            # 本进程刚创建的任务可能尚未同步到后端，取较新的一个
+            if task is None or (shared is not None and shared.started_at > task.started_at):
+                return shared
+        return task
     
     def get_all_tasks(self) -> List[Dict]:
         """获取所有任务"""
-        with self._task_lock:
-            return [task.to_dict() for task in self._tasks.values()]
+        self._try_evict()
+        if self._shared:
+            return [task.to_dict() for task in self._shared.list_tasks()]
+        return [slot.record.to_dict() for slot in self._tasks.values()]
     
     def get_active_tasks(self) -> List[Dict]:
         """获取活跃任务（下载中/合并中）"""
-        with self._task_lock:
-            active = [
-                task.to_dict() for task in self._tasks.values()
-                if task.status in [TaskStatus.DOWNLOADING, TaskStatus.MERGING, TaskStatus.PENDING]
-            ]
-            return active
+        if self._shared:
+            records = self._shared.list_tasks()
+        else:
+            records = [slot.record for slot in self._tasks.values()]
+        return [
+            task.to_dict() for task in records
+            if task.status in [TaskStatus.DOWNLOADING, TaskStatus.MERGING, TaskStatus.PENDING]
+        ]
+    
+    def get_changes(self, since: int) -> Dict:
+        """
+        获取某个版本之后的变化
+        
+        Returns:
+            {"version": 当前版本, "reset": 是否需要丢弃本地数据,
+             "tasks": 变化的任务, "removed": 已移除的task_id}
+            since 来自其他进程、早于保留的移除记录或大于当前版本时 reset 为True，tasks为全部任务
+        """
+        if self._shared:
+            return self._shared.get_changes(since)
+        with self._version_lock:
+            version = self._version
+            reset = since < self._tombstone_floor or since > version
+            removed = [] if reset else [tid for tid, v in self._tombstones.items() if v > since]
+        if reset:
+            since = 0
+        # 版本号之后才发布的记录也可能被包含，客户端下次会再收到一次，不影响结果
+        return {
+            "version": version,
+            "reset": reset,
+            "tasks": [slot.record.to_dict() for slot in self._tasks.values() if slot.record._version > since],
+            "removed": removed,
+        }
     
     def update_task(
         self,
@@ -254,58 +486,127 @@ class DownloadManager:
         total_duration: Optional[float] = None,
     ):
         """更新任务状态"""
-        task = self._tasks.get(task_id)
-        if not task:
+        slot = self._tasks.get(task_id)
+        if not slot:
             return
         
-        with self._task_lock:
-            if status is not None:
-                task.status = status
-                if status == TaskStatus.COMPLETED:
-                    task.completed_at = datetime.now()
-            if current_page is not None:
-                task.current_page = current_page
-            if total_pages is not None:
-                task.total_pages = total_pages
+        changes = {
+            "current_page": current_page,
+            "total_pages": total_pages,
+            "current_bytes": current_bytes,
+            "total_bytes": total_bytes,
+            "stage": stage,
+            "stage_message": stage_message,
+            "download_path": download_path,
+            "cover_path": cover_path,
+            "subtitle_path": subtitle_path,
+            "error_message": error_message,
+            "title": title,
+            "merge_progress": merge_progress,
+            "total_duration": total_duration,
+        }
+        changes = {key: value for key, value in changes.items() if value is not None}
+        if status is not None:
+            changes["status"] = status
+            if status == TaskStatus.COMPLETED:
+                changes["completed_at"] = datetime.now()
+        
+        with slot.lock:
+            if self._tasks.get(task_id) is not slot:
+                return
+            task = replace(slot.record, **changes)
             if current_bytes is not None:
-                task.current_bytes = current_bytes
                 task.update_speed()
-            if total_bytes is not None:
-                task.total_bytes = total_bytes
-            if stage is not None:
-                task.stage = stage
-            if stage_message is not None:
-                task.stage_message = stage_message
-            if download_path is not None:
-                task.download_path = download_path
-            if cover_path is not None:
-                task.cover_path = cover_path
-            if subtitle_path is not None:
-                task.subtitle_path = subtitle_path
-            if error_message is not None:
-                task.error_message = error_message
-            if title is not None:
-                task.title = title
-            if merge_progress is not None:
-                task.merge_progress = merge_progress
-            if total_duration is not None:
-                task.total_duration = total_duration
+            self._publish(slot, task, task_id)
+        
+        if status is not None:
+            self._track_terminal(task_id, slot, status)
     
     def remove_task(self, task_id: str):
         """移除任务"""
         with self._task_lock:
             if task_id in self._tasks:
-                del self._tasks[task_id]
+                self._drop(task_id)
+                return
+        if self._shared:
+            self._shared.remove(task_id)
     
     def clear_completed(self):
-        """清除已完成的任务"""
+        """清除已完成的任务（交给archiver保留历史）"""
+        with self._task_lock:
+            removed = [self._drop(tid) for tid in list(self._terminal)]
+        self._archive(removed)
+        if self._shared:
+            # 其他进程的已结束任务由各自进程从内存中移除并归档（见 discard_tasks）
+            self._shared.clear_terminal()
+    
+    def discard_tasks(self, task_ids: List[str]):
+        """
+        移除已被其他进程从共享列表中移除的本进程任务（由共享状态后端调用）
+        
+        已结束的任务交给archiver保留历史，与本进程的 clear_completed 一致。
+        """
+        with self._task_lock:
+            dropped = [self._drop(tid) for tid in task_ids if tid in self._tasks]
+        self._archive([task for task in dropped if task.status in TERMINAL_STATUSES])
+    
+    def _track_terminal(self, task_id: str, slot: _TaskSlot, status: TaskStatus):
+        """记录任务进入或离开结束状态，并淘汰过期任务"""
+        evicted = []
         with self._task_lock:
-            to_remove = [
-                tid for tid, task in self._tasks.items()
-                if task.status in [TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED]
-            ]
-            for tid in to_remove:
-                del self._tasks[tid]
+            if self._tasks.get(task_id) is not slot:
+                return
+            if status in TERMINAL_STATUSES:
+                self._terminal[task_id] = time.monotonic()
+                self._terminal.move_to_end(task_id)
+                evicted = self._evict()
+            else:
+                self._terminal.pop(task_id, None)
+        self._archive(evicted)
+    
+    def _drop(self, task_id: str) -> DownloadProgress:
+        """从任务集合中移除任务及其索引（调用方需持有 _task_lock）"""
+        tasks = dict(self._tasks)
+        task = tasks.pop(task_id).record
+        self._tasks = tasks
+        task_ids = tuple(tid for tid in self._bvid_index.get(task.bvid, ()) if tid != task_id)
+        if task_ids:
+            self._bvid_index[task.bvid] = task_ids
+        else:
+            self._bvid_index.pop(task.bvid, None)
+        self._terminal.pop(task_id, None)
+        self._publish(None, None, task_id)
+        return task
+    
+    def _evict(self) -> List[DownloadProgress]:
+        """淘汰超过TTL或超出数量上限的已结束任务（调用方需持有 _task_lock）"""
+        evicted = []
+        now = time.monotonic()
+        while self._terminal:
+            task_id, finished_at = next(iter(self._terminal.items()))
+            if len(self._terminal) <= MAX_TERMINAL_TASKS and now - finished_at < TERMINAL_TASK_TTL:
+                break
+            evicted.append(self._drop(task_id))
+        return evicted
+    
+    def _try_evict(self):
+        """读取时顺带淘汰过期任务；_task_lock 被占用时跳过，读取方不等待"""
+        if not self._task_lock.acquire(blocking=False):
+            return
+        try:
+            evicted = self._evict()
+        finally:
+            self._task_lock.release()
+        self._archive(evicted)
+    
+    def _archive(self, tasks: List[DownloadProgress]):
+        """把移出内存的已结束任务交给归档函数（在锁外调用）"""
+        if not tasks or not self.archiver:
+            return
+        try:
+            self.archiver(tasks)
+        except Exception as e:
+            logger.error(f"归档下载任务失败: {e}")
 
 
 # 单例实例
@@ -0,0 +1,155 @@
+"""
+下载worker - 从tasks表领取下载任务并执行
+
+API进程默认内嵌一个worker（DOWNLOAD_WORKER_MODE=embedded）；设为external时API只负责入队，
+下载由 `python -m app.worker` 启动的独立进程执行，可在多台共享存储的机器上同时运行。
+"""
+import os
+import socket
+import uuid
+import logging
+import threading
+from typing import Dict, Optional, Set
+
+from app.core.database import write_queue
+from app.services.admission import admission_controller
+from app.services.concurrency import concurrency_controller
+from app.services.download_manager import download_manager
+from app.services.job_queue import DownloadJob, DownloadJobQueue, LEASE_HEARTBEAT_INTERVAL, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_WORKER_MODE = os.getenv("DOWNLOAD_WORKER_MODE", "embedded")  # embedded / external
+DOWNLOAD_WORKER_CONCURRENCY = int(os.getenv("DOWNLOAD_WORKER_CONCURRENCY", "2"))
+# 只给interactive任务使用的额外槽位：批量任务占满并发数时，用户发起的下载仍可立即开始
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "1"))
+WORKER_POLL_INTERVAL = 2  # 队列为空时的轮询周期（秒）
+
+
+class DownloadWorker:
+    """
+    下载worker
+
+    领取线程在有空闲槽位时领取任务，每个任务在单独的线程中执行；
+    scheduled/backfill任务最多占用concurrency个槽位，另有 INTERACTIVE_RESERVED_SLOTS 个槽位只给interactive任务；
+    心跳线程定期为持有的任务续租；进度由写回缓冲（app.services.task_persistence）批量写入tasks表。
+    """
+
+    def __init__(self, concurrency: int = DOWNLOAD_WORKER_CONCURRENCY, worker_id: Optional[str] = None):
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: Dict[str, threading.Thread] = {}
+        self._bulk: Set[str] = set()  # 正在执行的非interactive任务
+        self._cancel: Dict[str, threading.Event] = {}  # 租约丢失时通知下载线程中止
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """启动领取和心跳线程"""
+        if any(t.is_alive() for t in self._threads):
+            return
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._lease_loop, name="download-worker", daemon=True),
+            threading.Thread(target=self._heartbeat_loop, name="download-worker-heartbeat", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"下载worker已启动: {self.worker_id}, 并发数={self.concurrency}")
+
+    def stop(self):
+        """
+        停止领取新任务
+
+        正在执行的下载不会被中断；进程退出后其租约过期，任务由其他worker重新领取。
+        """
+        self._stop_event.set()
+        self._wake.set()
+
+    def set_concurrency(self, concurrency: int):
+        """调整并发数（减少时不中断正在执行的下载，只是暂不领取新任务）"""
+        self.concurrency = concurrency
+        self._wake.set()
+
+    def notify(self):
+        """有新任务入队时唤醒领取线程"""
+        self._wake.set()
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def _lease_loop(self):
+        while not self._stop_event.is_set():
+            self._wake.clear()
+            try:
+                self._lease_jobs()
+            except Exception as e:
+                logger.error(f"领取下载任务失败: {e}")
+            self._wake.wait(WORKER_POLL_INTERVAL)
+
+    def _lease_jobs(self):
+        # 负载恢复后放行延后的任务（单独的事务，不影响领取时先写后读的顺序）
+        write_queue.run(admission_controller.release_deferred)
+        with self._lock:
+            free = self.concurrency + INTERACTIVE_RESERVED_SLOTS - len(self._running)
+            bulk_free = max(0, min(free, self.concurrency - len(self._bulk)))
+        if free <= 0:
+            return
+        jobs = write_queue.run(lambda db: DownloadJobQueue(db).lease(self.worker_id, free, bulk_free))
+        for job in jobs:
+            thread = threading.Thread(target=self._run_job, args=(job,), name=f"download-{job.task_id}", daemon=True)
+            with self._lock:
+                self._running[job.task_id] = thread
+                self._cancel[job.task_id] = threading.Event()
+                if job.priority != PRIORITY_INTERACTIVE:
+                    self._bulk.add(job.task_id)
+            thread.start()
+
+    def _run_job(self, job: DownloadJob):
+        from app.services.video import VideoService
+
+        if job.attempts > 1:
+            logger.info(f"重新领取下载任务: {job.task_id}, 第 {job.attempts} 次")
+        try:
+            download_manager.create_task(job.task_id, job.bvid, job.title)
+            finished, error = VideoService.execute_download(
+                job.task_id, job.bvid, job.start_p, job.end_p, job.video_type,
+                worker_id=self.worker_id, cancel_event=self._cancel.get(job.task_id),
+            )
+            if finished:
+                concurrency_controller.record_result(error is None)
+            else:
+                logger.warning(f"下载任务的租约已被其他worker接管，结果未写入: {job.task_id}")
+        except Exception as e:
+            concurrency_controller.record_result(False)
+            logger.error(f"执行下载任务失败: {job.task_id}, error={e}")
+        finally:
+            with self._lock:
+                self._running.pop(job.task_id, None)
+                self._bulk.discard(job.task_id)
+                self._cancel.pop(job.task_id, None)
+            self._wake.set()
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(LEASE_HEARTBEAT_INTERVAL):
+            with self._lock:
+                task_ids = list(self._running)
+            if not task_ids:
+                continue
+            try:
+                lost = write_queue.run(lambda db: DownloadJobQueue(db).heartbeat(self.worker_id, task_ids))
+            except Exception as e:
+                logger.error(f"下载任务心跳失败: {e}")
+                continue
+            for task_id in lost:
+                logger.warning(f"下载任务续租失败，租约已被接管，中止下载: {task_id}")
+                cancel = self._cancel.get(task_id)
+                if cancel:
+                    cancel.set()
+
+
+# 单例实例
+download_worker = DownloadWorker()
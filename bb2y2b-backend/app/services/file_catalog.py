@@ -0,0 +1,279 @@
+"""
+已下载文件目录 - 维护downloaded_files表，文件列表接口只查询这张表
+
+下载完成和删除文件时在同一事务中更新目录；后台校对线程按目录mtime增量发现外部变更
+（手动拷入、删除、替换文件）。
+"""
+import os
+import re
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, write_queue
+from app.models.downloaded_file import DownloadedFile
+from app.models.video import Video
+from app.services.download import VIDEO_OUTPUT_PATH, COVER_OUTPUT_PATH, SUBTITLE_OUTPUT_PATH
+
+logger = logging.getLogger(__name__)
+
+MEDIA_EXTENSIONS = ('.mp3', '.mp4', '.m4a')
+RECONCILE_INTERVAL = 60  # 检查目录变化的周期（秒）
+FULL_RESCAN_INTERVAL = 3600  # 全量比对周期（秒），覆盖目录mtime不变的原地修改
+CATALOG_WRITE_BATCH = 500
+
+# 文件名格式如 BV1eemEBfEXq_1_3.mp3
+FILENAME_PATTERN = re.compile(r'^(BV[a-zA-Z0-9]+)(?:_(\d+)_(\d+))?')
+
+SORT_COLUMNS = {
+    "created_at": DownloadedFile.file_ctime,
+    "name": DownloadedFile.name,
+    "size": DownloadedFile.size,
+}
+
+# 由文件系统决定、需要校对的字段
+SYNC_FIELDS = ('path', 'size', 'file_ctime', 'file_mtime', 'cover_name', 'subtitle_name')
+
+
+def parse_media_filename(name: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """从文件名解析 (bvid, start_p, end_p)"""
+    match = FILENAME_PATTERN.match(name)
+    if not match:
+        return None, None, None
+    bvid, start_p, end_p = match.groups()
+    return bvid, int(start_p) if start_p else None, int(end_p) if end_p else None
+
+
+def _list_names(directory: Path) -> Set[str]:
+    """列出目录下的文件名"""
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name for entry in it if entry.is_file()}
+    except FileNotFoundError:
+        return set()
+
+
+def _dir_mtime(directory: Path) -> Optional[int]:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def build_file_row(name: str, path: str, stat: os.stat_result,
+                   cover_names: Set[str], subtitle_names: Set[str],
+                   duration: Optional[float] = None) -> Dict:
+    """根据文件信息生成目录记录"""
+    stem, suffix = os.path.splitext(name)
+    bvid, start_p, end_p = parse_media_filename(name)
+    cover_name = stem + '.jpg'
+    subtitle_name = stem + '.txt'
+    return {
+        "name": name,
+        "path": path,
+        "bvid": bvid,
+        "start_p": start_p,
+        "end_p": end_p,
+        "format": suffix[1:],
+        "size": stat.st_size,
+        "duration": duration,
+        "cover_name": cover_name if cover_name in cover_names else None,
+        "subtitle_name": subtitle_name if subtitle_name in subtitle_names else None,
+        "file_ctime": stat.st_ctime,
+        "file_mtime": stat.st_mtime,
+    }
+
+
+class FileCatalogService:
+    """已下载文件目录服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def list_files(self, skip: int = 0, limit: Optional[int] = None,
+                   sort_by: str = "created_at", order: str = "desc") -> Tuple[List[Tuple[DownloadedFile, Optional[str]]], int]:
+        """分页列出文件，返回 ([(文件记录, 视频标题)], 总数)"""
+        column = SORT_COLUMNS[sort_by]
+        if order == "desc":
+            ordering = [column.desc(), DownloadedFile.id.desc()]
+        else:
+            ordering = [column.asc(), DownloadedFile.id.asc()]
+
+        query = (
+            self.db.query(DownloadedFile, Video.title)
+            .outerjoin(Video, Video.bvid == DownloadedFile.bvid)
+            .order_by(*ordering)
+            .offset(skip)
+        )
+        if limit:
+            query = query.limit(limit)
+        total = self.db.query(func.count(DownloadedFile.id)).scalar()
+        return query.all(), total
+
+    def get_by_name(self, name: str) -> Optional[DownloadedFile]:
+        """根据文件名获取记录"""
+        return self.db.query(DownloadedFile).filter(DownloadedFile.name == name).first()
+
+    def record_download(self, result: Dict):
+        """登记下载完成的文件（随调用方事务提交）"""
+        path = result.get('video_path')
+        if not path or not os.path.isfile(path):
+            return
+        name = os.path.basename(path)
+        cover_names = {os.path.basename(result['cover_path'])} if result.get('cover_path') else set()
+        subtitle_names = {os.path.basename(result['subtitle_path'])} if result.get('subtitle_path') else set()
+        row = build_file_row(name, path, os.stat(path), cover_names, subtitle_names, result.get('duration'))
+        self.upsert([row])
+
+    def remove(self, name: str) -> Optional[DownloadedFile]:
+        """删除记录（随调用方事务提交）"""
+        db_file = self.get_by_name(name)
+        if db_file:
+            self.db.delete(db_file)
+        return db_file
+
+    def upsert(self, rows: List[Dict]):
+        """按文件名批量插入或更新"""
+        if not rows:
+            return
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            for row in rows:
+                existing = self.get_by_name(row['name'])
+                if existing:
+                    for field, value in row.items():
+                        if field != 'duration' or value is not None:
+                            setattr(existing, field, value)
+                else:
+                    self.db.add(DownloadedFile(**row))
+            self.db.flush()
+            return
+
+        for i in range(0, len(rows), CATALOG_WRITE_BATCH):
+            stmt = insert(DownloadedFile)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DownloadedFile.name],
+                set_={
+                    **{f: stmt.excluded[f] for f in SYNC_FIELDS},
+                    # 校对时不探测时长，保留下载时记录的值
+                    'duration': func.coalesce(stmt.excluded.duration, DownloadedFile.duration),
+                    'updated_at': func.now(),
+                }
+            )
+            self.db.execute(stmt, rows[i:i + CATALOG_WRITE_BATCH])
+
+    def delete_names(self, names: Iterable[str]):
+        """批量删除记录"""
+        names = list(names)
+        for i in range(0, len(names), CATALOG_WRITE_BATCH):
+            self.db.query(DownloadedFile).filter(
+                DownloadedFile.name.in_(names[i:i + CATALOG_WRITE_BATCH])
+            ).delete(synchronize_session=False)
+
+
+class CatalogReconciler:
+    """
+    目录校对器
+
+    video/cover/srt 任一目录的mtime变化（增删改名文件）时重新扫描，
+    只写入大小、mtime或封面/字幕关联有变化的记录；每隔 FULL_RESCAN_INTERVAL 强制全量比对一次。
+    """
+
+    def __init__(self, video_dir: Path = VIDEO_OUTPUT_PATH, cover_dir: Path = COVER_OUTPUT_PATH,
+                 subtitle_dir: Path = SUBTITLE_OUTPUT_PATH):
+        self.video_dir = video_dir
+        self.cover_dir = cover_dir
+        self.subtitle_dir = subtitle_dir
+        self._dir_mtimes: Optional[tuple] = None
+        self._last_full_scan = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动后台校对线程（首次立即全量校对）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="file-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台校对线程"""
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"文件目录校对失败: {e}")
+            self._stop_event.wait(RECONCILE_INTERVAL)
+
+    def reconcile(self, full: bool = False) -> Dict:
+        """校对一次，返回变更统计"""
+        with self._lock:
+            now = time.time()
+            full = full or now - self._last_full_scan >= FULL_RESCAN_INTERVAL
+            mtimes = tuple(_dir_mtime(d) for d in (self.video_dir, self.cover_dir, self.subtitle_dir))
+            if not full and mtimes == self._dir_mtimes:
+                return {"scanned": False, "upserted": 0, "removed": 0}
+
+            media: Dict[str, Tuple[str, os.stat_result]] = {}
+            try:
+                with os.scandir(self.video_dir) as it:
+                    for entry in it:
+                        if entry.is_file() and os.path.splitext(entry.name)[1] in MEDIA_EXTENSIONS:
+                            media[entry.name] = (entry.path, entry.stat())
+            except FileNotFoundError:
+                pass
+            cover_names = _list_names(self.cover_dir)
+            subtitle_names = _list_names(self.subtitle_dir)
+
+            db = SessionLocal()
+            try:
+                catalog = {
+                    row.name: row
+                    for row in db.query(
+                        DownloadedFile.name, DownloadedFile.path, DownloadedFile.size,
+                        DownloadedFile.file_ctime, DownloadedFile.file_mtime,
+                        DownloadedFile.cover_name, DownloadedFile.subtitle_name
+                    )
+                }
+            finally:
+                db.close()
+
+            upserts = []
+            for name, (path, stat) in media.items():
+                row = build_file_row(name, path, stat, cover_names, subtitle_names)
+                existing = catalog.get(name)
+                if existing is None or any(getattr(existing, f) != row[f] for f in SYNC_FIELDS):
+                    upserts.append(row)
+            removed = set(catalog) - set(media)
+
+            if upserts or removed:
+                def write(write_db: Session):
+                    service = FileCatalogService(write_db)
+                    service.upsert(upserts)
+                    service.delete_names(removed)
+
+                write_queue.run(write)
+                logger.info(f"文件目录校对: 更新 {len(upserts)} 个, 移除 {len(removed)} 个")
+
+            self._dir_mtimes = mtimes
+            if full:
+                self._last_full_scan = now
+            return {"scanned": True, "upserted": len(upserts), "removed": len(removed)}
+
+
+# 单例实例
+catalog_reconciler = CatalogReconciler()
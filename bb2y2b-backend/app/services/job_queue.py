@@ -0,0 +1,399 @@
+"""
+下载任务队列 - 以tasks表为队列，worker通过租约领取任务
+
+任务状态: pending(排队) -> downloading(已被某个worker领取) -> completed / error
+对应视频的状态在入队时为queued，被worker领取后改为downloading。
+排队或执行中的任务可以被取消（cancelled），不再被领取；执行中的任务租约同时被收回，worker续期失败后中止下载。
+过载时用户发起的任务先以 deferred 状态入队，负载恢复后转为pending（见 app.services.admission）。
+领取时写入 lease_owner 和 lease_expires_at，worker每隔 LEASE_HEARTBEAT_INTERVAL 续期；
+worker异常退出后租约过期，任务会被其他worker重新领取，超过 MAX_ATTEMPTS 次后标记为失败。
+
+任务分为三个优先级类别：interactive(用户手动发起) / scheduled(定时任务) / backfill(批量回填)。
+领取时按各类别正在执行的任务数与权重之比做加权公平分配，同一类别内再按UP主空间轮转，
+大批量回填既不会饿死，也不会让用户发起的单个下载排在几百个任务之后。
+空间扫描（定时扫描和全量回填）只把视频写入videos表，不会自动入队下载；
+类别由发起下载的客户端通过 POST /videos/{bvid}/download?priority= 指定，
+例如按扫描结果批量下载的脚本应使用 scheduled 或 backfill。
+"""
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.task import Task
+from app.models.video import Video
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_TASK_TYPE = "download"
+LEASE_DURATION = 60  # 租约时长（秒）
+LEASE_HEARTBEAT_INTERVAL = 15  # 续期周期（秒），需明显小于租约时长
+MAX_ATTEMPTS = 3  # 最多领取次数（含租约过期后的重新领取）
+
+STATUS_PENDING = "pending"
+STATUS_DEFERRED = "deferred"
+STATUS_RUNNING = "downloading"
+STATUS_COMPLETED = "completed"
+STATUS_ERROR = "error"
+STATUS_CANCELLED = "cancelled"
+QUEUED_STATUSES = (STATUS_PENDING, STATUS_DEFERRED)  # 尚未被worker领取
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_SCHEDULED = "scheduled"
+PRIORITY_BACKFILL = "backfill"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, PRIORITY_BACKFILL)  # 由高到低
+# 各类别都有任务排队时，正在执行的任务数大致按此比例分配
+PRIORITY_WEIGHTS = {PRIORITY_INTERACTIVE: 8, PRIORITY_SCHEDULED: 3, PRIORITY_BACKFILL: 1}
+
+
+@dataclass
+class DownloadJob:
+    """已领取的下载任务"""
+    task_id: str
+    bvid: str
+    title: str
+    start_p: int
+    end_p: Optional[int]
+    video_type: str
+    attempts: int
+    priority: str
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DownloadJobQueue:
+    """下载任务队列（所有写操作随调用方事务提交）"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, task_id: str, video: Video, priority: str = PRIORITY_INTERACTIVE,
+                deferred: bool = False) -> Task:
+        """加入队列（deferred为True时暂不可领取，等待 release_deferred）"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"无效的优先级: {priority}")
+        task = Task(
+            task_id=task_id,
+            task_type=DOWNLOAD_TASK_TYPE,
+            video_id=video.id,
+            status=STATUS_DEFERRED if deferred else STATUS_PENDING,
+            progress=0.0,
+            priority=priority,
+        )
+        self.db.add(task)
+        return task
+
+    def _claimable(self, now: datetime):
+        """可领取的条件：排队中，或租约已过期且未超过重试次数"""
+        return and_(
+            Task.task_type == DOWNLOAD_TASK_TYPE,
+            Task.attempts < MAX_ATTEMPTS,
+            or_(
+                Task.status == STATUS_PENDING,
+                and_(Task.status == STATUS_RUNNING, Task.lease_expires_at < now),
+            ),
+        )
+
+    def lease(self, worker_id: str, limit: int, bulk_limit: Optional[int] = None) -> List[DownloadJob]:
+        """
+        领取最多limit个任务，其中非interactive的任务最多bulk_limit个
+
+        先按优先级和空间分配名额（见 _plan），再逐组抢占：
+        PostgreSQL 使用 SELECT ... FOR UPDATE SKIP LOCKED，多个worker并发领取互不等待；
+        其他数据库先查出候选任务，再逐个用带条件的UPDATE抢占，只有影响行数为1的才算领取成功。
+        """
+        if limit <= 0:
+            return []
+        now = _now()
+        # 先执行写语句：SQLite下事务从一开始就持有写锁，之后的查询和抢占不会与其他进程交错
+        self._fail_exhausted(now)
+
+        lease_values = dict(
+            status=STATUS_RUNNING,
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=LEASE_DURATION),
+            heartbeat_at=now,
+            started_at=now,
+            attempts=Task.attempts + 1,
+        )
+        is_postgres = self.db.get_bind().dialect.name == 'postgresql'
+
+        ids = []
+        for (priority, space_id), count in self._plan(now, limit, bulk_limit).items():
+            candidates = (
+                select(Task.id)
+                .join(Video, Video.id == Task.video_id)
+                # space_id为None时SQLAlchemy生成 IS NULL
+                .where(self._claimable(now), Task.priority == priority, Video.space_id == space_id)
+                .order_by(Task.created_at, Task.id)
+                .limit(count)
+            )
+            if is_postgres:
+                group = self.db.execute(candidates.with_for_update(skip_locked=True, of=Task)).scalars().all()
+                if group:
+                    self.db.execute(update(Task).where(Task.id.in_(group)).values(**lease_values))
+                ids.extend(group)
+                continue
+            for task_pk in self.db.execute(candidates).scalars().all():
+                result = self.db.execute(
+                    update(Task).where(Task.id == task_pk, self._claimable(now)).values(**lease_values)
+                )
+                if result.rowcount == 1:
+                    ids.append(task_pk)
+        if not ids:
+            return []
+        self.db.execute(
+            update(Video)
+            .where(Video.id.in_(select(Task.video_id).where(Task.id.in_(ids))))
+            .values(status="downloading")
+            .execution_options(synchronize_session=False)
+        )
+
+        rows = self.db.execute(
+            select(Task.task_id, Task.attempts, Task.priority,
+                   Video.bvid, Video.title, Video.start_p, Video.end_p, Video.video_type)
+            .join(Video, Video.id == Task.video_id)
+            .where(Task.id.in_(ids))
+            .order_by(Task.created_at, Task.id)
+        ).all()
+        return [
+            DownloadJob(
+                task_id=row.task_id,
+                bvid=row.bvid,
+                title=row.title,
+                start_p=row.start_p or 1,
+                end_p=row.end_p,
+                video_type=row.video_type or 'sleep',
+                attempts=row.attempts,
+                priority=row.priority,
+            )
+            for row in rows
+        ]
+
+    def _plan(self, now: datetime, limit: int, bulk_limit: Optional[int]) -> Dict[Tuple[str, Optional[int]], int]:
+        """
+        分配本次领取的名额
+
+        每个名额先给"正在执行数 / 权重"最小的类别（相同时取优先级高的），
+        类别内再给正在执行数最少的空间（相同时取排队最久的）。
+        正在执行数来自所有worker持有的有效租约，多个worker之间的分配同样公平。
+
+        Returns:
+            {(优先级, 空间主键): 名额}
+        """
+        by_group = (Task.priority, Video.space_id)
+        pending = {
+            (row.priority, row.space_id): [row.count, row.oldest]
+            for row in self.db.execute(
+                select(*by_group, func.count().label("count"), func.min(Task.created_at).label("oldest"))
+                .join(Video, Video.id == Task.video_id)
+                .where(self._claimable(now), Task.priority.in_(PRIORITIES))
+                .group_by(*by_group)
+            )
+        }
+        if not pending:
+            return {}
+        running: Counter = Counter()
+        for row in self.db.execute(
+            select(*by_group, func.count().label("count"))
+            .join(Video, Video.id == Task.video_id)
+            .where(Task.task_type == DOWNLOAD_TASK_TYPE, Task.status == STATUS_RUNNING, Task.lease_expires_at >= now)
+            .group_by(*by_group)
+        ):
+            running[(row.priority, row.space_id)] = row.count
+        running_by_class = Counter()
+        for (priority, _), count in running.items():
+            running_by_class[priority] += count
+
+        plan: Counter = Counter()
+        bulk_left = limit if bulk_limit is None else bulk_limit
+        for _ in range(limit):
+            classes = [
+                priority for priority in PRIORITIES
+                if (priority == PRIORITY_INTERACTIVE or bulk_left > 0)
+                and any(left for (p, _), (left, _) in pending.items() if p == priority)
+            ]
+            if not classes:
+                break
+            priority = min(classes, key=lambda p: running_by_class[p] / PRIORITY_WEIGHTS[p])
+            group = min(
+                (key for key, (left, _) in pending.items() if key[0] == priority and left),
+                key=lambda key: (running[key], pending[key][1]),
+            )
+            plan[group] += 1
+            pending[group][0] -= 1
+            running[group] += 1
+            running_by_class[priority] += 1
+            if priority != PRIORITY_INTERACTIVE:
+                bulk_left -= 1
+        return dict(plan)
+
+    def has_interactive_work(self) -> bool:
+        """是否有排队或正在执行的interactive任务（批量回填在翻页间隙据此让路）"""
+        now = _now()
+        return self.db.execute(
+            select(exists().where(
+                Task.task_type == DOWNLOAD_TASK_TYPE,
+                Task.priority == PRIORITY_INTERACTIVE,
+                or_(
+                    Task.status == STATUS_PENDING,
+                    and_(Task.status == STATUS_RUNNING, Task.lease_expires_at >= now),
+                ),
+            ))
+        ).scalar()
+
+    def count_by_status(self, status: str, priority: Optional[str] = None) -> int:
+        """统计某个状态的下载任务数"""
+        query = select(func.count()).select_from(Task).where(
+            Task.task_type == DOWNLOAD_TASK_TYPE, Task.status == status
+        )
+        if priority is not None:
+            query = query.where(Task.priority == priority)
+        return self.db.execute(query).scalar()
+
+    def recent_outcomes(self, since: datetime) -> Tuple[int, int]:
+        """
+        统计某个时间之后结束的下载任务
+
+        Returns:
+            (成功数, 失败数)
+        """
+        counts = dict(self.db.execute(
+            select(Task.status, func.count())
+            .where(
+                Task.task_type == DOWNLOAD_TASK_TYPE,
+                Task.status.in_((STATUS_COMPLETED, STATUS_ERROR)),
+                Task.completed_at >= since,
+            )
+            .group_by(Task.status)
+        ).all())
+        return counts.get(STATUS_COMPLETED, 0), counts.get(STATUS_ERROR, 0)
+
+    def release_deferred(self, limit: int) -> int:
+        """把最早的limit个deferred任务转为pending，返回转换的数量"""
+        if limit <= 0:
+            return 0
+        ids = select(Task.id).where(
+            Task.task_type == DOWNLOAD_TASK_TYPE, Task.status == STATUS_DEFERRED
+        ).order_by(Task.created_at, Task.id).limit(limit)
+        result = self.db.execute(
+            update(Task)
+            .where(Task.id.in_(ids), Task.status == STATUS_DEFERRED)
+            .values(status=STATUS_PENDING)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def list_queued(self, task_id: Optional[str] = None) -> List:
+        """
+        尚未被worker领取的任务（这些任务还不在任何进程的下载管理器中）
+
+        Returns:
+            行列表，包含 task_id, status, priority, created_at, bvid, title
+        """
+        query = (
+            select(Task.task_id, Task.status, Task.priority, Task.created_at, Video.bvid, Video.title)
+            .join(Video, Video.id == Task.video_id)
+            .where(Task.task_type == DOWNLOAD_TASK_TYPE, Task.status.in_(QUEUED_STATUSES))
+            .order_by(Task.created_at, Task.id)
+        )
+        if task_id is not None:
+            query = query.where(Task.task_id == task_id)
+        return self.db.execute(query).all()
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        取消排队或执行中的任务，任务已结束或不存在时返回False
+
+        执行中的任务同时收回租约：持有它的worker下次续期失败后中止下载，finish() 也不会再写入结果。
+        视频状态恢复为pending，可以重新发起下载。
+        """
+        now = _now()
+        video_id = self.db.execute(
+            select(Task.video_id).where(
+                Task.task_id == task_id,
+                Task.task_type == DOWNLOAD_TASK_TYPE,
+                Task.status.in_(QUEUED_STATUSES + (STATUS_RUNNING,)),
+            )
+        ).scalar()
+        result = self.db.execute(
+            update(Task)
+            .where(
+                Task.task_id == task_id,
+                Task.task_type == DOWNLOAD_TASK_TYPE,
+                Task.status.in_(QUEUED_STATUSES + (STATUS_RUNNING,)),
+            )
+            .values(status=STATUS_CANCELLED, lease_owner=None, lease_expires_at=None, completed_at=now)
+        )
+        if result.rowcount != 1:
+            return False
+        if video_id is not None:
+            self.db.execute(
+                update(Video)
+                .where(Video.id == video_id, Video.status.in_(("queued", "downloading")))
+                .values(status="pending")
+                .execution_options(synchronize_session=False)
+            )
+        return True
+
+    def heartbeat(self, worker_id: str, task_ids: List[str]) -> List[str]:
+        """
+        为worker持有的任务续期（进度由 app.services.task_persistence 批量写回）
+
+        只按lease_owner判断归属，租约被其他worker接管后续期失败。
+
+        Returns:
+            续期失败（租约已被其他worker接管或已释放）的task_id
+        """
+        now = _now()
+        lost = []
+        for task_id in task_ids:
+            result = self.db.execute(
+                update(Task)
+                .where(Task.task_id == task_id, Task.lease_owner == worker_id)
+                .values(lease_expires_at=now + timedelta(seconds=LEASE_DURATION), heartbeat_at=now)
+            )
+            if result.rowcount != 1:
+                lost.append(task_id)
+        return lost
+
+    def finish(self, worker_id: str, task_id: str, success: bool, error_message: Optional[str] = None) -> bool:
+        """结束任务并释放租约，租约已不属于该worker时返回False"""
+        values = dict(
+            status=STATUS_COMPLETED if success else STATUS_ERROR,
+            lease_owner=None,
+            lease_expires_at=None,
+            completed_at=_now(),
+        )
+        if success:
+            values["progress"] = 100.0
+        else:
+            values["error_message"] = error_message
+        result = self.db.execute(
+            update(Task)
+            .where(Task.task_id == task_id, Task.lease_owner == worker_id)
+            .values(**values)
+        )
+        return result.rowcount == 1
+
+    def _fail_exhausted(self, now: datetime):
+        """租约过期且已达到最大领取次数的任务标记为失败"""
+        result = self.db.execute(
+            update(Task)
+            .where(
+                Task.task_type == DOWNLOAD_TASK_TYPE,
+                Task.status == STATUS_RUNNING,
+                Task.lease_expires_at < now,
+                Task.attempts >= MAX_ATTEMPTS,
+            )
+            .values(status=STATUS_ERROR, error_message="worker多次中断，已放弃", lease_owner=None,
+                    lease_expires_at=None, completed_at=now)
+        )
+        if result.rowcount:
+            logger.warning(f"{result.rowcount} 个下载任务超过最大重试次数，已标记为失败")
@@ -1,9 +1,10 @@
 """
 提示词模板管理服务
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 
+from app.core.pagination import paginate
 from app.models.prompt_template import PromptTemplate
 from app.schemas.prompt_template import PromptTemplateCreate, PromptTemplateUpdate
 
@@ -14,18 +15,24 @@ class PromptTemplateService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_templates(self, skip: int = 0, limit: int = 100) -> List[PromptTemplate]:
-        """获取提示词模板列表"""
-        return self.db.query(PromptTemplate).offset(skip).limit(limit).all()
+    def get_templates(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, order: str = "desc"
+    ) -> Tuple[List[PromptTemplate], Optional[str]]:
+        """获取提示词模板列表（默认最新的在前），返回 (模板列表, 下一页游标)"""
+        return paginate(
+            self.db.query(PromptTemplate),
+            [PromptTemplate.created_at, PromptTemplate.id],
+            skip=skip, limit=limit, cursor=cursor, descending=order == "desc"
+        )
     
-    async def get_template_by_id(self, prompt_id: str) -> Optional[PromptTemplate]:
+    def get_template_by_id(self, prompt_id: str) -> Optional[PromptTemplate]:
         """根据prompt_id获取提示词模板"""
         return self.db.query(PromptTemplate).filter(PromptTemplate.prompt_id == prompt_id).first()
     
-    async def create_template(self, template_data: PromptTemplateCreate) -> PromptTemplate:
+    def create_template(self, template_data: PromptTemplateCreate) -> PromptTemplate:
         """创建新的提示词模板"""
         # 检查prompt_id是否已存在
-        existing = await self.get_template_by_id(template_data.prompt_id)
+        existing = self.get_template_by_id(template_data.prompt_id)
         if existing:
             raise ValueError(f"Template with ID {template_data.prompt_id} already exists")
         
@@ -35,9 +42,9 @@ class PromptTemplateService:
         self.db.refresh(db_template)
         return db_template
     
-    async def update_template(self, prompt_id: str, template_data: PromptTemplateUpdate) -> Optional[PromptTemplate]:
+    def update_template(self, prompt_id: str, template_data: PromptTemplateUpdate) -> Optional[PromptTemplate]:
         """更新提示词模板"""
-        db_template = await self.get_template_by_id(prompt_id)
+        db_template = self.get_template_by_id(prompt_id)
         if not db_template:
             return None
         
@@ -49,9 +56,9 @@ class PromptTemplateService:
         self.db.refresh(db_template)
         return db_template
     
-    async def delete_template(self, prompt_id: str) -> bool:
+    def delete_template(self, prompt_id: str) -> bool:
         """删除提示词模板"""
-        db_template = await self.get_template_by_id(prompt_id)
+        db_template = self.get_template_by_id(prompt_id)
         if not db_template:
             return False
         
@@ -59,16 +66,16 @@ class PromptTemplateService:
         self.db.commit()
         return True
     
-    async def get_templates_by_use_case(self, use_case: str) -> List[PromptTemplate]:
+    def get_templates_by_use_case(self, use_case: str) -> List[PromptTemplate]:
         """根据使用场景获取模板"""
         return self.db.query(PromptTemplate).filter(
             PromptTemplate.use_case == use_case,
             PromptTemplate.is_active == True
         ).all()
     
-    async def render_template(self, prompt_id: str, variables: Dict[str, Any]) -> Optional[str]:
+    def render_template(self, prompt_id: str, variables: Dict[str, Any]) -> Optional[str]:
         """渲染提示词模板"""
-        template = await self.get_template_by_id(prompt_id)
+        template = self.get_template_by_id(prompt_id)
         if not template:
             return None
         
@@ -0,0 +1,238 @@
+"""
+空间定时扫描调度器 - 按UP主投稿频率自适应调整扫描间隔
+
+每个运行调度器的进程都会独立扫描所有空间。API进程默认内嵌调度器（SCAN_SCHEDULER_ENABLED=true）；
+多进程部署（如 uvicorn --workers N）时设为false，另外只运行一个 python -m app.scheduler。
+"""
+import os
+import asyncio
+import random
+import logging
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.core.database import SessionLocal
+from app.models.space import Space
+from app.services.space import SpaceService, utc_timestamp, claim_space_scan, release_space_scan
+
+logger = logging.getLogger(__name__)
+
+SCAN_SCHEDULER_ENABLED = os.getenv("SCAN_SCHEDULER_ENABLED", "true").lower() == "true"
+
+# 调度参数
+CHECK_INTERVAL = 60  # 调度循环检查周期（秒）
+MAX_CONCURRENT_SCANS = 3  # 同时进行的扫描数上限
+MIN_SCAN_INTERVAL = 30 * 60  # 最短扫描间隔：30分钟
+MAX_SCAN_INTERVAL = 24 * 3600  # 最长扫描间隔：24小时
+DEFAULT_SCAN_INTERVAL = 6 * 3600  # 无法估算频率时的默认间隔
+ERROR_RETRY_INTERVAL = 3600  # 扫描失败后的重试间隔
+CADENCE_SAMPLE_SIZE = 10  # 用于估算投稿频率的最近投稿数
+CADENCE_FACTOR = 0.5  # 扫描间隔 = 平均投稿间隔 * 系数
+JITTER_RATIO = 0.1  # 间隔随机抖动比例（±10%）
+MAX_START_DELAY = 5 * 60  # 首次扫描的随机延迟上限，避免启动时集中请求
+
+
+@dataclass
+class SpaceScheduleState:
+    """单个空间的调度状态"""
+    space_id: str
+    interval: float = DEFAULT_SCAN_INTERVAL
+    next_scan_at: float = 0.0
+    last_scan_at: Optional[float] = None
+    last_error: Optional[str] = None
+    running: bool = False
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {
+            "space_id": self.space_id,
+            "interval": int(self.interval),
+            "next_scan_at": self.next_scan_at,
+            "last_scan_at": self.last_scan_at,
+            "last_error": self.last_error,
+            "running": self.running,
+        }
+
+
+def estimate_scan_interval(upload_times: List[int], now: Optional[float] = None) -> float:
+    """
+    根据最近的投稿时间估算扫描间隔
+
+    Args:
+        upload_times: 投稿时间戳列表（新->旧）
+        now: 当前时间戳
+
+    Returns:
+        扫描间隔（秒），已限制在 [MIN_SCAN_INTERVAL, MAX_SCAN_INTERVAL] 内
+    """
+    now = now if now is not None else time.time()
+    recent = sorted(upload_times, reverse=True)[:CADENCE_SAMPLE_SIZE]
+    if not recent:
+        return MAX_SCAN_INTERVAL
+
+    if len(recent) >= 2:
+        gaps = [a - b for a, b in zip(recent, recent[1:]) if a > b]
+        cadence = statistics.median(gaps) if gaps else MAX_SCAN_INTERVAL
+    else:
+        cadence = MAX_SCAN_INTERVAL
+
+    # 长时间未投稿的UP主，间隔不应短于距上次投稿时间的一半
+    cadence = max(cadence, now - recent[0])
+
+    interval = cadence * CADENCE_FACTOR
+    return float(min(MAX_SCAN_INTERVAL, max(MIN_SCAN_INTERVAL, interval)))
+
+
+def _with_jitter(interval: float) -> float:
+    """为间隔增加随机抖动"""
+    return interval * random.uniform(1 - JITTER_RATIO, 1 + JITTER_RATIO)
+
+
+class SpaceScanScheduler:
+    """空间定时扫描调度器"""
+
+    def __init__(self):
+        self._states: Dict[str, SpaceScheduleState] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._running_scans: set = set()
+
+    def start(self):
+        """启动调度循环"""
+        if self._task and not self._task.done():
+            return
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCANS)
+        self._task = asyncio.create_task(self._run())
+        logger.info("空间扫描调度器已启动")
+
+    async def stop(self):
+        """停止调度循环"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for scan in list(self._running_scans):
+            scan.cancel()
+        logger.info("空间扫描调度器已停止")
+
+    def get_status(self) -> List[Dict]:
+        """获取所有空间的调度状态"""
+        return [state.to_dict() for state in self._states.values()]
+
+    async def _run(self):
+        """调度主循环"""
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"调度循环异常: {e}")
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    async def _tick(self):
+        """检查到期的空间并发起扫描"""
+        spaces = await asyncio.to_thread(self._load_active_spaces)
+        now = time.time()
+
+        # 同步空间列表：新增空间建立状态，移除已停用/删除的空间
+        active_ids = set()
+        for space_id, last_scan_time in spaces:
+            active_ids.add(space_id)
+            if space_id not in self._states:
+                self._states[space_id] = self._initial_state(space_id, last_scan_time, now)
+        for space_id in list(self._states):
+            if space_id not in active_ids and not self._states[space_id].running:
+                del self._states[space_id]
+
+        due = sorted(
+            (s for s in self._states.values() if not s.running and s.next_scan_at <= now),
+            key=lambda s: s.next_scan_at
+        )
+        for state in due:
+            state.running = True
+            scan = asyncio.create_task(self._scan(state))
+            self._running_scans.add(scan)
+            scan.add_done_callback(self._running_scans.discard)
+
+    @staticmethod
+    def _initial_state(space_id: str, last_scan_time, now: float) -> SpaceScheduleState:
+        """为新发现的空间建立调度状态"""
+        state = SpaceScheduleState(space_id=space_id)
+        if last_scan_time:
+            state.last_scan_at = utc_timestamp(last_scan_time)
+            state.next_scan_at = state.last_scan_at + _with_jitter(state.interval)
+        else:
+            state.next_scan_at = now + random.uniform(0, MAX_START_DELAY)
+        return state
+
+    async def _scan(self, state: SpaceScheduleState):
+        """在信号量限制下执行一次扫描，并据结果调整间隔"""
+        try:
+            async with self._semaphore:
+                result = await asyncio.to_thread(self._scan_space, state.space_id)
+            now = time.time()
+            if result is not None and result.get("status") == "skipped":
+                # 手动或批量扫描正在处理该空间，按原间隔顺延
+                logger.info(f"空间正在扫描中，跳过定时扫描: space_id={state.space_id}")
+                state.next_scan_at = now + _with_jitter(state.interval)
+                return
+            if result is not None and result.get("status") != "completed":
+                # 翻页未完成，last_scan_time没有更新，按失败重试
+                logger.error(f"定时扫描失败: space_id={state.space_id}, error={result.get('error')}")
+                state.last_error = result.get("error")
+                state.next_scan_at = now + _with_jitter(ERROR_RETRY_INTERVAL)
+                return
+            state.last_scan_at = now
+            if result is None:
+                state.last_error = "Space not found"
+                state.interval = MAX_SCAN_INTERVAL
+            else:
+                state.last_error = None
+                state.interval = estimate_scan_interval(result.get("upload_times", []), now)
+                logger.info(
+                    f"定时扫描完成: space_id={state.space_id}, 新增={result.get('new_videos', 0)}, "
+                    f"下次间隔={int(state.interval)}秒"
+                )
+            state.next_scan_at = now + _with_jitter(state.interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"定时扫描失败: space_id={state.space_id}, error={e}")
+            state.last_error = str(e)
+            state.next_scan_at = time.time() + _with_jitter(ERROR_RETRY_INTERVAL)
+        finally:
+            state.running = False
+
+    @staticmethod
+    def _load_active_spaces() -> List[tuple]:
+        """读取所有启用的空间"""
+        db = SessionLocal()
+        try:
+            return db.query(Space.space_id, Space.last_scan_time).filter(Space.is_active == True).all()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _scan_space(space_id: str) -> Optional[dict]:
+        """在后台线程中扫描空间，空间已在扫描中时返回 skipped"""
+        if not claim_space_scan(space_id):
+            return {"status": "skipped"}
+        db = SessionLocal()
+        try:
+            db_space = db.query(Space).filter(Space.space_id == space_id).first()
+            if not db_space or not db_space.is_active:
+                return None
+            return SpaceService(db).run_scan(db_space)
+        finally:
+            db.close()
+            release_space_scan(space_id)
+
+
+# 单例实例
+scan_scheduler = SpaceScanScheduler()
@@ -0,0 +1,384 @@
+"""
+视频全文搜索 - SQLite FTS5索引标题、简介和AI字幕文本
+
+中文先切成二元词再写入索引（见 app.core.fts），两个字及以上的查询都能按bm25排序。
+
+触发器只用原文同步索引行的增删改，不调用自定义函数，应用之外的连接（sqlite3命令行、备份恢复、
+alembic）也能正常写videos表；应用写入视频后调用 index_videos 把标题和简介换成切分后的文本。
+应用之外写入的中文要在执行 scripts/rebuild_search_index.py 后才能按二元词搜索到。
+"""
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, or_, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, engine, is_sqlite_url, write_queue
+from app.core.fts import is_cjk_token, segment_bigrams
+from app.models.video import Video
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "videos_fts"
+
+# 索引按二元词切分中文，单个字无法走MATCH
+MIN_FTS_QUERY_LENGTH = 2
+SUBTITLE_MAX_BYTES = 1024 * 1024  # 单个字幕文件最多索引的字节数
+BM25_WEIGHTS = (10.0, 3.0, 1.0)  # 标题、简介、字幕的权重
+SNIPPET_TOKENS = 16
+INDEX_BATCH_SIZE = 500  # 写入索引时每批的视频数
+
+# 触发器写入原文，切分后的文本由 index_videos 写入
+SQLITE_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, description, subtitle_text, tokenize='unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ai AFTER INSERT ON videos BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, description, subtitle_text)
+        VALUES (new.id, new.title, coalesce(new.description, ''), '');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS videos_fts_au AFTER UPDATE OF title, description ON videos BEGIN
+        UPDATE {SEARCH_TABLE} SET title = new.title, description = coalesce(new.description, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS videos_fts_ad AFTER DELETE ON videos BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END
+    """,
+]
+
+# 删除触发器（调用 fts_bigrams() 的旧触发器在启动时据此替换）
+SQLITE_SEARCH_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS videos_fts_ad",
+    "DROP TRIGGER IF EXISTS videos_fts_au",
+    "DROP TRIGGER IF EXISTS videos_fts_ai",
+]
+
+# 删除索引（旧的trigram索引在启动时据此重建）
+SQLITE_SEARCH_DROP = SQLITE_SEARCH_DROP_TRIGGERS + [f"DROP TABLE IF EXISTS {SEARCH_TABLE}"]
+
+# snippet() 的高亮标记，去掉二元词的重叠后再换成方括号
+_HIGHLIGHT_START = "\x02"
+_HIGHLIGHT_END = "\x03"
+
+_fts_available: Optional[bool] = None
+
+
+def ensure_search_index(bind=engine) -> bool:
+    """
+    确保搜索索引存在（启动时调用）
+
+    新建索引时回填标题和简介，字幕文本在后台线程中补齐；
+    早期版本建立的trigram索引不支持两个字的查询，删除后按二元词重建；
+    调用 fts_bigrams() 的旧触发器替换为只写原文的触发器（索引内容不变）。
+    非SQLite数据库或SQLite不支持FTS5时返回False，搜索退回LIKE匹配。
+    """
+    global _fts_available
+    if not is_sqlite_url(str(bind.url)):
+        _fts_available = False
+        return False
+
+    try:
+        with bind.begin() as conn:
+            existing = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": SEARCH_TABLE}
+            ).scalar()
+            if existing and "trigram" in existing:
+                logger.info("搜索索引改为二元词分词，重建索引")
+                for ddl in SQLITE_SEARCH_DROP:
+                    conn.execute(text(ddl))
+                existing = None
+            elif existing and conn.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%fts_bigrams%'"
+            )).scalar():
+                logger.info("替换调用 fts_bigrams() 的搜索索引触发器")
+                for ddl in SQLITE_SEARCH_DROP_TRIGGERS:
+                    conn.execute(text(ddl))
+            created = existing is None
+            for ddl in SQLITE_SEARCH_DDL:
+                conn.execute(text(ddl))
+            if created:
+                _fill_index(conn)
+    except OperationalError as e:
+        logger.warning(f"SQLite不支持FTS5，搜索将使用LIKE匹配: {e}")
+        _fts_available = False
+        return False
+
+    _fts_available = True
+    if created:
+        logger.info("已建立视频搜索索引，开始在后台索引字幕")
+        threading.Thread(target=reindex_subtitles, name="search-reindex", daemon=True).start()
+    return True
+
+
+def _fill_index(conn):
+    """按id分批回填标题和简介的切分文本"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(Video.id, Video.title, Video.description)
+            .where(Video.id > last_id).order_by(Video.id).limit(INDEX_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        conn.execute(
+            text(
+                f"INSERT INTO {SEARCH_TABLE}(rowid, title, description, subtitle_text) "
+                f"VALUES (:id, :title, :description, '')"
+            ),
+            [_segmented_row(row) for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def _segmented_row(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "title": segment_bigrams(row.title),
+        "description": segment_bigrams(row.description or ""),
+    }
+
+
+def fts_available() -> bool:
+    """当前数据库是否可用FTS索引"""
+    if _fts_available is None:
+        return ensure_search_index()
+    return _fts_available
+
+
+def _index_writable(db: Session) -> bool:
+    """
+    写事务中能否更新索引
+
+    本进程还没有调用过 ensure_search_index 时只在当前连接上检查索引表是否存在：
+    在写事务中建表会等待自己持有的写锁，超时后被误判为不支持FTS5。
+    """
+    if _fts_available is not None:
+        return _fts_available
+    if db.get_bind().dialect.name != "sqlite":
+        return False
+    return db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": SEARCH_TABLE}
+    ).first() is not None
+
+
+def read_subtitle_text(path: Optional[str]) -> str:
+    """读取字幕（AI摘要/提纲）文件内容"""
+    if not path or not os.path.isfile(path):
+        return ""
+    try:
+        with open(path, "rb") as f:
+            return f.read(SUBTITLE_MAX_BYTES).decode("utf-8", errors="ignore")
+    except OSError as e:
+        logger.warning(f"读取字幕文件失败: {path}, error={e}")
+        return ""
+
+
+def index_videos(db: Session, bvids):
+    """
+    把视频标题和简介的切分文本写入索引（随调用方事务提交）
+
+    在写入videos表之后调用：触发器已经按原文建立或更新了索引行，这里替换为切分后的文本。
+    """
+    bvids = list(bvids)
+    if not bvids or not _index_writable(db):
+        return
+    for i in range(0, len(bvids), INDEX_BATCH_SIZE):
+        rows = db.execute(
+            select(Video.id, Video.title, Video.description).where(Video.bvid.in_(bvids[i:i + INDEX_BATCH_SIZE]))
+        ).all()
+        if rows:
+            db.execute(
+                text(f"UPDATE {SEARCH_TABLE} SET title = :title, description = :description WHERE rowid = :id"),
+                [_segmented_row(row) for row in rows]
+            )
+
+
+def index_subtitle(db: Session, video_id: int, subtitle_text: str):
+    """更新视频的字幕索引文本（随调用方事务提交）"""
+    if not _index_writable(db):
+        return
+    db.execute(
+        text(f"UPDATE {SEARCH_TABLE} SET subtitle_text = :subtitle_text WHERE rowid = :video_id"),
+        {"subtitle_text": segment_bigrams(subtitle_text), "video_id": video_id}
+    )
+
+
+def reindex_subtitles(batch_size: int = 200):
+    """为所有已有字幕文件的视频重建字幕索引"""
+    db = SessionLocal()
+    try:
+        rows = db.query(Video.id, Video.subtitle_path).filter(Video.subtitle_path.isnot(None)).all()
+    finally:
+        db.close()
+
+    count = 0
+    for i in range(0, len(rows), batch_size):
+        batch = [(video_id, read_subtitle_text(path)) for video_id, path in rows[i:i + batch_size]]
+
+        def write(db: Session, batch=batch):
+            for video_id, subtitle_text in batch:
+                index_subtitle(db, video_id, subtitle_text)
+
+        write_queue.run(write)
+        count += len(batch)
+    logger.info(f"字幕索引完成: {count} 个视频")
+
+
+def rebuild_search_index():
+    """重建整个搜索索引（索引与videos表不一致时手动执行）"""
+    if not ensure_search_index():
+        return
+
+    def refill(db: Session):
+        db.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        _fill_index(db)
+
+    write_queue.run(refill)
+    reindex_subtitles()
+
+
+def _match_expression(query: str) -> str:
+    """
+    将用户输入转为FTS5查询：按空白拆词，每个词切成二元词后作为短语（AND连接）
+
+    中文短语要求二元词依次相邻，等价于子串匹配；以字母数字结尾的词按前缀匹配。
+    """
+    phrases = []
+    for term in query.split():
+        tokens = segment_bigrams(term).split()
+        phrase = '"' + " ".join(tokens).replace('"', '""') + '"'
+        phrases.append(phrase if is_cjk_token(tokens[-1]) else phrase + "*")
+    return " ".join(phrases)
+
+
+def _desegment(snippet: str) -> str:
+    """把snippet中相邻二元词的重叠字去掉（"睡前 前故 故事" -> "睡前故事"），高亮换成方括号"""
+    # 按空格拆成词，每个词记录各字符是否高亮
+    tokens: List[List[Tuple[str, bool]]] = [[]]
+    highlighted = False
+    for ch in snippet:
+        if ch == _HIGHLIGHT_START:
+            highlighted = True
+        elif ch == _HIGHLIGHT_END:
+            highlighted = False
+        elif ch == " ":
+            tokens.append([])
+        else:
+            tokens[-1].append((ch, highlighted))
+
+    chars: List[Tuple[str, bool]] = []
+    for token in tokens:
+        word = "".join(ch for ch, _ in token).rstrip("…")  # 最后一个词后面可能带省略号
+        if chars and len(word) == 2 and is_cjk_token(word) and chars[-1][0] == word[0] and is_cjk_token(word[0]):
+            # 重叠的字只保留一个，任一处高亮即高亮
+            chars[-1] = (word[0], chars[-1][1] or token[0][1])
+            chars.extend(token[1:])
+            continue
+        if chars:
+            chars.append((" ", chars[-1][1] and bool(token) and token[0][1]))
+        chars.extend(token)
+
+    result, highlighted = [], False
+    for ch, flag in chars:
+        if flag != highlighted:
+            result.append("[" if flag else "]")
+            highlighted = flag
+        result.append(ch)
+    if highlighted:
+        result.append("]")
+    return "".join(result)
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class VideoSearchService:
+    """视频搜索服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(self, query: str, skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        搜索视频
+
+        Returns:
+            [{"video": Video, "score": 相关度(越大越相关), "snippet": 命中片段}]
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        terms = query.split()
+        if fts_available() and all(len(term) >= MIN_FTS_QUERY_LENGTH for term in terms):
+            hits = self._search_fts(query, skip, limit)
+        else:
+            hits = self._search_like(terms, skip, limit)
+
+        ids = [video_id for video_id, _, _ in hits]
+        videos = {v.id: v for v in self.db.query(Video).filter(Video.id.in_(ids)).all()} if ids else {}
+        return [
+            {"video": videos[video_id], "score": score, "snippet": snippet}
+            for video_id, score, snippet in hits
+            if video_id in videos
+        ]
+
+    def _search_fts(self, query: str, skip: int, limit: int) -> List[Tuple[int, float, Optional[str]]]:
+        """FTS5 MATCH，按bm25排序"""
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        rows = self.db.execute(
+            text(
+                f"SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS rank, "
+                f"snippet({SEARCH_TABLE}, -1, :start, :end, '…', {SNIPPET_TOKENS}) "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+                f"ORDER BY rank LIMIT :limit OFFSET :skip"
+            ),
+            {"match": _match_expression(query), "start": _HIGHLIGHT_START, "end": _HIGHLIGHT_END,
+             "limit": limit, "skip": skip}
+        ).all()
+        # bm25越小越相关，取负数使分数越大越相关
+        return [(row[0], round(-row[1], 4), _desegment(row[2]) if row[2] else row[2]) for row in rows]
+
+    def _search_like(self, terms: List[str], skip: int, limit: int) -> List[Tuple[int, float, Optional[str]]]:
+        """短查询或无FTS时的子串匹配，按创建时间倒序"""
+        if fts_available():
+            # 索引表同样保存了字幕文本；索引中的文本已切成二元词，查询词按同样方式切分后仍是子串
+            escaped = [_escape_like(segment_bigrams(term)) for term in terms]
+            conditions = " AND ".join(
+                f"(title LIKE :t{i} ESCAPE '\\' OR description LIKE :t{i} ESCAPE '\\' "
+                f"OR subtitle_text LIKE :t{i} ESCAPE '\\')"
+                for i in range(len(escaped))
+            )
+            params = {f"t{i}": f"%{term}%" for i, term in enumerate(escaped)}
+            rows = self.db.execute(
+                text(
+                    f"SELECT rowid FROM {SEARCH_TABLE} WHERE {conditions} "
+                    f"ORDER BY rowid DESC LIMIT :limit OFFSET :skip"
+                ),
+                {**params, "limit": limit, "skip": skip}
+            ).all()
+            return [(row[0], 0.0, None) for row in rows]
+
+        q = self.db.query(Video.id)
+        for term in map(_escape_like, terms):
+            pattern = f"%{term}%"
+            q = q.filter(or_(
+                Video.title.ilike(pattern, escape="\\"),
+                Video.description.ilike(pattern, escape="\\")
+            ))
+        rows = q.order_by(Video.created_at.desc(), Video.id.desc()).offset(skip).limit(limit).all()
+        return [(row[0], 0.0, None) for row in rows]
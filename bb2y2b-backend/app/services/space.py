@@ -2,14 +2,73 @@
 UP主空间管理服务
 """
 import time
-from typing import List, Optional
-from datetime import datetime
+import logging
+import threading
+from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.core.pagination import paginate
 from app.models.space import Space
 from app.models.video import Video
+from app.models.task import Task
 from app.schemas.space import SpaceCreate, SpaceUpdate
-from app.services.bilibili import bilibili_service
+from app.services.bilibili import bilibili_service, SpacePageError
+from app.services.job_queue import DownloadJobQueue
+from app.services.search import index_videos
+
+logger = logging.getLogger(__name__)
+
+# 扫描模式
+SCAN_MODE_INCREMENTAL = "incremental"  # 增量扫描：遇到已知视频即停止
+SCAN_MODE_FULL = "full"  # 全量回填：不限页数，可断点续扫
+
+# 扫描任务在 tasks 表中的类型
+TASK_TYPE_SCAN = "scan_space"
+TASK_TYPE_BACKFILL = "backfill_space"
+
+# 增量扫描按时间判定已知视频时的重叠窗口，覆盖审核延迟发布的投稿
+SCAN_OVERLAP_SECONDS = 24 * 3600
+
+# 全量回填每翻一页检查一次是否有用户发起的下载，有则暂停翻页让出B站接口和带宽；
+# 单次让路最长 BACKFILL_MAX_YIELD 秒，避免交互任务持续不断时回填完全停滞
+BACKFILL_YIELD_INTERVAL = 2
+BACKFILL_MAX_YIELD = 60
+
+# 批量入库时每批的视频数（受限于SQLite单条语句的参数个数）
+SCAN_BATCH_SIZE = 500
+
+# 重新扫描时会被更新的字段
+SCAN_UPDATE_FIELDS = ('title', 'description', 'cover_url', 'duration')
+
+
+# 正在扫描的空间 -> 任务ID（定时扫描没有任务行，为None），手动、定时和批量扫描共用，
+# 避免同一空间同时被多个扫描翻页、入库和更新 last_scan_time
+_running_scans: dict = {}
+_running_scans_lock = threading.Lock()
+
+
+def claim_space_scan(space_id: str, task_id: Optional[str] = None) -> bool:
+    """登记空间正在扫描，该空间已在扫描中时返回False"""
+    with _running_scans_lock:
+        if space_id in _running_scans:
+            return False
+        _running_scans[space_id] = task_id
+        return True
+
+
+def release_space_scan(space_id: str):
+    """扫描结束后解除登记"""
+    with _running_scans_lock:
+        _running_scans.pop(space_id, None)
+
+
+def utc_timestamp(dt: datetime) -> float:
+    """将数据库中的时间转换为时间戳（无时区信息的按UTC处理）"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
 
 
 class SpaceService:
@@ -18,17 +77,22 @@ class SpaceService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_spaces(self, skip: int = 0, limit: int = 100) -> List[Space]:
-        """获取空间列表"""
-        return self.db.query(Space).offset(skip).limit(limit).all()
+    def get_spaces(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, order: str = "desc"
+    ) -> Tuple[List[Space], Optional[str]]:
+        """获取空间列表（默认最新的在前），返回 (空间列表, 下一页游标)"""
+        return paginate(
+            self.db.query(Space), [Space.created_at, Space.id],
+            skip=skip, limit=limit, cursor=cursor, descending=order == "desc"
+        )
     
-    async def get_space_by_id(self, space_id: str) -> Optional[Space]:
+    def get_space_by_id(self, space_id: str) -> Optional[Space]:
         """根据space_id获取空间"""
         return self.db.query(Space).filter(Space.space_id == space_id).first()
     
-    async def create_space(self, space_data: SpaceCreate) -> Space:
+    def create_space(self, space_data: SpaceCreate) -> Space:
         """创建新空间"""
-        existing = await self.get_space_by_id(space_data.space_id)
+        existing = self.get_space_by_id(space_data.space_id)
         if existing:
             raise ValueError(f"Space with ID {space_data.space_id} already exists")
         
@@ -38,9 +102,9 @@ class SpaceService:
         self.db.refresh(db_space)
         return db_space
     
-    async def update_space(self, space_id: str, space_data: SpaceUpdate) -> Optional[Space]:
+    def update_space(self, space_id: str, space_data: SpaceUpdate) -> Optional[Space]:
         """更新空间配置"""
-        db_space = await self.get_space_by_id(space_id)
+        db_space = self.get_space_by_id(space_id)
         if not db_space:
             return None
         
@@ -52,9 +116,9 @@ class SpaceService:
         self.db.refresh(db_space)
         return db_space
     
-    async def delete_space(self, space_id: str) -> bool:
+    def delete_space(self, space_id: str) -> bool:
         """删除空间配置"""
-        db_space = await self.get_space_by_id(space_id)
+        db_space = self.get_space_by_id(space_id)
         if not db_space:
             return False
         
@@ -62,63 +126,298 @@ class SpaceService:
         self.db.commit()
         return True
     
-    async def scan_space(self, space_id: str) -> Optional[dict]:
-        """扫描空间获取视频列表并保存到数据库"""
-        db_space = await self.get_space_by_id(space_id)
+    def scan_space(self, space_id: str, mode: str = SCAN_MODE_INCREMENTAL) -> Optional[dict]:
+        """启动后台扫描任务，立即返回任务ID（进度通过tasks接口查询）"""
+        db_space = self.get_space_by_id(space_id)
         if not db_space:
             return None
         
-        # 调用B站API获取视频列表
-        videos = bilibili_service.scan_all_videos(
-            space_id=space_id,
-            video_keyword=db_space.video_keyword
+        with _running_scans_lock:
+            if space_id in _running_scans:
+                return {
+                    "task_id": _running_scans[space_id], "status": "running", "mode": mode, "already_running": True
+                }
+            
+            task_id = f"scan_{space_id}_{int(time.time() * 1000)}"
+            task_type = TASK_TYPE_BACKFILL if mode == SCAN_MODE_FULL else TASK_TYPE_SCAN
+            self.db.add(Task(task_id=task_id, task_type=task_type, status="pending", progress=0.0))
+            self.db.commit()
+            _running_scans[space_id] = task_id
+        
+        # 在后台线程中执行扫描，避免阻塞事件循环
+        thread = threading.Thread(
+            target=self._scan_task,
+            args=(task_id, space_id, mode)
         )
+        thread.daemon = True
+        thread.start()
         
-        # 保存视频到数据库
-        new_count = 0
-        updated_count = 0
+        return {"task_id": task_id, "status": "pending", "mode": mode, "already_running": False}
+    
+    @staticmethod
+    def _scan_task(task_id: str, space_id: str, mode: str):
+        """后台扫描任务"""
+        from app.core.database import SessionLocal
         
-        for video_data in videos:
-            bvid = video_data.get('bvid', '')
-            if not bvid:
-                continue
+        db = SessionLocal()
+        try:
+            db_task = db.query(Task).filter(Task.task_id == task_id).first()
+            db_task.status = "running"
+            db.commit()
+            
+            service = SpaceService(db)
+            db_space = db.query(Space).filter(Space.space_id == space_id).first()
+            if not db_space:
+                raise ValueError(f"Space {space_id} not found")
             
-            # 检查视频是否已存在
-            existing_video = self.db.query(Video).filter(Video.bvid == bvid).first()
+            if mode == SCAN_MODE_FULL:
+                def on_page(page: int, total_pages: int):
+                    db_task.progress = min(99.0, round(page / max(total_pages, 1) * 100, 1))
+                    db.commit()
+                
+                result = service.run_backfill(db_space, progress_callback=on_page)
+            else:
+                result = service.run_scan(db_space)
             
-            if existing_video:
-                # 更新现有视频
-                existing_video.title = video_data.get('title', '')
-                existing_video.description = video_data.get('description', '')
-                existing_video.cover_url = video_data.get('pic', '')
-                existing_video.duration = video_data.get('length', '')
-                updated_count += 1
+            if result.get("status") == "completed":
+                db_task.status = "completed"
+                db_task.progress = 100.0
             else:
-                # 创建新视频
-                new_video = Video(
-                    bvid=bvid,
-                    aid=str(video_data.get('aid', '')),
-                    title=video_data.get('title', ''),
-                    description=video_data.get('description', ''),
-                    cover_url=video_data.get('pic', ''),
-                    duration=video_data.get('length', ''),
-                    space_id=db_space.id,
-                    video_type=db_space.video_type,
-                    bilibili_url=f"https://www.bilibili.com/video/{bvid}",
-                    status='pending',
-                    created_at=datetime.utcnow()
-                )
-                self.db.add(new_video)
-                new_count += 1
+                db_task.status = "failed"
+                if mode == SCAN_MODE_FULL:
+                    db_task.error_message = f"回填中断，下次从第{result.get('next_page')}页继续"
+                    if result.get("error"):
+                        db_task.error_message += f": {result['error']}"
+                else:
+                    db_task.error_message = result.get("error")
+            db_task.completed_at = datetime.utcnow()
+            db.commit()
+            logger.info(
+                f"空间扫描完成: task_id={task_id}, 发现={result.get('total_found', 0)}, "
+                f"新增={result.get('new_videos', 0)}, 更新={result.get('updated_videos', 0)}"
+            )
+        except Exception as e:
+            logger.error(f"空间扫描任务异常: task_id={task_id}, error={e}")
+            db.rollback()
+            db_task = db.query(Task).filter(Task.task_id == task_id).first()
+            if db_task:
+                db_task.status = "failed"
+                db_task.error_message = str(e)
+                db_task.completed_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+            release_space_scan(space_id)
+    
+    def run_scan(self, db_space: Space) -> dict:
+        """
+        同步执行增量扫描（可在后台线程中调用）
+        
+        翻页到已知视频或最后一页才算完成并更新 last_scan_time；中途请求失败时返回 failed，
+        扫描时间不变，下次增量扫描会重新翻到这些没取到的页。
+        """
+        space_id = db_space.space_id
+        known_bvids = {
+            bvid for (bvid,) in self.db.query(Video.bvid).filter(Video.space_id == db_space.id)
+        }
+        since = None
+        if db_space.last_scan_time:
+            since = utc_timestamp(db_space.last_scan_time) - SCAN_OVERLAP_SECONDS
+        
+        # 调用B站API获取新视频，遇到已知视频即停止翻页
+        try:
+            videos, pages = bilibili_service.scan_new_videos(
+                space_id=space_id,
+                known_bvids=known_bvids,
+                video_keyword=db_space.video_keyword,
+                since=since
+            )
+        except SpacePageError as e:
+            logger.error(f"增量扫描未完成: space_id={space_id}, {e}")
+            return {
+                "status": "failed",
+                "mode": SCAN_MODE_INCREMENTAL,
+                "error": str(e),
+            }
+        
+        new_count, updated_count = self.save_videos(db_space, videos)
         
         # 更新空间的最后扫描时间
         db_space.last_scan_time = datetime.utcnow()
         self.db.commit()
         
         return {
-            "task_id": f"scan_{space_id}_{int(time.time())}",
             "status": "completed",
+            "mode": SCAN_MODE_INCREMENTAL,
+            "pages_fetched": pages,
             "total_found": len(videos),
             "new_videos": new_count,
-            "updated_videos": updated_count
-        }
\ No newline at end of file
+            "updated_videos": updated_count,
+            # 投稿时间（unix时间戳，新->旧），供调度器估算更新频率
+            "upload_times": sorted(
+                (v.get('created') for v in videos if v.get('created')),
+                reverse=True
+            )
+        }
+    
+    def run_backfill(self, db_space: Space, progress_callback=None) -> dict:
+        """
+        全量回填扫描：不限页数，逐页入库并记录进度
+        
+        每页入库后把下一页页码保存到 spaces.backfill_page，中断后再次调用会从断点继续。
+        新投稿只会让旧视频往后移，因此续扫不会漏掉视频（最多重复一部分）。
+        """
+        space_id = db_space.space_id
+        start_page = db_space.backfill_page or 1
+        
+        logger.info(f"开始全量回填: space_id={space_id}, 起始页={start_page}")
+        
+        total_found = 0
+        new_count = 0
+        updated_count = 0
+        pages = 0
+        completed = False
+        next_page = start_page
+        error = None
+        
+        try:
+            for page, videos, total_pages in bilibili_service.iter_video_pages(space_id, start_page=start_page):
+                pages += 1
+                filtered = bilibili_service.filter_videos(videos, db_space.video_keyword)
+                page_new, page_updated = self.save_videos(db_space, filtered)
+                total_found += len(filtered)
+                new_count += page_new
+                updated_count += page_updated
+                
+                next_page = page + 1
+                if not videos or page >= total_pages:
+                    completed = True
+                
+                # 保存断点，与本页数据在同一事务中提交
+                db_space.backfill_page = None if completed else next_page
+                self.db.commit()
+                
+                if progress_callback:
+                    progress_callback(page, total_pages)
+                if not completed:
+                    self._yield_to_interactive(space_id)
+        except SpacePageError as e:
+            # 断点停在失败的页，下次从这里继续
+            logger.error(f"全量回填中断: space_id={space_id}, {e}")
+            error = str(e)
+        
+        if completed:
+            db_space.last_scan_time = datetime.utcnow()
+            self.db.commit()
+        
+        return {
+            "status": "completed" if completed else "partial",
+            "mode": SCAN_MODE_FULL,
+            "start_page": start_page,
+            "next_page": None if completed else next_page,
+            "pages_fetched": pages,
+            "total_found": total_found,
+            "new_videos": new_count,
+            "updated_videos": updated_count,
+            "error": error
+        }
+    
+    def _yield_to_interactive(self, space_id: str):
+        """在两页之间等待用户发起的下载（interactive任务）结束"""
+        waited = 0
+        while waited < BACKFILL_MAX_YIELD and DownloadJobQueue(self.db).has_interactive_work():
+            # 结束只读事务，等待期间不持有连接上的快照
+            self.db.commit()
+            if waited == 0:
+                logger.info(f"全量回填让路给手动下载: space_id={space_id}")
+            time.sleep(BACKFILL_YIELD_INTERVAL)
+            waited += BACKFILL_YIELD_INTERVAL
+        self.db.commit()
+    
+    def save_videos(self, db_space: Space, videos: List[dict]) -> Tuple[int, int]:
+        """
+        批量保存扫描到的视频，返回 (新增数, 更新数)
+        
+        每批先用一次 IN 查询取出已存在的视频，只有新视频和字段确有变化的视频
+        才会写入，写入使用一条 INSERT ... ON CONFLICT DO UPDATE 语句。
+        """
+        incoming = {}
+        for video_data in videos:
+            bvid = video_data.get('bvid', '')
+            if not bvid:
+                continue
+            incoming[bvid] = {
+                'title': video_data.get('title', ''),
+                'description': video_data.get('description', ''),
+                'cover_url': video_data.get('pic', ''),
+                'duration': video_data.get('length', ''),
+                'aid': str(video_data.get('aid', '')),
+            }
+        
+        new_count = 0
+        updated_count = 0
+        items = list(incoming.items())
+        
+        for i in range(0, len(items), SCAN_BATCH_SIZE):
+            batch = items[i:i + SCAN_BATCH_SIZE]
+            
+            # 一次查询取出本批已存在的视频
+            existing = {
+                row.bvid: row
+                for row in self.db.query(Video.bvid, *[getattr(Video, f) for f in SCAN_UPDATE_FIELDS])
+                .filter(Video.bvid.in_([bvid for bvid, _ in batch]))
+            }
+            
+            rows = []
+            for bvid, data in batch:
+                old = existing.get(bvid)
+                if old is None:
+                    new_count += 1
+                elif any(getattr(old, f) != data[f] for f in SCAN_UPDATE_FIELDS):
+                    updated_count += 1
+                else:
+                    continue  # 没有变化，不写入
+                rows.append({
+                    'bvid': bvid,
+                    **data,
+                    'space_id': db_space.id,
+                    'video_type': db_space.video_type,
+                    'bilibili_url': f"https://www.bilibili.com/video/{bvid}",
+                    'status': 'pending',
+                    'created_at': datetime.utcnow(),
+                })
+            
+            if rows:
+                self._upsert_videos(rows)
+                index_videos(self.db, [row['bvid'] for row in rows])
+        
+        return new_count, updated_count
+    
+    def _upsert_videos(self, rows: List[dict]) -> None:
+        """批量插入视频，bvid冲突时只更新扫描字段"""
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            # 其他数据库回退为逐行合并
+            for row in rows:
+                existing = self.db.query(Video).filter(Video.bvid == row['bvid']).first()
+                if existing:
+                    for f in SCAN_UPDATE_FIELDS:
+                        setattr(existing, f, row[f])
+                else:
+                    self.db.add(Video(**row))
+            self.db.flush()
+            return
+        
+        stmt = insert(Video)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Video.bvid],
+            set_={
+                **{f: stmt.excluded[f] for f in SCAN_UPDATE_FIELDS},
+                'updated_at': func.now(),
+            }
+        )
+        self.db.execute(stmt, rows)
@@ -1,15 +1,38 @@
 """
 系统状态和配置服务
 """
-from typing import Dict, Any, Optional, List
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.pagination import paginate
 from app.models.video import Video
 from app.models.task import Task
 from app.models.space import Space
 from app.models.system_config import SystemConfig
 from app.schemas.system_config import SystemConfigCreate, SystemConfigUpdate
+from app.services.config_cache import config_cache
+
+# 仪表盘会轮询状态接口，统计结果在该时间（秒）内直接复用
+STATS_CACHE_TTL = 5
+
+_stats_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_stats_cache_lock = threading.Lock()
+
+
+def _cached(key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """读取统计缓存，过期时重新计算（同一时刻只有一个请求查库）"""
+    with _stats_cache_lock:
+        entry = _stats_cache.get(key)
+        now = time.monotonic()
+        if entry and entry[0] > now:
+            return entry[1]
+        value = compute()
+        _stats_cache[key] = (now + STATS_CACHE_TTL, value)
+        return value
 
 
 class SystemService:
@@ -18,42 +41,48 @@ class SystemService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_system_status(self) -> Dict[str, Any]:
-        """获取系统运行状态"""
-        # 获取各种统计信息
-        total_spaces = self.db.query(func.count(Space.id)).scalar()
-        active_spaces = self.db.query(func.count(Space.id)).filter(Space.is_active == True).scalar()
-        
-        total_videos = self.db.query(func.count(Video.id)).scalar()
-        pending_videos = self.db.query(func.count(Video.id)).filter(Video.status == "pending").scalar()
-        downloading_videos = self.db.query(func.count(Video.id)).filter(Video.status == "downloading").scalar()
-        completed_videos = self.db.query(func.count(Video.id)).filter(Video.status == "completed").scalar()
-        
-        running_tasks = self.db.query(func.count(Task.id)).filter(Task.status == "running").scalar()
-        pending_tasks = self.db.query(func.count(Task.id)).filter(Task.status == "pending").scalar()
+    def get_system_status(self) -> Dict[str, Any]:
+        """获取系统运行状态（短时缓存）"""
+        return _cached("status", self._compute_system_status)
+    
+    def _compute_system_status(self) -> Dict[str, Any]:
+        """每张表一次分组聚合"""
+        space_counts = dict(
+            self.db.query(Space.is_active, func.count(Space.id)).group_by(Space.is_active).all()
+        )
+        video_counts = dict(
+            self.db.query(Video.status, func.count(Video.id)).group_by(Video.status).all()
+        )
+        task_counts = dict(
+            self.db.query(Task.status, func.count(Task.id)).group_by(Task.status).all()
+        )
         
         return {
             "status": "running",
             "spaces": {
-                "total": total_spaces,
-                "active": active_spaces
+                "total": sum(space_counts.values()),
+                "active": space_counts.get(True, 0)
             },
             "videos": {
-                "total": total_videos,
-                "pending": pending_videos,
-                "downloading": downloading_videos,
-                "completed": completed_videos
+                "total": sum(video_counts.values()),
+                "pending": video_counts.get("pending", 0),
+                "queued": video_counts.get("queued", 0),
+                "downloading": video_counts.get("downloading", 0),
+                "completed": video_counts.get("completed", 0)
             },
             "tasks": {
-                "running": running_tasks,
-                "pending": pending_tasks
+                "running": task_counts.get("running", 0),
+                "pending": task_counts.get("pending", 0)
             },
-            "timestamp": func.now()
+            "timestamp": datetime.now(timezone.utc)
         }
     
-    async def get_system_stats(self) -> Dict[str, Any]:
-        """获取系统统计信息"""
-        # 获取更详细的统计信息
+    def get_system_stats(self) -> Dict[str, Any]:
+        """获取系统统计信息（短时缓存）"""
+        return _cached("stats", self._compute_system_stats)
+    
+    def _compute_system_stats(self) -> Dict[str, Any]:
+        """按类型分组统计"""
         video_stats_by_type = self.db.query(
             Video.video_type, 
             func.count(Video.id)
@@ -67,22 +96,28 @@ class SystemService:
         return {
             "video_stats_by_type": dict(video_stats_by_type),
             "task_stats_by_type": dict(task_stats_by_type),
-            "timestamp": func.now()
+            "timestamp": datetime.now(timezone.utc)
         }
     
     # System Config Management Methods
-    async def get_configs(self, skip: int = 0, limit: int = 100) -> List[SystemConfig]:
-        """获取系统配置列表"""
-        return self.db.query(SystemConfig).offset(skip).limit(limit).all()
+    def get_configs(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, order: str = "desc"
+    ) -> Tuple[List[SystemConfig], Optional[str]]:
+        """获取系统配置列表（默认最新的在前），返回 (配置列表, 下一页游标)"""
+        # system_configs没有created_at，按主键排序
+        return paginate(
+            self.db.query(SystemConfig), [SystemConfig.id],
+            skip=skip, limit=limit, cursor=cursor, descending=order == "desc"
+        )
     
-    async def get_config_by_key(self, config_key: str) -> Optional[SystemConfig]:
+    def get_config_by_key(self, config_key: str) -> Optional[SystemConfig]:
         """根据配置键获取配置"""
         return self.db.query(SystemConfig).filter(SystemConfig.config_key == config_key).first()
     
-    async def create_config(self, config_data: SystemConfigCreate) -> SystemConfig:
+    def create_config(self, config_data: SystemConfigCreate) -> SystemConfig:
         """创建新的系统配置"""
         # 检查config_key是否已存在
-        existing = await self.get_config_by_key(config_data.config_key)
+        existing = self.get_config_by_key(config_data.config_key)
         if existing:
             raise ValueError(f"Config with key {config_data.config_key} already exists")
         
@@ -90,11 +125,12 @@ class SystemService:
         self.db.add(db_config)
         self.db.commit()
         self.db.refresh(db_config)
+        config_cache.set(db_config.config_key, db_config.config_value)
         return db_config
     
-    async def update_config(self, config_key: str, config_data: SystemConfigUpdate) -> Optional[SystemConfig]:
+    def update_config(self, config_key: str, config_data: SystemConfigUpdate) -> Optional[SystemConfig]:
         """更新系统配置"""
-        db_config = await self.get_config_by_key(config_key)
+        db_config = self.get_config_by_key(config_key)
         if not db_config:
             return None
         
@@ -104,33 +140,34 @@ class SystemService:
         
         self.db.commit()
         self.db.refresh(db_config)
+        config_cache.set(db_config.config_key, db_config.config_value)
         return db_config
     
-    async def delete_config(self, config_key: str) -> bool:
+    def delete_config(self, config_key: str) -> bool:
         """删除系统配置"""
-        db_config = await self.get_config_by_key(config_key)
+        db_config = self.get_config_by_key(config_key)
         if not db_config:
             return False
         
         self.db.delete(db_config)
         self.db.commit()
+        config_cache.delete(config_key)
         return True
     
-    async def get_config_value(self, config_key: str, default_value: str = None) -> Optional[str]:
-        """获取配置值"""
-        config = await self.get_config_by_key(config_key)
-        return config.config_value if config else default_value
+    def get_config_value(self, config_key: str, default_value: str = None) -> Optional[str]:
+        """获取配置值（读缓存）"""
+        return config_cache.get(config_key, default_value)
     
-    async def set_config_value(self, config_key: str, config_value: str, description: str = None) -> SystemConfig:
+    def set_config_value(self, config_key: str, config_value: str, description: str = None) -> SystemConfig:
         """设置配置值（如果不存在则创建）"""
-        existing = await self.get_config_by_key(config_key)
+        existing = self.get_config_by_key(config_key)
         
         if existing:
             # 更新现有配置
             update_data = SystemConfigUpdate(config_value=config_value)
             if description:
                 update_data.description = description
-            return await self.update_config(config_key, update_data)
+            return self.update_config(config_key, update_data)
         else:
             # 创建新配置
             create_data = SystemConfigCreate(
@@ -138,4 +175,4 @@ class SystemService:
                 config_value=config_value,
                 description=description
             )
-            return await self.create_config(create_data)
\ No newline at end of file
+            return self.create_config(create_data)
\ No newline at end of file
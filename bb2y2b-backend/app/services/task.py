@@ -1,10 +1,12 @@
 """
 任务管理服务
 """
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 
+from app.core.pagination import paginate
 from app.models.task import Task
+from app.services.job_queue import DownloadJobQueue, DOWNLOAD_TASK_TYPE
 
 
 class TaskService:
@@ -13,14 +15,16 @@ class TaskService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_tasks(
+    def get_tasks(
         self, 
         skip: int = 0, 
         limit: int = 100,
         status: Optional[str] = None,
-        task_type: Optional[str] = None
-    ) -> List[Task]:
-        """获取任务列表"""
+        task_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        order: str = "desc"
+    ) -> Tuple[List[Task], Optional[str]]:
+        """获取任务列表（默认最新的在前），返回 (任务列表, 下一页游标)"""
         query = self.db.query(Task)
         
         if status:
@@ -28,15 +32,23 @@ class TaskService:
         if task_type:
             query = query.filter(Task.task_type == task_type)
         
-        return query.offset(skip).limit(limit).all()
+        return paginate(
+            query, [Task.created_at, Task.id],
+            skip=skip, limit=limit, cursor=cursor, descending=order == "desc"
+        )
     
-    async def get_task_by_id(self, task_id: str) -> Optional[Task]:
+    def get_task_by_id(self, task_id: str) -> Optional[Task]:
         """根据task_id获取任务"""
         return self.db.query(Task).filter(Task.task_id == task_id).first()
     
-    async def cancel_task(self, task_id: str) -> bool:
+    def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
-        db_task = await self.get_task_by_id(task_id)
+        db_task = self.get_task_by_id(task_id)
+        if db_task and db_task.task_type == DOWNLOAD_TASK_TYPE:
+            # 下载任务同时收回worker的租约
+            cancelled = DownloadJobQueue(self.db).cancel(task_id)
+            self.db.commit()
+            return cancelled
         if not db_task or db_task.status in ["completed", "failed", "cancelled"]:
             return False
         
@@ -44,9 +56,9 @@ class TaskService:
         self.db.commit()
         return True
     
-    async def get_task_status(self, task_id: str) -> Optional[dict]:
+    def get_task_status(self, task_id: str) -> Optional[dict]:
         """获取任务状态"""
-        db_task = await self.get_task_by_id(task_id)
+        db_task = self.get_task_by_id(task_id)
         if not db_task:
             return None
         
@@ -0,0 +1,180 @@
+"""
+下载任务写回缓冲 - 把下载管理器中的任务进度和最终状态批量写入tasks表
+
+进度每秒会更新多次，逐次写库代价太高。这里订阅管理器的变更，只记录变化过的task_id，
+每隔 TASK_PERSIST_INTERVAL 秒把这些任务的最新记录合并成一批写入；
+同一任务在一个周期内的多次更新只写一次。
+
+tasks表同时是下载队列（见 app.services.job_queue），队列中的行的状态、错误信息和完成时间
+由持有租约的worker在 finish() 时写入，这里只写回进度；
+不在队列中的任务（没有对应行）结束后补写一行历史记录。
+"""
+import os
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session
+
+from app.core.database import write_queue
+from app.models.task import Task
+from app.models.video import Video
+from app.services.download_manager import (
+    DownloadManager, DownloadProgress, TaskSubscription, TERMINAL_STATUSES,
+)
+
+logger = logging.getLogger(__name__)
+
+TASK_PERSIST_INTERVAL = float(os.getenv("TASK_PERSIST_INTERVAL", "5"))  # 写回周期（秒）
+TASK_PERSIST_FLUSH_TIMEOUT = 10  # 停止时等待最后一批写入的时间（秒）
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """管理器记录的是本地时间，写库前统一为UTC（与任务队列一致）"""
+    return value.astimezone(timezone.utc) if value else None
+
+
+def _task_row(task: DownloadProgress) -> Dict:
+    return {
+        "task_id": task.task_id,
+        "bvid": task.bvid,
+        "status": task.status.value,
+        "terminal": task.status in TERMINAL_STATUSES,
+        "progress": task.to_dict()["progress_percent"],
+        "error_message": task.error_message,
+        "started_at": _utc(task.started_at),
+        "completed_at": _utc(task.completed_at),
+    }
+
+
+def save_task_rows(db: Session, rows: List[Dict]):
+    """
+    把一批任务记录写入tasks表
+
+    已有的行（下载队列中的任务）只更新进度：状态和完成时间由 DownloadJobQueue.finish 按租约写入，
+    租约已被其他worker接管的旧记录不会把任务错误地标记为结束；
+    没有对应行的任务只在结束后补写一行历史记录（未结束的行会被下载队列当作待领取任务）。
+    """
+    if not rows:
+        return
+    existing = set(db.execute(
+        select(Task.task_id).where(Task.task_id.in_([row["task_id"] for row in rows]))
+    ).scalars().all())
+
+    progress_rows = [row for row in rows if row["task_id"] in existing]
+    new_rows = [row for row in rows if row["task_id"] not in existing and row["terminal"]]
+
+    if progress_rows:
+        # executemany：一条语句，参数批量绑定
+        table = Task.__table__
+        stmt = (
+            table.update()
+            .where(table.c.task_id == bindparam("b_task_id"))
+            .values(progress=bindparam("v_progress"))
+        )
+        db.execute(stmt, [
+            {"b_task_id": row["task_id"], "v_progress": row["progress"]}
+            for row in progress_rows
+        ])
+    if new_rows:
+        bvids = {row["bvid"] for row in new_rows}
+        video_ids = dict(db.execute(select(Video.bvid, Video.id).where(Video.bvid.in_(bvids))).all())
+        db.add_all([
+            Task(
+                task_id=row["task_id"],
+                task_type="download",
+                video_id=video_ids.get(row["bvid"]),
+                status=row["status"],
+                progress=row["progress"],
+                error_message=row["error_message"],
+                started_at=row["started_at"],
+                completed_at=row["completed_at"],
+            )
+            for row in new_rows
+        ])
+
+
+class TaskWriteBehind:
+    """
+    任务写回缓冲
+
+    订阅管理器的变更累积脏task_id，写回时读取各任务当前发布的记录；
+    被管理器淘汰或清除的任务在移出内存时通过 archiver 把最终记录交给缓冲，不会丢失。
+    """
+
+    def __init__(self, interval: float = TASK_PERSIST_INTERVAL):
+        self.interval = interval
+        self._manager: Optional[DownloadManager] = None
+        self._subscription: Optional[TaskSubscription] = None
+        self._pending: Dict[str, DownloadProgress] = {}  # 已移出内存、等待写回的记录
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, manager: DownloadManager):
+        """订阅任务变更并启动写回线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._manager = manager
+        self._subscription = manager.subscribe()
+        manager.archiver = self.add
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="task-write-behind", daemon=True)
+        self._thread.start()
+        logger.info(f"下载任务写回已启动，周期 {self.interval}s")
+
+    def stop(self):
+        """停止写回线程，并等待最后一批写入完成"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            future = self.flush()
+            if future:
+                future.result(timeout=TASK_PERSIST_FLUSH_TIMEOUT)
+        except Exception as e:
+            logger.error(f"写回下载任务失败: {e}")
+        if self._manager:
+            self._manager.unsubscribe(self._subscription)
+            if self._manager.archiver == self.add:
+                self._manager.archiver = None
+
+    def add(self, tasks: List[DownloadProgress]):
+        """加入即将移出内存的任务记录（作为管理器的archiver）"""
+        with self._lock:
+            for task in tasks:
+                self._pending[task.task_id] = task
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"写回下载任务失败: {e}")
+
+    def flush(self):
+        """
+        把积累的变化提交到后台写入队列
+
+        Returns:
+            写入的Future，没有变化时返回None
+        """
+        if self._manager is None:
+            return None
+        with self._lock:
+            records, self._pending = self._pending, {}
+        for task_id in self._subscription.take_dirty():
+            # 共享状态后端通知的其他进程任务不在本进程内存中，由对应进程写回
+            task = self._manager.get_local_task(task_id)
+            if task is not None:
+                records[task_id] = task
+        if not records:
+            return None
+        rows = [_task_row(task) for task in records.values()]
+        return write_queue.submit(lambda db: save_task_rows(db, rows))
+
+
+# 单例实例
+task_write_behind = TaskWriteBehind()
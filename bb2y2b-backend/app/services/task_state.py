@@ -0,0 +1,458 @@
+"""
+下载任务共享状态 - 让多个API进程（uvicorn --workers N）看到同一份下载进度
+
+DownloadManager 默认只在本进程内存中保存任务。设置环境变量
+TASK_STATE_BACKEND=sqlite 后，各进程把自己的任务变化定期写入同一个SQLite文件
+（TASK_STATE_PATH，默认项目根目录下的 task_state.db），查询接口从该文件读取。
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import fields
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.services.download import PROJECT_ROOT
+from app.services.download_manager import (
+    DownloadManager, DownloadProgress, TaskStatus, TERMINAL_STATUSES, TERMINAL_TASK_TTL, TOMBSTONE_LIMIT
+)
+
+logger = logging.getLogger(__name__)
+
+TASK_STATE_BACKEND = os.getenv("TASK_STATE_BACKEND", "memory")  # memory / sqlite
+TASK_STATE_PATH = os.getenv("TASK_STATE_PATH", str(PROJECT_ROOT / "task_state.db"))
+
+SHARED_STATE_SYNC_INTERVAL = 0.5  # 写入本进程变化、读取其他进程变化的周期（秒）
+OWNER_HEARTBEAT_INTERVAL = 5  # 进程心跳周期（秒）
+OWNER_TIMEOUT = 60  # 心跳超时后，该进程未结束的任务标记为失败
+
+SQLITE_STATE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS task_state (
+        task_id TEXT PRIMARY KEY,
+        bvid TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started_at TEXT,
+        version INTEGER NOT NULL,
+        removed INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL,
+        state TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_task_state_version ON task_state (version)",
+    "CREATE INDEX IF NOT EXISTS ix_task_state_bvid ON task_state (bvid, started_at)",
+    """
+    CREATE TABLE IF NOT EXISTS task_state_meta (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        tombstone_floor INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS task_state_owners (
+        owner TEXT PRIMARY KEY,
+        heartbeat REAL NOT NULL
+    )
+    """,
+]
+
+# 需要同步的字段：DownloadProgress 中除内部字段外的全部构造参数
+STATE_FIELDS = [f.name for f in fields(DownloadProgress) if f.init and not f.name.startswith("_")]
+
+
+def dump_record(task: DownloadProgress) -> str:
+    """把进度记录序列化为JSON"""
+    state = {}
+    for name in STATE_FIELDS:
+        value = getattr(task, name)
+        if isinstance(value, TaskStatus):
+            value = value.value
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        state[name] = value
+    return json.dumps(state, ensure_ascii=False)
+
+
+def load_record(data: str, version: int = 0) -> DownloadProgress:
+    """从JSON还原进度记录"""
+    state = json.loads(data)
+    state["status"] = TaskStatus(state["status"])
+    for name in ("started_at", "completed_at"):
+        if state.get(name):
+            state[name] = datetime.fromisoformat(state[name])
+    task = DownloadProgress(**{name: state[name] for name in STATE_FIELDS if name in state})
+    task._version = version
+    return task
+
+
+class TaskStateBackend(ABC):
+    """
+    任务状态后端接口
+
+    DownloadManager 在任务变化后调用 on_change；挂接后端后，跨进程的查询都委托给后端。
+    内存后端即 DownloadManager 自身，不需要挂接。
+    """
+
+    @property
+    @abstractmethod
+    def version(self) -> int:
+        """所有进程共用的任务集合版本号"""
+
+    @abstractmethod
+    def start(self, manager: DownloadManager):
+        """开始同步"""
+
+    @abstractmethod
+    def stop(self):
+        """停止同步"""
+
+    @abstractmethod
+    def on_change(self, task_id: str):
+        """本进程的任务发生变化"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[DownloadProgress]:
+        """获取任意进程的任务"""
+
+    @abstractmethod
+    def get_latest_by_bvid(self, bvid: str) -> Optional[DownloadProgress]:
+        """根据bvid获取最新任务"""
+
+    @abstractmethod
+    def list_tasks(self) -> List[DownloadProgress]:
+        """所有进程的任务"""
+
+    @abstractmethod
+    def get_changes(self, since: int) -> Dict:
+        """与 DownloadManager.get_changes 的返回格式相同"""
+
+    @abstractmethod
+    def remove(self, task_id: str):
+        """移除其他进程的任务，由所属进程从内存中移除"""
+
+    @abstractmethod
+    def clear_terminal(self):
+        """移除所有进程的已结束任务，由所属进程从内存中移除并归档"""
+
+
+class SqliteTaskState(TaskStateBackend):
+    """
+    基于共享SQLite文件的任务状态
+
+    本进程的变化先记入脏集合，由同步线程每隔 SHARED_STATE_SYNC_INTERVAL 合并写入一次，
+    下载线程的进度上报不直接写文件。版本号存放在文件中，所有进程共用同一序列；
+    移除的任务保留为 removed=1 的记录，供增量查询返回。
+    其他进程移除本进程的任务时只标记记录，本进程在 poll 中发现后从内存移除；
+    之后的写入不会把已移除的记录恢复。
+    """
+
+    def __init__(self, path: str = TASK_STATE_PATH):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._manager: Optional[DownloadManager] = None
+        self._local = threading.local()
+        self._dirty: Set[str] = set()
+        self._dirty_lock = threading.Lock()
+        self._owned: Set[str] = set()  # 本进程写入过的task_id
+        self._seen_version = 0
+        self._last_heartbeat = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用自己的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init_schema(self):
+        """建表（多个进程同时启动时可重复执行）"""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        for ddl in SQLITE_STATE_DDL:
+            conn.execute(ddl)
+        base_version = int(time.time() * 1000)
+        conn.execute(
+            "INSERT OR IGNORE INTO task_state_meta (id, version, tombstone_floor) VALUES (1, ?, ?)",
+            (base_version, base_version)
+        )
+
+    def start(self, manager: DownloadManager):
+        """建表并启动同步线程"""
+        self.init_schema()
+        self._manager = manager
+        self._seen_version = self.version
+        self._heartbeat()
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="task-state-sync", daemon=True)
+        self._thread.start()
+        logger.info(f"下载任务共享状态: {self.path}, owner={self.owner}")
+
+    def stop(self):
+        """写入剩余变化并停止同步线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+            self._conn().execute("DELETE FROM task_state_owners WHERE owner = ?", (self.owner,))
+        except sqlite3.Error as e:
+            logger.error(f"停止任务状态同步失败: {e}")
+
+    def _run(self):
+        while not self._stop_event.wait(SHARED_STATE_SYNC_INTERVAL):
+            try:
+                self.flush()
+                self.poll()
+                if time.monotonic() - self._last_heartbeat >= OWNER_HEARTBEAT_INTERVAL:
+                    self._heartbeat()
+                    self.expire_orphans()
+            except sqlite3.Error as e:
+                logger.error(f"任务状态同步失败: {e}")
+
+    @property
+    def version(self) -> int:
+        row = self._conn().execute("SELECT version FROM task_state_meta WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def on_change(self, task_id: str):
+        with self._dirty_lock:
+            self._dirty.add(task_id)
+
+    def flush(self):
+        """把本进程积累的变化写入共享文件"""
+        if self._manager is None:
+            return
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+
+        upserts = []
+        removed = []
+        for task_id in dirty:
+            task = self._manager.get_local_task(task_id)
+            if task is not None:
+                upserts.append(task)
+            elif task_id in self._owned:
+                removed.append(task_id)
+
+        with self._write() as (conn, next_version):
+            now = time.time()
+            for task in upserts:
+                conn.execute(
+                    "INSERT INTO task_state (task_id, bvid, owner, status, started_at, version, removed, updated_at, state) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?) "
+                    "ON CONFLICT (task_id) DO UPDATE SET owner = excluded.owner, status = excluded.status, "
+                    "version = excluded.version, removed = 0, updated_at = excluded.updated_at, state = excluded.state "
+                    # 已被移除的记录只有换了所属进程（任务被其他worker重新领取）时才恢复
+                    "WHERE task_state.removed = 0 OR task_state.owner != excluded.owner",
+                    (task.task_id, task.bvid, self.owner, task.status.value,
+                     task.started_at.isoformat() if task.started_at else None,
+                     next_version(), now, dump_record(task))
+                )
+            for task_id in removed:
+                conn.execute(
+                    "UPDATE task_state SET removed = 1, version = ?, updated_at = ? WHERE task_id = ?",
+                    (next_version(), now, task_id)
+                )
+        self._owned.update(task.task_id for task in upserts)
+        self._owned.difference_update(removed)
+
+    def poll(self):
+        """发现其他进程写入的变化，通知本进程的订阅者；本进程的任务被其他进程移除时从内存中移除"""
+        if self._manager is None:
+            return
+        version = self.version
+        rows = self._conn().execute(
+            "SELECT task_id, owner, removed FROM task_state WHERE version > ? AND version <= ?",
+            (self._seen_version, version)
+        ).fetchall()
+        discarded = []
+        for task_id, owner, removed in rows:
+            if owner != self.owner:
+                self._manager.notify_subscribers(task_id)
+            elif removed and self._manager.get_local_task(task_id) is not None:
+                discarded.append(task_id)
+        if discarded:
+            self._owned.difference_update(discarded)
+            self._manager.discard_tasks(discarded)
+        self._seen_version = version
+
+    def _heartbeat(self):
+        self._conn().execute(
+            "INSERT INTO task_state_owners (owner, heartbeat) VALUES (?, ?) "
+            "ON CONFLICT (owner) DO UPDATE SET heartbeat = excluded.heartbeat",
+            (self.owner, time.time())
+        )
+        self._last_heartbeat = time.monotonic()
+
+    def expire_orphans(self):
+        """
+        处理已退出进程留下的任务
+
+        心跳超时进程的未结束任务标记为失败；已结束且超过 TERMINAL_TASK_TTL 的任务移除
+        （存活进程的任务由该进程自己淘汰）。
+        """
+        now = time.time()
+        conn = self._conn()
+        dead_owner = (
+            "owner NOT IN (SELECT owner FROM task_state_owners WHERE heartbeat >= ?)"
+        )
+        terminal = tuple(status.value for status in TERMINAL_STATUSES)
+        unfinished = conn.execute(
+            f"SELECT task_id, state FROM task_state WHERE removed = 0 AND status NOT IN (?, ?, ?) AND {dead_owner}",
+            (*terminal, now - OWNER_TIMEOUT)
+        ).fetchall()
+        expired = conn.execute(
+            f"SELECT task_id FROM task_state WHERE removed = 0 AND status IN (?, ?, ?) "
+            f"AND updated_at < ? AND {dead_owner}",
+            (*terminal, now - TERMINAL_TASK_TTL, now - OWNER_TIMEOUT)
+        ).fetchall()
+        if not unfinished and not expired:
+            return
+
+        with self._write() as (conn, next_version):
+            for task_id, data in unfinished:
+                task = load_record(data)
+                task.status = TaskStatus.ERROR
+                task.error_message = task.error_message or "下载进程已退出"
+                conn.execute(
+                    "UPDATE task_state SET status = ?, version = ?, updated_at = ?, state = ? "
+                    "WHERE task_id = ? AND removed = 0",
+                    (task.status.value, next_version(), now, dump_record(task), task_id)
+                )
+            for (task_id,) in expired:
+                conn.execute(
+                    "UPDATE task_state SET removed = 1, version = ?, updated_at = ? WHERE task_id = ?",
+                    (next_version(), now, task_id)
+                )
+        logger.info(f"共享任务状态: {len(unfinished)} 个任务因进程退出标记为失败, 移除 {len(expired)} 个过期任务")
+
+    def _write(self):
+        return _WriteTransaction(self._conn())
+
+    def get(self, task_id: str) -> Optional[DownloadProgress]:
+        row = self._conn().execute(
+            "SELECT state, version FROM task_state WHERE task_id = ? AND removed = 0", (task_id,)
+        ).fetchone()
+        return load_record(*row) if row else None
+
+    def get_latest_by_bvid(self, bvid: str) -> Optional[DownloadProgress]:
+        row = self._conn().execute(
+            "SELECT state, version FROM task_state WHERE bvid = ? AND removed = 0 "
+            "ORDER BY started_at DESC LIMIT 1",
+            (bvid,)
+        ).fetchone()
+        return load_record(*row) if row else None
+
+    def list_tasks(self) -> List[DownloadProgress]:
+        rows = self._conn().execute(
+            "SELECT state, version FROM task_state WHERE removed = 0 ORDER BY started_at, task_id"
+        ).fetchall()
+        return [load_record(state, version) for state, version in rows]
+
+    def get_changes(self, since: int) -> Dict:
+        """与 DownloadManager.get_changes 的返回格式相同"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            version, floor = conn.execute(
+                "SELECT version, tombstone_floor FROM task_state_meta WHERE id = 1"
+            ).fetchone()
+            reset = since < floor or since > version
+            if reset:
+                since = 0
+            rows = conn.execute(
+                "SELECT task_id, state, version, removed FROM task_state WHERE version > ? ORDER BY version",
+                (since,)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return {
+            "version": version,
+            "reset": reset,
+            "tasks": [load_record(state, v).to_dict() for _, state, v, removed in rows if not removed],
+            "removed": [] if reset else [task_id for task_id, _, _, removed in rows if removed],
+        }
+
+    def remove(self, task_id: str):
+        """从共享列表中移除其他进程的任务（所属进程在下次poll时从内存中移除）"""
+        with self._write() as (conn, next_version):
+            conn.execute(
+                "UPDATE task_state SET removed = 1, version = ?, updated_at = ? WHERE task_id = ? AND removed = 0",
+                (next_version(), time.time(), task_id)
+            )
+
+    def clear_terminal(self):
+        """从共享列表中移除所有已结束的任务（所属进程在下次poll时从内存中移除并归档）"""
+        with self._write() as (conn, next_version):
+            rows = conn.execute(
+                "SELECT task_id FROM task_state WHERE removed = 0 AND status IN (?, ?, ?)",
+                tuple(status.value for status in TERMINAL_STATUSES)
+            ).fetchall()
+            now = time.time()
+            for (task_id,) in rows:
+                conn.execute(
+                    "UPDATE task_state SET removed = 1, version = ?, updated_at = ? WHERE task_id = ?",
+                    (next_version(), now, task_id)
+                )
+
+
+class _WriteTransaction:
+    """
+    写事务：BEGIN IMMEDIATE 串行化各进程的写入，提供递增的版本号，
+    提交前更新 task_state_meta 中的版本号并清理超出 TOMBSTONE_LIMIT 的移除记录
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.version = 0
+
+    def _next_version(self) -> int:
+        self.version += 1
+        return self.version
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.version = self.conn.execute("SELECT version FROM task_state_meta WHERE id = 1").fetchone()[0]
+        return self.conn, self._next_version
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.conn.execute("ROLLBACK")
+            return False
+        self.conn.execute("UPDATE task_state_meta SET version = ? WHERE id = 1", (self.version,))
+        overflow = self.conn.execute(
+            "SELECT version FROM task_state WHERE removed = 1 ORDER BY version DESC LIMIT 1 OFFSET ?",
+            (TOMBSTONE_LIMIT,)
+        ).fetchone()
+        if overflow:
+            self.conn.execute("DELETE FROM task_state WHERE removed = 1 AND version <= ?", (overflow[0],))
+            self.conn.execute(
+                "UPDATE task_state_meta SET tombstone_floor = MAX(tombstone_floor, ?) WHERE id = 1", (overflow[0],)
+            )
+        self.conn.execute("COMMIT")
+        return False
+
+
+def create_task_state_backend() -> Optional[TaskStateBackend]:
+    """根据 TASK_STATE_BACKEND 创建共享状态后端，内存模式返回None"""
+    if TASK_STATE_BACKEND == "memory":
+        return None
+    if TASK_STATE_BACKEND == "sqlite":
+        return SqliteTaskState(TASK_STATE_PATH)
+    raise ValueError(f"未知的任务状态后端: {TASK_STATE_BACKEND}")
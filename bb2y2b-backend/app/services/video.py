@@ -2,19 +2,39 @@
 视频管理服务
 """
 import time
-import threading
 import logging
-from typing import List, Optional
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.core.pagination import paginate
 from app.models.video import Video
-from app.schemas.video import VideoCreate, VideoUpdate
+from app.models.task import Task
+from app.models.ai_analysis_log import AIAnalysisLog
+from app.schemas.video import VideoCreate, VideoUpdate, VideoBulkRequest
 from app.services.download import download_service
+from app.services.search import index_subtitle, index_videos, read_subtitle_text
+from app.services.file_catalog import FileCatalogService
+from app.services.job_queue import DownloadJobQueue, PRIORITY_INTERACTIVE, STATUS_DEFERRED
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+BULK_MAX_ITEMS = 10000  # 单次批量操作的记录数上限
+BULK_CHUNK_SIZE = 500  # IN 查询/批量写入每批的记录数（低于SQLite的参数个数限制）
+
+
+def _chunks(items: List, size: int = BULK_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _bulk_result(op: str, bvid: str, status: str, error: Optional[str] = None) -> Dict[str, Any]:
+    return {"op": op, "bvid": bvid, "status": status, "error": error}
+
 
 class VideoService:
     """视频管理服务类"""
@@ -22,14 +42,16 @@ class VideoService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_videos(
+    def get_videos(
         self, 
         skip: int = 0, 
         limit: int = 100,
         status: Optional[str] = None,
-        video_type: Optional[str] = None
-    ) -> List[Video]:
-        """获取视频列表"""
+        video_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        order: str = "desc"
+    ) -> Tuple[List[Video], Optional[str]]:
+        """获取视频列表（默认最新的在前），返回 (视频列表, 下一页游标)"""
         query = self.db.query(Video)
         
         if status:
@@ -37,28 +59,33 @@ class VideoService:
         if video_type:
             query = query.filter(Video.video_type == video_type)
         
-        return query.offset(skip).limit(limit).all()
+        return paginate(
+            query, [Video.created_at, Video.id],
+            skip=skip, limit=limit, cursor=cursor, descending=order == "desc"
+        )
     
-    async def get_video_by_id(self, video_id: str) -> Optional[Video]:
+    def get_video_by_id(self, video_id: str) -> Optional[Video]:
         """根据bvid获取视频"""
         return self.db.query(Video).filter(Video.bvid == video_id).first()
     
-    async def create_video(self, video_data: VideoCreate) -> Video:
+    def create_video(self, video_data: VideoCreate) -> Video:
         """创建新视频记录"""
         # 检查bvid是否已存在
-        existing = await self.get_video_by_id(video_data.bvid)
+        existing = self.get_video_by_id(video_data.bvid)
         if existing:
             raise ValueError(f"Video with ID {video_data.bvid} already exists")
         
         db_video = Video(**video_data.model_dump())
         self.db.add(db_video)
+        self.db.flush()
+        index_videos(self.db, [db_video.bvid])
         self.db.commit()
         self.db.refresh(db_video)
         return db_video
     
-    async def update_video(self, video_id: str, video_data: VideoUpdate) -> Optional[Video]:
+    def update_video(self, video_id: str, video_data: VideoUpdate) -> Optional[Video]:
         """更新视频信息"""
-        db_video = await self.get_video_by_id(video_id)
+        db_video = self.get_video_by_id(video_id)
         if not db_video:
             return None
         
@@ -66,13 +93,16 @@ class VideoService:
         for field, value in update_data.items():
             setattr(db_video, field, value)
         
+        if "title" in update_data or "description" in update_data:
+            self.db.flush()
+            index_videos(self.db, [db_video.bvid])
         self.db.commit()
         self.db.refresh(db_video)
         return db_video
     
-    async def delete_video(self, video_id: str) -> bool:
+    def delete_video(self, video_id: str) -> bool:
         """删除视频记录"""
-        db_video = await self.get_video_by_id(video_id)
+        db_video = self.get_video_by_id(video_id)
         if not db_video:
             return False
         
@@ -80,44 +110,200 @@ class VideoService:
         self.db.commit()
         return True
     
-    async def start_download(self, video_id: str) -> Optional[dict]:
-        """开始下载视频（异步后台任务）"""
-        from app.services.download_manager import download_manager
+    def bulk_apply(self, request: VideoBulkRequest) -> Dict[str, Any]:
+        """
+        批量创建/更新/删除视频
+        
+        所有操作在同一个事务中以集合SQL执行（每批一条INSERT/UPDATE/DELETE），
+        已存在、不存在或请求内重复的记录逐条返回结果而不影响其他记录；
+        数据库错误时整体回滚。
+        """
+        total = len(request.create) + len(request.update) + len(request.delete)
+        if total > BULK_MAX_ITEMS:
+            raise ValueError(f"Too many operations: {total} > {BULK_MAX_ITEMS}")
+        
+        results: List[Dict[str, Any]] = []
+        counts = {"created": 0, "updated": 0, "deleted": 0}
+        
+        referenced = {v.bvid for v in request.create} | {v.bvid for v in request.update} | set(request.delete)
+        existing = self._existing_bvids(referenced)
+        
+        try:
+            # 创建：一次executemany插入
+            rows = []
+            created = set()
+            for item in request.create:
+                if item.bvid in created:
+                    results.append(_bulk_result("create", item.bvid, "duplicate", "Duplicate bvid in request"))
+                    continue
+                if item.bvid in existing:
+                    results.append(_bulk_result("create", item.bvid, "exists", f"Video with ID {item.bvid} already exists"))
+                    continue
+                created.add(item.bvid)
+                existing.add(item.bvid)
+                rows.append(item.model_dump())
+                results.append(_bulk_result("create", item.bvid, "created"))
+            for chunk in _chunks(rows):
+                self.db.execute(insert(Video), chunk)
+            counts["created"] = len(rows)
+            
+            # 更新：相同修改内容的记录合并为一条 UPDATE ... WHERE bvid IN (...)，
+            # 其余按修改字段分组后executemany
+            groups: Dict[tuple, List[str]] = defaultdict(list)
+            seen = set()
+            for item in request.update:
+                if item.bvid not in existing:
+                    results.append(_bulk_result("update", item.bvid, "not_found", "Video not found"))
+                    continue
+                if item.bvid in seen:
+                    results.append(_bulk_result("update", item.bvid, "duplicate", "Duplicate bvid in request"))
+                    continue
+                seen.add(item.bvid)
+                fields = item.model_dump(exclude_unset=True, exclude={"bvid"})
+                groups[tuple(sorted(fields.items()))].append(item.bvid)
+                results.append(_bulk_result("update", item.bvid, "updated"))
+            self._bulk_update(groups)
+            counts["updated"] = len(seen)
+            index_videos(self.db, [row["bvid"] for row in rows] + [
+                bvid for key, bvids in groups.items()
+                if any(name in ("title", "description") for name, _ in key)
+                for bvid in bvids
+            ])
+            
+            # 删除：关联任务随视频删除（与单条删除的级联一致），AI分析日志保留并解除关联
+            targets = []
+            seen = set()
+            for bvid in request.delete:
+                if bvid in seen:
+                    results.append(_bulk_result("delete", bvid, "duplicate", "Duplicate bvid in request"))
+                elif bvid not in existing:
+                    results.append(_bulk_result("delete", bvid, "not_found", "Video not found"))
+                else:
+                    targets.append(bvid)
+                    results.append(_bulk_result("delete", bvid, "deleted"))
+                seen.add(bvid)
+            for chunk in _chunks(targets):
+                ids = select(Video.id).where(Video.bvid.in_(chunk)).scalar_subquery()
+                self.db.execute(delete(Task).where(Task.video_id.in_(ids)), execution_options={"synchronize_session": False})
+                self.db.execute(
+                    update(AIAnalysisLog).where(AIAnalysisLog.video_id.in_(ids)).values(video_id=None),
+                    execution_options={"synchronize_session": False}
+                )
+                self.db.execute(delete(Video).where(Video.bvid.in_(chunk)), execution_options={"synchronize_session": False})
+            counts["deleted"] = len(targets)
+            
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"批量操作视频失败: {e}")
+            raise ValueError(f"Bulk operation failed: {e.__class__.__name__}")
+        
+        return {
+            **counts,
+            "failed": sum(1 for r in results if r["error"]),
+            "results": results,
+        }
+    
+    def _existing_bvids(self, bvids: set) -> set:
+        """分批查询已存在的bvid"""
+        existing = set()
+        for chunk in _chunks(list(bvids)):
+            existing.update(self.db.scalars(select(Video.bvid).where(Video.bvid.in_(chunk))))
+        return existing
+    
+    def _bulk_update(self, groups: Dict[tuple, List[str]]):
+        """按修改内容分组执行批量更新"""
+        table = Video.__table__
+        singles: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        
+        for key, bvids in groups.items():
+            fields = dict(key)
+            if not fields:
+                continue
+            if len(bvids) == 1:
+                singles[tuple(fields)].append({"b_bvid": bvids[0], **{f"v_{k}": v for k, v in fields.items()}})
+                continue
+            for chunk in _chunks(bvids):
+                self.db.execute(
+                    table.update().where(table.c.bvid.in_(chunk)).values(**fields, updated_at=func.now())
+                )
+        
+        for names, params in singles.items():
+            stmt = (
+                table.update()
+                .where(table.c.bvid == bindparam("b_bvid"))
+                .values({**{name: bindparam(f"v_{name}") for name in names}, "updated_at": func.now()})
+            )
+            for chunk in _chunks(params):
+                self.db.execute(stmt, chunk)
+    
+    def start_download(self, video_id: str, priority: str = PRIORITY_INTERACTIVE) -> Optional[dict]:
+        """
+        开始下载视频（按优先级类别加入下载队列，由下载worker领取执行）
+        
+        Raises:
+            DownloadRejected: 超出准入预算（见 app.services.admission）
+        """
+        from app.services.admission import admission_controller
+        from app.services.download_worker import download_worker
         
-        db_video = await self.get_video_by_id(video_id)
+        db_video = self.get_video_by_id(video_id)
         if not db_video:
             return None
         
+        status = admission_controller.admit(self.db, priority)
+        deferred = status == STATUS_DEFERRED
         task_id = f"download_{video_id}_{int(time.time())}"
         
-        # 创建下载任务
-        download_manager.create_task(task_id, video_id, db_video.title)
-        
-        # 更新视频状态为下载中
-        db_video.status = "downloading"
+        # 写入任务队列；worker领取前视频状态为queued，领取时改为downloading
+        DownloadJobQueue(self.db).enqueue(task_id, db_video, priority=priority, deferred=deferred)
+        db_video.status = "queued"
         self.db.commit()
         
-        # 在后台线程中执行下载
-        thread = threading.Thread(
-            target=self._download_task,
-            args=(task_id, video_id, db_video.start_p or 1, db_video.end_p, db_video.video_type or 'sleep')
-        )
-        thread.daemon = True
-        thread.start()
+        if deferred:
+            return {
+                "task_id": task_id,
+                "status": "deferred",
+                "priority": priority,
+                "message": "下载队列繁忙，任务已延后，负载恢复后自动开始",
+                "video_url": db_video.bilibili_url
+            }
+        
+        # 唤醒本进程内的worker立即领取
+        download_worker.notify()
         
         return {
             "task_id": task_id, 
-            "status": "started",
-            "message": "下载任务已启动，正在后台下载...",
+            "status": "queued",
+            "priority": priority,
+            "message": "下载任务已加入队列，正在等待下载...",
             "video_url": db_video.bilibili_url
         }
     
-    def _download_task(self, task_id: str, bvid: str, start_p: int, end_p: Optional[int], video_type: str):
-        """后台下载任务"""
-        from app.core.database import SessionLocal
+    @classmethod
+    def execute_download(cls, task_id: str, bvid: str, start_p: int, end_p: Optional[int], video_type: str,
+                         worker_id: str, cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Optional[str]]:
+        """
+        执行下载并保存结果（在worker线程中调用）
+        
+        结果与 DownloadJobQueue.finish 在同一事务中写入：租约已被其他worker接管时
+        finish 返回False，视频记录、文件目录和字幕索引都不写入，由持有租约的worker负责。
+        cancel_event 被设置（租约丢失）时下载在下一个检查点中止。
+        
+        Returns:
+            (租约是否仍有效并已写入结果, 失败时的错误信息)
+        """
+        from app.core.database import write_queue
         from app.services.download_manager import download_manager, TaskStatus
         
-        db = SessionLocal()
+        def save(result: Optional[dict], error: Optional[str], subtitle_text: str = "") -> bool:
+            def write(db: Session) -> bool:
+                if not DownloadJobQueue(db).finish(worker_id, task_id, result is not None, error):
+                    return False
+                cls._save_download_result(db, bvid, result, subtitle_text)
+                return True
+            return write_queue.run(write)
+        
         try:
             logger.info(f"开始下载任务: task_id={task_id}, bvid={bvid}")
             
@@ -127,23 +313,23 @@ class VideoService:
                 bvid=bvid,
                 start_p=start_p,
                 end_p=end_p,
-                video_type=video_type
+                video_type=video_type,
+                cancel_event=cancel_event
             )
             
-            # 更新数据库
-            db_video = db.query(Video).filter(Video.bvid == bvid).first()
-            if db_video:
-                if result:
-                    db_video.status = "downloaded"
-                    db_video.download_path = result.get('video_path')
-                    db_video.cover_path = result.get('cover_path')
-                    db_video.subtitle_path = result.get('subtitle_path')
-                    logger.info(f"下载完成: {bvid}, path={result.get('video_path')}, subtitle={result.get('subtitle_path')}")
-                else:
-                    db_video.status = "error"
-                    logger.error(f"下载失败: {bvid}")
-                
-                db.commit()
+            error = None
+            if not result:
+                task = download_manager.get_local_task(task_id)
+                error = (task.error_message if task else None) or "下载失败"
+            
+            # 更新数据库（通过后台写入队列串行执行）
+            subtitle_text = read_subtitle_text(result.get('subtitle_path')) if result else ""
+            finished = save(result, error, subtitle_text)
+            if result:
+                logger.info(f"下载完成: {bvid}, path={result.get('video_path')}, subtitle={result.get('subtitle_path')}")
+            else:
+                logger.error(f"下载失败: {bvid}")
+            return finished, error
                 
         except Exception as e:
             logger.error(f"下载任务异常: {e}")
@@ -154,9 +340,24 @@ class VideoService:
                 error_message=str(e)
             )
             # 更新数据库状态
-            db_video = db.query(Video).filter(Video.bvid == bvid).first()
-            if db_video:
-                db_video.status = "error"
-                db.commit()
-        finally:
-            db.close()
\ No newline at end of file
+            try:
+                return save(None, str(e)), str(e)
+            except Exception as db_error:
+                logger.error(f"更新视频状态失败: {db_error}")
+                return False, str(e)
+    
+    @staticmethod
+    def _save_download_result(db: Session, bvid: str, result: Optional[dict], subtitle_text: str = ""):
+        """保存下载结果到视频记录"""
+        db_video = db.query(Video).filter(Video.bvid == bvid).first()
+        if not db_video:
+            return
+        if result:
+            db_video.status = "downloaded"
+            db_video.download_path = result.get('video_path')
+            db_video.cover_path = result.get('cover_path')
+            db_video.subtitle_path = result.get('subtitle_path')
+            index_subtitle(db, db_video.id, subtitle_text)
+            FileCatalogService(db).record_download(result)
+        else:
+            db_video.status = "error"
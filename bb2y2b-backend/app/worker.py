@@ -0,0 +1,62 @@
+"""
+独立下载worker入口 - 从tasks表领取下载任务执行
+
+API进程设置 DOWNLOAD_WORKER_MODE=external 后只负责入队，下载由本进程执行。
+多台共享video/cover/srt存储并连接同一数据库的机器可以各自运行一个或多个worker。
+
+用法: python -m app.worker [--concurrency 2]
+"""
+import signal
+import logging
+import argparse
+import threading
+
+from app.services.download_manager import download_manager
+from app.services.download_worker import DownloadWorker, DOWNLOAD_WORKER_CONCURRENCY
+from app.services.task_state import create_task_state_backend
+from app.services.task_persistence import task_write_behind
+from app.services.concurrency import concurrency_controller
+from app.services.config_cache import config_cache
+from app.services.search import ensure_search_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BB2Y2B 下载worker")
+    parser.add_argument("--concurrency", type=int, default=DOWNLOAD_WORKER_CONCURRENCY,
+                        help="同时执行的下载数（开启自动调节时为初始值）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # 与API进程相同的初始化：下载完成后要读取配置、写入字幕索引
+    config_cache.load()
+    ensure_search_index()
+
+    # 与API进程共享任务状态时，API可以查询到本进程的详细下载进度
+    task_state = create_task_state_backend()
+    if task_state:
+        task_state.start(download_manager)
+        download_manager.attach_state_backend(task_state)
+    task_write_behind.start(download_manager)
+
+    worker = DownloadWorker(concurrency=args.concurrency)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    worker.start()
+    concurrency_controller.start(worker)
+    while not stop.wait(1):
+        pass
+
+    logging.info("正在停止下载worker...")
+    concurrency_controller.stop()
+    worker.stop()
+    task_write_behind.stop()
+    if task_state:
+        download_manager.detach_state_backend()
+        task_state.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """初始化数据库"""
 from app.core.database import engine, Base
-from app.models import Space, Video, Task, AIProvider, PromptTemplate, AIAnalysisLog, SystemConfig
+from app.models import Space, Video, Task, AIProvider, PromptTemplate, AIAnalysisLog, SystemConfig, DownloadedFile
 
 def init_db():
     """创建所有数据库表"""
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+下载任务管理器并发压测 - N个写线程上报进度，M个读线程反复获取任务列表
+
+用法: python scripts/bench_download_manager.py [--writers 16] [--readers 4] [--tasks 50] [--seconds 5] [--read-interval 0.01]
+"""
+import sys
+import os
+import time
+import argparse
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.download_manager import download_manager, TaskStatus
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载任务管理器并发压测")
+    parser.add_argument("--writers", type=int, default=16, help="写线程数")
+    parser.add_argument("--readers", type=int, default=4, help="读线程数")
+    parser.add_argument("--tasks", type=int, default=50, help="任务数")
+    parser.add_argument("--seconds", type=float, default=5.0, help="压测时长")
+    parser.add_argument("--read-interval", type=float, default=0.01, help="读线程两次读取之间的间隔（秒），0表示不间断")
+    args = parser.parse_args()
+
+    download_manager.archiver = None
+    task_ids = [f"bench_{i}" for i in range(args.tasks)]
+    for i, task_id in enumerate(task_ids):
+        download_manager.create_task(task_id, f"BVbench{i}", f"压测任务{i}")
+        download_manager.update_task(task_id, status=TaskStatus.DOWNLOADING, total_pages=1,
+                                     current_page=1, total_bytes=10 ** 9)
+
+    # 由各线程自己检查截止时间：锁竞争严重时主线程可能长时间拿不到执行机会
+    deadline = time.perf_counter() + args.seconds
+    write_latencies = [[] for _ in range(args.writers)]
+    read_latencies = [[] for _ in range(args.readers)]
+
+    def writer(index):
+        samples = write_latencies[index]
+        current = 0
+        while time.perf_counter() < deadline:
+            task_id = task_ids[(index + current) % len(task_ids)]
+            current += 1
+            start = time.perf_counter()
+            download_manager.update_task(task_id, current_bytes=current * 1024)
+            samples.append(time.perf_counter() - start)
+
+    def reader(index):
+        samples = read_latencies[index]
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            download_manager.get_all_tasks()
+            download_manager.get_active_tasks()
+            samples.append(time.perf_counter() - start)
+            if args.read_interval:
+                time.sleep(args.read_interval)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for task_id in task_ids:
+        download_manager.remove_task(task_id)
+
+    writes = [s for samples in write_latencies for s in samples]
+    reads = [s for samples in read_latencies for s in samples]
+    print(f"写线程 {args.writers} 个, 读线程 {args.readers} 个, 任务 {args.tasks} 个, 时长 {args.seconds}s")
+    print(f"进度更新: {len(writes) / args.seconds:.0f} 次/秒, "
+          f"p50 {percentile(writes, 0.5) * 1e6:.0f}us, p99 {percentile(writes, 0.99) * 1e6:.0f}us, "
+          f"max {max(writes, default=0) * 1e3:.1f}ms")
+    print(f"任务列表: {len(reads) / args.seconds:.0f} 次/秒, "
+          f"p50 {percentile(reads, 0.5) * 1e3:.2f}ms, p99 {percentile(reads, 0.99) * 1e3:.2f}ms, "
+          f"max {max(reads, default=0) * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+查询计划检查脚本 - 确认常用过滤查询命中复合索引
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from app.models import Base
+
+# (说明, SQL, 期望使用的索引)，多个索引都能满足查询时给出元组，命中其中之一即可
+HOT_QUERIES = [
+    (
+        "视频列表按状态和类型过滤",
+        "SELECT * FROM videos WHERE status = 'pending' AND video_type = 'sleep'",
+        "ix_videos_status_video_type",
+    ),
+    (
+        "视频列表按状态过滤",
+        "SELECT * FROM videos WHERE status = 'completed'",
+        "ix_videos_status_video_type",
+    ),
+    (
+        "按状态统计视频数",
+        "SELECT status, COUNT(*) FROM videos GROUP BY status",
+        "ix_videos_status_video_type",
+    ),
+    (
+        "空间下的视频按创建时间排序",
+        "SELECT * FROM videos WHERE space_id = 1 ORDER BY created_at DESC",
+        "ix_videos_space_id_created_at",
+    ),
+    (
+        "扫描时加载已知bvid",
+        "SELECT space_id, bvid FROM videos WHERE space_id IN (1, 2, 3)",
+        "ix_videos_space_id_created_at",
+    ),
+    (
+        "任务列表按状态和类型过滤",
+        "SELECT * FROM tasks WHERE status = 'running' AND task_type = 'download'",
+        # 下载队列的租约索引以 (task_type, status) 开头，规划器可能选用它
+        ("ix_tasks_status_task_type", "ix_tasks_task_type_status_lease"),
+    ),
+    (
+        "视频的AI分析记录",
+        "SELECT * FROM ai_analysis_logs WHERE video_id = 1 ORDER BY created_at DESC",
+        "ix_ai_analysis_logs_video_id_created_at",
+    ),
+    (
+        "启用空间按上次扫描时间排序",
+        "SELECT * FROM spaces WHERE is_active = 1 ORDER BY last_scan_time",
+        "ix_spaces_is_active_last_scan_time",
+    ),
+]
+
+
+def check_query_plans() -> bool:
+    """在内存SQLite中建表，逐条检查查询计划"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+
+    ok = True
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        for description, sql, expected in HOT_QUERIES:
+            index_names = expected if isinstance(expected, tuple) else (expected,)
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+            details = " | ".join(row[-1] for row in plan)
+            used = next((name for name in index_names if f"INDEX {name} " in details + " "), None)
+            if used:
+                print(f"✅ {description}: {used}")
+            else:
+                ok = False
+                print(f"❌ {description}: 未使用 {' / '.join(index_names)}")
+                print(f"   {details}")
+    return ok
+
+
+if __name__ == "__main__":
+    print("🔍 检查查询计划...")
+    success = check_query_plans()
+    sys.exit(0 if success else 1)
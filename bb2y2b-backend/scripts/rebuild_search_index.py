@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+重建视频全文搜索索引
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.search import rebuild_search_index, fts_available
+
+
+if __name__ == "__main__":
+    if not fts_available():
+        print("❌ 当前数据库不支持FTS5索引，搜索使用LIKE匹配，无需重建")
+        sys.exit(1)
+    print("🔄 重建搜索索引...")
+    rebuild_search_index()
+    print("✅ 搜索索引重建完成")
@@ -8,6 +8,7 @@ import { Button } from '../ui/Button';
 import { 
   useActiveTasks, 
   useAllTasks, 
+  useTaskStream,
   useDownloadedFiles, 
   useRemoveTask, 
   useClearCompletedTasks,
@@ -19,6 +20,7 @@ import type { DownloadTask, DownloadedFile, SubtitleContent } from '../../lib/do
 // 状态图标映射
 const statusIcons: Record<string, React.ReactNode> = {
   pending: <Clock className="h-4 w-4 text-yellow-500" />,
+  deferred: <Clock className="h-4 w-4 text-gray-400" />,
   downloading: <Loader2 className="h-4 w-4 text-blue-500 animate-spin" />,
   merging: <Loader2 className="h-4 w-4 text-purple-500 animate-spin" />,
   completed: <CheckCircle className="h-4 w-4 text-green-500" />,
@@ -28,6 +30,7 @@ const statusIcons: Record<string, React.ReactNode> = {
 
 const statusLabels: Record<string, string> = {
   pending: '等待中',
+  deferred: '已延后',
   downloading: '下载中',
   merging: '合并中',
   completed: '已完成',
@@ -39,6 +42,7 @@ const statusLabels: Record<string, string> = {
 const ProgressBar: React.FC<{ percent: number; status: string }> = ({ percent, status }) => {
   const colorClass = {
     pending: 'bg-yellow-500',
+    deferred: 'bg-gray-400',
     downloading: 'bg-blue-500',
     merging: 'bg-purple-500',
     completed: 'bg-green-500',
@@ -171,6 +175,15 @@ const TaskCard: React.FC<{ task: DownloadTask; onRemove: () => void }> = ({ task
           </Button>
         </div>
       )}
+      {/* 排队中的任务移除即从下载队列中取消 */}
+      {(task.status === 'pending' || task.status === 'deferred') && (
+        <div className="flex justify-end">
+          <Button size="sm" variant="outline" onClick={onRemove}>
+            <XCircle className="h-4 w-4 mr-1" />
+            取消
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
@@ -481,8 +494,10 @@ export const DownloadManager: React.FC = () => {
   const [playingFile, setPlayingFile] = useState<DownloadedFile | null>(null);
   const [viewingSubtitleFile, setViewingSubtitleFile] = useState<DownloadedFile | null>(null);
   
-  const { data: activeTasks, refetch: refetchActive } = useActiveTasks();
-  const { data: allTasks, isLoading: loadingAll, refetch: refetchAll } = useAllTasks();
+  // 推送连接正常时停止轮询
+  const streaming = useTaskStream();
+  const { data: activeTasks, refetch: refetchActive } = useActiveTasks(streaming ? false : undefined);
+  const { data: allTasks, isLoading: loadingAll, refetch: refetchAll } = useAllTasks(streaming ? false : undefined);
   const { data: files, isLoading: loadingFiles, refetch: refetchFiles } = useDownloadedFiles();
   
   const removeTaskMutation = useRemoveTask();
@@ -54,7 +54,7 @@ export const SpacesList: React.FC = () => {
   const handleScanSpace = async (spaceId: string) => {
     try {
       const result = await scanMutation.mutateAsync(spaceId);
-      alert(`扫描完成!\n发现视频: ${result.total_found || 0}\n新增: ${result.new_videos || 0}\n更新: ${result.updated_videos || 0}`);
+      alert(`${result.status === 'running' ? '该空间正在扫描中' : '扫描已开始，正在后台进行'}\n任务ID: ${result.task_id}`);
     } catch (error) {
       console.error('扫描空间失败:', error);
       alert('扫描失败，请检查网络连接');
@@ -6,6 +6,7 @@ import type { Video } from '../../lib/videosApi';
 
 const statusMap: Record<string, { label: string; color: string }> = {
   pending: { label: '待下载', color: 'bg-yellow-100 text-yellow-800' },
+  queued: { label: '排队中', color: 'bg-blue-50 text-blue-700' },
   downloading: { label: '下载中', color: 'bg-blue-100 text-blue-800 animate-pulse' },
   downloaded: { label: '已下载', color: 'bg-green-100 text-green-800' },
   uploading: { label: '上传中', color: 'bg-purple-100 text-purple-800' },
@@ -13,6 +14,9 @@ const statusMap: Record<string, { label: string; color: string }> = {
   error: { label: '错误', color: 'bg-red-100 text-red-800' },
 };
 
+// 已加入下载队列（排队中或下载中）
+const isInQueue = (video: Video) => video.status === 'queued' || video.status === 'downloading';
+
 // 视频列表行组件
 const VideoRow: React.FC<{
   video: Video;
@@ -74,10 +78,10 @@ const VideoRow: React.FC<{
           size="sm"
           variant="outline"
           onClick={onDownload}
-          disabled={isDownloading || video.status === 'downloading'}
+          disabled={isDownloading || isInQueue(video)}
           title={video.status === 'downloaded' ? '重新下载' : '开始下载'}
         >
-          {(video.status === 'downloading' || isDownloading) ? (
+          {(isInQueue(video) || isDownloading) ? (
             <Loader2 className="h-4 w-4 animate-spin" />
           ) : (
             <Download className="h-4 w-4" />
@@ -87,7 +91,7 @@ const VideoRow: React.FC<{
           size="sm"
           variant="danger"
           onClick={onDelete}
-          disabled={isDeleting || video.status === 'downloading'}
+          disabled={isDeleting || isInQueue(video)}
         >
           <Trash2 className="h-4 w-4" />
         </Button>
@@ -105,9 +109,9 @@ export const VideosList: React.FC = () => {
   const downloadMutation = useStartDownload();
   const [downloadingIds, setDownloadingIds] = useState<Set<string>>(new Set());
 
-  // 自动刷新：当有视频正在下载时，每5秒刷新一次
+  // 自动刷新：当有视频排队或正在下载时，每5秒刷新一次
   useEffect(() => {
-    const hasDownloading = videos?.some(v => v.status === 'downloading');
+    const hasDownloading = videos?.some(isInQueue);
     if (hasDownloading) {
       const interval = setInterval(() => {
         refetch();
@@ -189,6 +193,7 @@ export const VideosList: React.FC = () => {
           >
             <option value="">全部状态</option>
             <option value="pending">待下载</option>
+            <option value="queued">排队中</option>
             <option value="downloading">下载中</option>
             <option value="downloaded">已下载</option>
             <option value="uploaded">已上传</option>
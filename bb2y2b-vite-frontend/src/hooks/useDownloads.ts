@@ -1,11 +1,15 @@
+import { useEffect, useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { downloadsApi } from '../lib/downloadsApi';
+import type { DownloadTask, TaskStreamUpdate } from '../lib/downloadsApi';
 
-export function useActiveTasks(refetchInterval?: number) {
+const ACTIVE_STATUSES: DownloadTask['status'][] = ['pending', 'deferred', 'downloading', 'merging'];
+
+export function useActiveTasks(refetchInterval?: number | false) {
   return useQuery({
     queryKey: ['downloads', 'active'],
     queryFn: downloadsApi.getActiveTasks,
-    refetchInterval: refetchInterval || 2000, // 默认2秒刷新一次
+    refetchInterval: refetchInterval === false ? false : (refetchInterval || 2000), // 默认2秒刷新一次
   });
 }
 
@@ -17,10 +21,49 @@ export function useAllTasks(refetchInterval?: number | false) {
   });
 }
 
+// 订阅任务进度推送，把结果写入任务列表的查询缓存；返回是否已连接（连接期间可以停止轮询）
+export function useTaskStream() {
+  const queryClient = useQueryClient();
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    const tasks = new Map<string, DownloadTask>();
+    const publish = () => {
+      const all = Array.from(tasks.values());
+      const active = all.filter(t => ACTIVE_STATUSES.includes(t.status));
+      queryClient.setQueryData(['downloads', 'all'], { tasks: all, total: all.length });
+      queryClient.setQueryData(['downloads', 'active'], { tasks: active, total: active.length });
+    };
+
+    const source = new EventSource(downloadsApi.getTaskStreamUrl());
+    source.addEventListener('snapshot', (event) => {
+      const data: { tasks: DownloadTask[] } = JSON.parse((event as MessageEvent).data);
+      tasks.clear();
+      data.tasks.forEach(t => tasks.set(t.task_id, t));
+      publish();
+      setConnected(true);
+    });
+    source.addEventListener('update', (event) => {
+      const data: TaskStreamUpdate = JSON.parse((event as MessageEvent).data);
+      Object.entries(data.tasks).forEach(([taskId, fields]) => {
+        tasks.set(taskId, { ...tasks.get(taskId), ...fields } as DownloadTask);
+      });
+      data.removed.forEach(taskId => tasks.delete(taskId));
+      publish();
+    });
+    // 断开后EventSource会自动重连，重连成功时服务端重新发送快照
+    source.onerror = () => setConnected(false);
+
+    return () => source.close();
+  }, [queryClient]);
+
+  return connected;
+}
+
 export function useDownloadedFiles() {
   return useQuery({
     queryKey: ['downloads', 'files'],
-    queryFn: downloadsApi.getDownloadedFiles,
+    queryFn: () => downloadsApi.getDownloadedFiles(),
   });
 }
 
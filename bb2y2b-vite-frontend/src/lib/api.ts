@@ -72,9 +72,8 @@ export const spacesApi = {
   scanSpace: async (spaceId: string): Promise<{ 
     message: string; 
     task_id: string;
-    total_found?: number;
-    new_videos?: number;
-    updated_videos?: number;
+    status: string;
+    mode: string;
   }> => {
     const response = await api.post(`/spaces/${spaceId}/scan`);
     return response.data;
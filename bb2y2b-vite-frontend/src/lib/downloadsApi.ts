@@ -4,7 +4,8 @@ export interface DownloadTask {
   task_id: string;
   bvid: string;
   title: string;
-  status: 'pending' | 'downloading' | 'merging' | 'completed' | 'error' | 'cancelled';
+  // pending/deferred 为下载队列中尚未被worker领取的任务
+  status: 'pending' | 'deferred' | 'downloading' | 'merging' | 'completed' | 'error' | 'cancelled';
   current_page: number;
   total_pages: number;
   current_bytes: number;
@@ -26,6 +27,18 @@ export interface DownloadTask {
   error_message: string | null;
 }
 
+export interface TaskStreamUpdate {
+  tasks: Record<string, Partial<DownloadTask>>;
+  removed: string[];
+}
+
+export interface DownloadedFilesParams {
+  skip?: number;
+  limit?: number;
+  sort_by?: 'created_at' | 'name' | 'size';
+  order?: 'asc' | 'desc';
+}
+
 export interface DownloadedFile {
   name: string;
   path: string;
@@ -35,6 +48,9 @@ export interface DownloadedFile {
   type: string;
   bvid: string | null;
   title: string | null;
+  start_p?: number | null;
+  end_p?: number | null;
+  duration?: number | null;
   cover_path: string | null;
   cover_url: string | null;
   subtitle_path: string | null;
@@ -69,6 +85,10 @@ export const downloadsApi = {
     return response.data;
   },
 
+  getTaskStreamUrl: (): string => {
+    return `${api.defaults.baseURL}/downloads/tasks/stream`;
+  },
+
   removeTask: async (taskId: string): Promise<void> => {
     await api.delete(`/downloads/tasks/${taskId}`);
   },
@@ -78,8 +98,8 @@ export const downloadsApi = {
   },
 
   // 文件管理
-  getDownloadedFiles: async (): Promise<{ files: DownloadedFile[]; total: number }> => {
-    const response = await api.get('/downloads/files');
+  getDownloadedFiles: async (params?: DownloadedFilesParams): Promise<{ files: DownloadedFile[]; total: number }> => {
+    const response = await api.get('/downloads/files', { params });
     return response.data;
   },
 
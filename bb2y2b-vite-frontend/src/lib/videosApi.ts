@@ -31,7 +31,10 @@ export const videosApi = {
     await api.delete(`/videos/${bvid}`);
   },
 
-  startDownload: async (bvid: string): Promise<{ message: string; task_id: string }> => {
+  // 队列繁忙时返回 status: 'deferred'；超出准入预算时返回429/503（带Retry-After）
+  startDownload: async (
+    bvid: string
+  ): Promise<{ message: string; task_id: string; status: 'queued' | 'deferred'; priority: string }> => {
     const response = await api.post(`/videos/${bvid}/download`);
     return response.data;
   },